@@ -5,23 +5,111 @@ import shutil
 import zipfile
 import logging
 import io
+import re
+import posixpath
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
 from datetime import datetime, timedelta
 from functools import wraps
 import uuid
+import gc
+import socket
+import itertools
+import functools
+import unicodedata
+from urllib.parse import quote
+import threading
+import time
+import queue
+import hashlib
+import heapq
+import sqlite3
+import json
+import pickle
+import csv
+import zlib
+import struct
+from array import array
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from abc import ABC, abstractmethod
+import multiprocessing
+from copy import copy
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Request, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
+from werkzeug.datastructures import Headers
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 import openpyxl
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Font, Border, Alignment, PatternFill, Protection
-import signal
+from openpyxl.utils import get_column_letter, column_index_from_string
+from openpyxl.utils.cell import range_boundaries
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.read_only import ReadOnlyCell, EMPTY_CELL
+from openpyxl.worksheet.dimensions import ColumnDimension
+from openpyxl.worksheet.formula import ArrayFormula, DataTableFormula
+from openpyxl.writer.excel import ExcelWriter
+from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils.datetime import from_excel, CALENDAR_WINDOWS_1900, CALENDAR_MAC_1904
+
+try:
+    import xlrd  # .xls(BIFF) 업로드 변환용 (없으면 .xls 업로드 거부)
+except ImportError:
+    xlrd = None
 
 # ==================== CONFIG ====================
 MAX_FILE_SIZE = 30 * 1024 * 1024  # 30MB
 ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
-UPLOAD_TIMEOUT = 30  # 초
+REQUEST_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT_SECONDS', 110))  # 동기 분리/일괄 분리 요청의 응답 시작 전 처리 제한 (초, gunicorn --timeout 보다 짧게)
 TEMP_CLEANUP_INTERVAL = 3600  # 1시간마다 정리
+COPY_CHUNK_SIZE = 1024 * 1024  # 원시 XML 파트 복사 단위 (1MB)
+SHARED_STRINGS_SUBSET_BYTES = int(os.getenv('SHARED_STRINGS_SUBSET_BYTES', 1024 * 1024))  # 원시 엔진: sharedStrings 가 이 크기 이상이면 시트가 쓰는 문자열만 출력 (미만: 원본 그대로 복사)
+DIMENSION_PROBE_BYTES = 64 * 1024  # <dimension> 탐색 시 읽는 시트 XML 앞부분 크기
+SPLIT_WORKERS = int(os.getenv('SPLIT_WORKERS', os.cpu_count() or 1))  # 시트 분리 프로세스 수 (1 이하: 요청 스레드에서 처리)
+STREAMING_THRESHOLD_BYTES = int(os.getenv('STREAMING_THRESHOLD_BYTES', 50 * 1024 * 1024))  # 시트 XML 이 이 크기 이상이면 스트리밍 복사
+WORKER_CACHE_IDLE_SECONDS = float(os.getenv('WORKER_CACHE_IDLE_SECONDS', 2))  # 분리 워커가 작업 없이 이 시간이 지나면 원본 캐시 해제 (초)
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))  # 동시에 실행하는 비동기 분리 작업 수
+JOB_QUEUE_SIZE = int(os.getenv('JOB_QUEUE_SIZE', 20))  # 대기 가능한 비동기 작업 수
+JOB_TIMEOUT = int(os.getenv('JOB_TIMEOUT_SECONDS', 600))  # 작업별 실행 시간 제한 (초)
+CANCEL_POLL_INTERVAL = 0.5  # 병렬 처리 중 취소/시간 초과 확인 주기 (초)
+CANCEL_CHECK_ROWS = 1000  # 행 복사 루프에서 취소/시간 초과를 확인하는 행 간격
+RESULT_CACHE_DIR = os.getenv('RESULT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'excel_splitter.cache'))
+RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', 1024 * 1024 * 1024))  # 분리 결과 캐시 용량 (0: 사용 안 함)
+CHUNKED_UPLOAD_MAX_SIZE = int(os.getenv('CHUNKED_UPLOAD_MAX_SIZE', 1024 * 1024 * 1024))  # 분할 업로드 최대 파일 크기
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # 분할 업로드 권장 청크 크기 (MAX_FILE_SIZE 이하)
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'sqlite')  # sqlite (워커 프로세스 간 공유) | memory
+SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', os.path.join(tempfile.gettempdir(), 'excel_splitter.sessions.db'))
+JANITOR_ENABLED = os.getenv('JANITOR_ENABLED', '1') == '1'  # 백그라운드 임시 파일 정리
+JANITOR_INTERVAL = int(os.getenv('JANITOR_INTERVAL_SECONDS', 60))  # 정리 주기 (초)
+TEMP_DISK_BUDGET_BYTES = int(os.getenv('TEMP_DISK_BUDGET_BYTES', 10 * 1024 * 1024 * 1024))  # 세션 임시 파일 총량 (0: 제한 없음)
+SESSION_DIR_PREFIX = 'excel_splitter_'
+CANCEL_MARKER_PREFIX = f'{SESSION_DIR_PREFIX}cancel_'  # 프로세스 풀 취소 표시 파일 (임시 디렉토리 바로 아래)
+EXCEL_MAX_ROWS = 1048576  # xlsx 시트 최대 행 수
+PARTITION_MAX_OPEN_WRITERS = int(os.getenv('PARTITION_MAX_OPEN_WRITERS', 32))  # 키 분리 시 동시에 여는 출력 파일 수 (초과 키는 임시 파일로 분배)
+PARTITION_SPILL_BUCKETS = 16  # 키 분리 임시 파일 수 (키 해시 기준)
+PARTITION_MAX_FILES = int(os.getenv('PARTITION_MAX_FILES', 1000))  # 키 분리 결과 최대 파일 수
+PREVIEW_DEFAULT_ROWS = 20  # 시트 미리보기 기본 행 수
+PREVIEW_MAX_ROWS = 200  # 시트 미리보기 최대 행 수
+PREVIEW_MAX_COLUMNS = 100  # 시트 미리보기 최대 열 수 (초과 열은 생략)
+PREVIEW_CACHE_SIZE = int(os.getenv('PREVIEW_CACHE_SIZE', 64))  # 최근 미리보기 결과 보관 수
+BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', 200 * 1024 * 1024))  # 일괄 분리 요청 최대 크기 (/api/batch 만 적용)
+BATCH_MAX_EXTRACT_SIZE = int(os.getenv('BATCH_MAX_EXTRACT_SIZE', 1024 * 1024 * 1024))  # 일괄 분리 ZIP 압축 해제 총량
+BATCH_MAX_FILES = int(os.getenv('BATCH_MAX_FILES', 50))  # 일괄 분리 최대 워크북 수
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 4))  # 일괄 분리 시 동시에 처리하는 워크북 수
+BATCH_REPORT_NAME = 'batch_report.json'  # 일괄 분리 ZIP 의 처리 결과 파일명
+XLSX_COMPRESSION = os.getenv('XLSX_COMPRESSION', 'auto')  # 시트별 xlsx 압축: auto | store | fast | max
+ZIP_COMPRESSION = os.getenv('ZIP_COMPRESSION', 'auto')  # 결과 ZIP 멤버 압축: auto | store | fast | max
+COMPRESS_WORKERS = int(os.getenv('COMPRESS_WORKERS', os.cpu_count() or 1))  # ZIP 멤버 병렬 압축 스레드 수 (1 이하: 순차)
+COMPRESSION_PROBE_BYTES = 64 * 1024  # auto: 압축 효과 판단용으로 시험 압축하는 앞부분 크기
+COMPRESSION_MIN_SAVING = 0.1  # auto: 시험 압축으로 이 비율 이상 줄지 않으면 저장(store)
+MEMORY_BUDGET_BYTES = int(os.getenv('MEMORY_BUDGET_BYTES', -1))  # 프로세스별 분리 작업 메모리 예산 (-1: 컨테이너/시스템 메모리의 절반 ÷ WEB_CONCURRENCY, 0: 제한 없음)
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 1))  # 서버 워커 프로세스 수 (gunicorn 기본 --workers 값과 같은 변수)
+ADMISSION_MEMORY_FACTOR = float(os.getenv('ADMISSION_MEMORY_FACTOR', 10))  # XML 1 byte 당 openpyxl 메모리 추정 배수
+ADMISSION_QUEUE_SIZE = int(os.getenv('ADMISSION_QUEUE_SIZE', 8))  # 메모리 예산을 기다릴 수 있는 요청 수
+ADMISSION_WAIT_SECONDS = int(os.getenv('ADMISSION_WAIT_SECONDS', 60))  # 메모리 예산 최대 대기 시간 (초)
 
 # ==================== LOGGING ====================
 logging.basicConfig(
@@ -35,13 +123,377 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # ==================== FLASK APP ====================
+
+class SplitterRequest(Request):
+    """요청 크기 제한을 엔드포인트별로 적용 (일괄 분리만 BATCH_MAX_SIZE, 나머지는 MAX_CONTENT_LENGTH)"""
+
+    @property
+    def max_content_length(self):
+        if self.endpoint == 'batch_split':
+            return BATCH_MAX_SIZE
+        return super().max_content_length
+
+
 app = Flask(__name__)
+app.request_class = SplitterRequest
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 
-# 세션 저장소 (프로덕션: Redis 권장)
-SESSION_STORE = {}
-CLEANUP_TIME = {}
+# ==================== METRICS ====================
+# 프로세스 내 메트릭 (Prometheus text format, GET /api/metrics)
+# 시트 분리 워커 프로세스의 단계별 시간/카운트는 결과 dict 로 전달받아 요청 프로세스에서 기록한다.
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(11))  # 1KB ~ 1GB
+
+
+def _format_labels(names, values, extra=()):
+    """Prometheus 라벨 문자열 ({name="value",...}, 라벨이 없으면 빈 문자열)"""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+class Counter:
+    """누적 카운터"""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels.get(name, '')) for name in self.labelnames), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """누적 버킷 히스토그램"""
+
+    def __init__(self, name, help_text, buckets, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._series = {}  # 라벨 값 → [버킷별 누적 개수, 합계, 개수]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = _format_labels(self.labelnames, key, [('le', f"{bound:g}")])
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total:g}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """메트릭 목록 및 text format 출력"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets, labelnames=()):
+        metric = Histogram(name, help_text, buckets, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = MetricsRegistry()
+REQUEST_SECONDS = METRICS.histogram(
+    'excel_splitter_request_seconds', 'Request/job processing time', DURATION_BUCKETS, ('endpoint',))
+STAGE_SECONDS = METRICS.histogram(
+    'excel_splitter_stage_seconds', 'Time spent per processing stage', DURATION_BUCKETS, ('stage',))
+UPLOAD_BYTES = METRICS.histogram(
+    'excel_splitter_upload_bytes', 'Uploaded workbook size', SIZE_BUCKETS)
+RESPONSE_BYTES = METRICS.histogram(
+    'excel_splitter_response_bytes', 'Split result size (xlsx or zip)', SIZE_BUCKETS)
+BYTES_IN = METRICS.counter('excel_splitter_bytes_in_total', 'Bytes received from uploads')
+BYTES_OUT = METRICS.counter('excel_splitter_bytes_out_total', 'Bytes sent as split results')
+SHEETS_SPLIT = METRICS.counter('excel_splitter_sheets_split_total', 'Sheets split by engine', ('engine',))
+CELLS_COPIED = METRICS.counter('excel_splitter_cells_copied_total', 'Cells copied by the openpyxl engines')
+STYLED_CELLS = METRICS.counter('excel_splitter_styled_cells_total', 'Styled cells copied by the openpyxl engines')
+PHANTOM_CELLS = METRICS.counter(
+    'excel_splitter_phantom_cells_total', 'Empty unstyled cells skipped by the openpyxl engines')
+OUTPUT_FILE_BYTES = METRICS.counter(
+    'excel_splitter_output_file_bytes_total', 'Bytes of split output files by engine', ('engine',))
+ADMISSIONS = METRICS.counter(
+    'excel_splitter_admission_total', 'Memory admission decisions', ('decision',))
+ADMISSION_WAIT_SECONDS_HISTOGRAM = METRICS.histogram(
+    'excel_splitter_admission_wait_seconds', 'Time spent waiting for the memory budget', DURATION_BUCKETS)
+ZIP_MEMBERS = METRICS.counter('excel_splitter_zip_members_total', 'Result ZIP members by compression method', ('method',))
+ZIP_MEMBER_BYTES = METRICS.counter(
+    'excel_splitter_zip_member_bytes_total', 'Result ZIP member bytes before/after compression', ('kind',))
+
+
+class StageTimer:
+    """
+    요청/작업/시트 단위 단계별 소요 시간 및 카운트
+    - 시트 분리 워커: 값만 모아 결과 dict 로 전달
+    - 요청/작업: record_split() 으로 시트 결과를 합산, finish() 에서 단계별 합계를 STAGE_SECONDS 에 기록
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counts = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name, value=1):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def record_split(self, result):
+        """시트 분리 결과(워커에서 측정한 stages/counts)를 합산하고 메트릭에 기록"""
+        SHEETS_SPLIT.inc(engine=result['engine'])
+        for name, seconds in result.get('stages', {}).items():
+            self.add(name, seconds)
+        for name, value in result.get('counts', {}).items():
+            self.count(name, value)
+        CELLS_COPIED.inc(result.get('counts', {}).get('cells', 0))
+        STYLED_CELLS.inc(result.get('counts', {}).get('styled_cells', 0))
+        PHANTOM_CELLS.inc(result.get('counts', {}).get('phantom_cells', 0))
+        OUTPUT_FILE_BYTES.inc(result.get('size', 0), engine=result['engine'])
+        self.count('sheets')
+
+    def merge(self, other):
+        """다른 StageTimer(예: 일괄 분리의 워크북별 타이머)의 단계 시간/카운트 합산"""
+        for name, seconds in other.stages.items():
+            self.add(name, seconds)
+        for name, value in other.counts.items():
+            self.count(name, value)
+
+    def finish(self, endpoint, **fields):
+        """요청 종료: 전체/단계별 시간 기록 후 단계별 내역을 구조화 로그 1줄로 남김"""
+        elapsed = time.perf_counter() - self.started
+        REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+        for name, seconds in self.stages.items():
+            STAGE_SECONDS.observe(seconds, stage=name)
+        logger.info("Request metrics: " + json.dumps({
+            'endpoint': endpoint,
+            'seconds': round(elapsed, 4),
+            'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            **self.counts,
+            **fields
+        }, ensure_ascii=False))
+
+
+# ==================== SESSION STORE ====================
+# 세션 저장소 인터페이스 - 만료는 만료 시각 순 인덱스(heap / SQLite index)로 처리해
+# 정리 비용이 전체 세션 수가 아닌 만료된 세션 수에 비례한다.
+
+class SessionStore(ABC):
+    """세션 저장소 인터페이스 (세션: JSON 직렬화 가능한 dict)"""
+
+    @abstractmethod
+    def get(self, session_id):
+        pass
+
+    @abstractmethod
+    def put(self, session_id, session, ttl):
+        pass
+
+    @abstractmethod
+    def delete(self, session_id):
+        pass
+
+    @abstractmethod
+    def pop_expired(self, now=None):
+        """만료된 세션을 삭제하고 [(session_id, session), ...] 반환"""
+
+    @abstractmethod
+    def items(self):
+        """[(session_id, session, expires_at), ...] - 만료 시각 오름차순"""
+
+
+class MemorySessionStore(SessionStore):
+    """프로세스 내 저장소 (단일 워커/테스트용) - 만료 시각 min-heap + 지연 삭제"""
+
+    def __init__(self):
+        self._sessions = {}  # session_id -> (session, expires_at)
+        self._heap = []  # (expires_at, session_id) - 덮어쓰기/삭제된 항목은 꺼낼 때 무시
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+        return entry[0] if entry else None
+
+    def put(self, session_id, session, ttl):
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._sessions[session_id] = (session, expires_at)
+            heapq.heappush(self._heap, (expires_at, session_id))
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def pop_expired(self, now=None):
+        now = time.time() if now is None else now
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                expires_at, session_id = heapq.heappop(self._heap)
+                entry = self._sessions.get(session_id)
+                if entry is not None and entry[1] == expires_at:
+                    del self._sessions[session_id]
+                    expired.append((session_id, entry[0]))
+        return expired
+
+    def items(self):
+        with self._lock:
+            entries = [(sid, session, expires_at) for sid, (session, expires_at) in self._sessions.items()]
+        return sorted(entries, key=lambda entry: entry[2])
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite(WAL) 파일 저장소 - 같은 호스트의 모든 워커 프로세스가 공유
+    expires_at 인덱스로 만료 세션만 조회/삭제
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        # 스키마 생성용 연결은 바로 닫음 (fork 이후 상속된 연결을 쓰지 않도록)
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS sessions ('
+                'session_id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)')
+        finally:
+            conn.close()
+
+    def _connect(self):
+        """스레드/프로세스별 연결 (WAL: 읽기와 쓰기가 서로 막지 않음)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, session_id):
+        row = self._connect().execute(
+            'SELECT data FROM sessions WHERE session_id = ?', (session_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, session_id, session, ttl):
+        self._connect().execute(
+            'INSERT OR REPLACE INTO sessions (session_id, data, expires_at) VALUES (?, ?, ?)',
+            (session_id, json.dumps(session, ensure_ascii=False), time.time() + ttl)
+        )
+
+    def delete(self, session_id):
+        self._connect().execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+
+    def pop_expired(self, now=None):
+        now = time.time() if now is None else now
+        conn = self._connect()
+        # 여러 워커가 동시에 정리해도 같은 세션을 두 번 반환하지 않도록 쓰기 트랜잭션 안에서 처리
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                'SELECT session_id, data FROM sessions WHERE expires_at <= ?', (now,)
+            ).fetchall()
+            conn.execute('DELETE FROM sessions WHERE expires_at <= ?', (now,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return [(session_id, json.loads(data)) for session_id, data in rows]
+
+    def items(self):
+        rows = self._connect().execute(
+            'SELECT session_id, data, expires_at FROM sessions ORDER BY expires_at'
+        ).fetchall()
+        return [(session_id, json.loads(data), expires_at) for session_id, data, expires_at in rows]
+
+
+def create_session_store():
+    """SESSION_BACKEND 설정에 따른 세션 저장소"""
+    if SESSION_BACKEND == 'memory':
+        return MemorySessionStore()
+    if SESSION_BACKEND == 'sqlite':
+        return SQLiteSessionStore(SESSION_DB_PATH)
+    raise ValueError(f"Unknown SESSION_BACKEND: {SESSION_BACKEND}")
+
+
+SESSION_STORE = None
+_SESSION_STORE_LOCK = threading.Lock()
+
+
+def get_session_store():
+    """
+    세션 저장소 (최초 사용 시 생성)
+    import 만으로 SESSION_DB_PATH 를 만들지 않도록 지연 생성 (cli.py, 테스트 등)
+    """
+    global SESSION_STORE
+    if SESSION_STORE is None:
+        with _SESSION_STORE_LOCK:
+            if SESSION_STORE is None:
+                SESSION_STORE = create_session_store()
+    return SESSION_STORE
 
 
 # ==================== UTILITY FUNCTIONS ====================
@@ -94,49 +546,3168 @@ def sanitize_filename(filename, max_length=200):
     return safe_name
 
 
-def handle_duplicate_filename(filename, existing_names):
-    """
-    파일명 중복 처리: filename(1), filename(2), ...
-    """
-    if filename not in existing_names:
-        return filename
+def handle_duplicate_filename(filename, existing_names):
+    """
+    파일명 중복 처리: filename(1), filename(2), ...
+    """
+    if filename not in existing_names:
+        return filename
+
+    if '.' in filename:
+        base, ext = filename.rsplit('.', 1)
+        ext = f".{ext}"
+    else:
+        base, ext = filename, ''  # 확장자 없는 이름 (예: 일괄 분리 ZIP 폴더명)
+    counter = 1
+
+    while True:
+        new_name = f"{base}({counter}){ext}"
+        if new_name not in existing_names:
+            return new_name
+        counter += 1
+
+
+def file_sha256(path):
+    """파일 SHA-256 (COPY_CHUNK_SIZE 단위로 읽음)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_stream(stream, path, mode='wb', digest=None):
+    """
+    스트림을 파일에 COPY_CHUNK_SIZE 단위로 기록하며 해시 갱신
+    반환: (기록 bytes, digest)
+    """
+    digest = digest or hashlib.sha256()
+    written = 0
+    with open(path, mode) as f:
+        for chunk in iter(lambda: stream.read(COPY_CHUNK_SIZE), b''):
+            f.write(chunk)
+            digest.update(chunk)
+            written += len(chunk)
+    return written, digest
+
+
+def cleanup_old_sessions():
+    """
+    만료(1시간)된 세션 파일 삭제
+    """
+    now = datetime.now()
+
+    for sid, session in get_session_store().pop_expired():
+        temp_path = session.get('temp_dir')
+        if temp_path and os.path.exists(temp_path):
+            try:
+                shutil.rmtree(temp_path, ignore_errors=True)
+                logger.info(f"Cleaned up session: {sid}")
+            except Exception as e:
+                logger.error(f"Failed to cleanup {sid}: {str(e)}")
+
+    # 완료 후 오래된 작업 기록 정리 (결과 파일은 세션 디렉토리와 함께 삭제됨)
+    with JOBS_LOCK:
+        for job_id, job in list(JOBS.items()):
+            if job['status'] in JOB_FINAL_STATES and now - job['created_at'] > timedelta(seconds=TEMP_CLEANUP_INTERVAL):
+                JOBS.pop(job_id, None)
+
+
+def _path_size(path):
+    """디렉토리 전체 크기 (bytes)"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _last_modified(path):
+    """디렉토리와 직속 항목 중 가장 최근 수정 시각 (진행 중 분할 업로드 판별용)"""
+    latest = os.path.getmtime(path)
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                latest = max(latest, entry.stat().st_mtime)
+            except OSError:
+                pass
+    return latest
+
+
+def cleanup_orphan_dirs(now=None):
+    """
+    세션 저장소에 없는 excel_splitter_* 임시 디렉토리와 취소 표시 파일 삭제 (비정상 종료/재시작 후 남은 것)
+    진행 중인 분할 업로드를 보호하기 위해 TEMP_CLEANUP_INTERVAL 동안 수정이 없던 것만 삭제
+    """
+    now = time.time() if now is None else now
+    temp_root = tempfile.gettempdir()
+    known = {session_id for session_id, _, _ in get_session_store().items()}
+
+    for name in os.listdir(temp_root):
+        path = os.path.join(temp_root, name)
+        if not name.startswith(SESSION_DIR_PREFIX) or name in known:
+            continue
+        # 워커가 죽어 release_cancel_marker() 가 지우지 못한 취소 표시 파일
+        is_marker = name.startswith(CANCEL_MARKER_PREFIX) and os.path.isfile(path)
+        if not is_marker and not os.path.isdir(path):
+            continue
+        try:
+            modified = os.path.getmtime(path) if is_marker else _last_modified(path)
+            if now - modified < TEMP_CLEANUP_INTERVAL:
+                continue
+            if is_marker:
+                os.remove(path)
+        except OSError:
+            continue
+        if is_marker:
+            logger.info(f"Cleaned up stale cancel marker: {name}")
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        logger.info(f"Cleaned up orphan temp dir: {name}")
+
+
+def enforce_disk_budget():
+    """세션 임시 파일 총량이 TEMP_DISK_BUDGET_BYTES 를 넘으면 오래된 세션부터 삭제"""
+    if TEMP_DISK_BUDGET_BYTES <= 0:
+        return
+
+    # 만료 시각(= 생성 순) 오름차순, 작업 기록(job:*)은 제외
+    sessions = [entry for entry in get_session_store().items() if 'temp_dir' in entry[1]]
+    sizes = [_path_size(session['temp_dir']) if os.path.isdir(session.get('temp_dir', '')) else 0
+             for _, session, _ in sessions]
+    total = sum(sizes)
+
+    for (session_id, session, _), size in zip(sessions, sizes):
+        if total <= TEMP_DISK_BUDGET_BYTES:
+            break
+        get_session_store().delete(session_id)
+        shutil.rmtree(session['temp_dir'], ignore_errors=True)
+        total -= size
+        logger.warning(f"Disk budget exceeded, evicted session: {session_id} ({size} bytes)")
+
+
+def janitor_sweep():
+    """정리 1회: 만료 세션 → 고아 디렉토리 → 디스크 예산 → 사라진 업로드의 메모리 상태"""
+    for step in (cleanup_old_sessions, cleanup_orphan_dirs, enforce_disk_budget, prune_upload_state):
+        try:
+            step()
+        except Exception as e:
+            logger.error(f"Janitor {step.__name__} failed: {str(e)}")
+
+
+_JANITOR_THREAD = None
+_JANITOR_LOCK = threading.Lock()
+
+
+def start_janitor():
+    """백그라운드 정리 스레드 기동 (프로세스당 1회)"""
+    global _JANITOR_THREAD
+
+    with _JANITOR_LOCK:
+        if _JANITOR_THREAD is not None:
+            return
+
+        def run():
+            while True:
+                janitor_sweep()
+                time.sleep(JANITOR_INTERVAL)
+
+        _JANITOR_THREAD = threading.Thread(target=run, name='temp-janitor', daemon=True)
+        _JANITOR_THREAD.start()
+        logger.info(f"Temp janitor started: interval={JANITOR_INTERVAL}s, budget={TEMP_DISK_BUDGET_BYTES} bytes")
+
+
+# ==================== XLS CONVERSION ====================
+# .xls(BIFF) 업로드는 업로드 시 1회 xlsx 로 변환해 세션에 저장 (이후 분리는 변환본만 사용)
+
+OLE2_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+# BIFF 테두리 선 종류 → openpyxl border_style
+XLS_BORDER_STYLES = {
+    1: 'thin', 2: 'medium', 3: 'dashed', 4: 'dotted', 5: 'thick', 6: 'double', 7: 'hair',
+    8: 'mediumDashed', 9: 'dashDot', 10: 'mediumDashDot', 11: 'dashDotDot',
+    12: 'mediumDashDotDot', 13: 'slantDashDot',
+}
+XLS_HORIZONTAL_ALIGNMENTS = {
+    1: 'left', 2: 'center', 3: 'right', 4: 'fill', 5: 'justify', 6: 'centerContinuous', 7: 'distributed',
+}
+XLS_VERTICAL_ALIGNMENTS = {0: 'top', 1: 'center', 2: 'bottom', 3: 'justify', 4: 'distributed'}
+
+
+def is_xls_file(path):
+    """OLE2(BIFF .xls) 파일 여부 (확장자가 아닌 파일 시그니처로 판단)"""
+    with open(path, 'rb') as f:
+        return f.read(len(OLE2_SIGNATURE)) == OLE2_SIGNATURE
+
+
+def _xls_color(book, colour_index):
+    """BIFF 색 인덱스 → ARGB (자동/미정의 색은 None)"""
+    rgb = book.colour_map.get(colour_index)
+    if not rgb:
+        return None
+    return 'FF{:02X}{:02X}{:02X}'.format(*rgb)
+
+
+def _xls_style(book, xf_index):
+    """
+    BIFF XF 레코드 → openpyxl 스타일 속성 dict (기본 서식이면 빈 dict)
+    글꼴/채우기(단색)/테두리/정렬/표시 형식만 변환
+    """
+    xf = book.xf_list[xf_index]
+    style = {}
+
+    number_format = book.format_map[xf.format_key].format_str
+    if number_format and number_format != 'General':
+        style['number_format'] = number_format
+
+    font = book.font_list[xf.font_index]
+    if font.bold or font.italic or font.underline_type or font.struck_out or _xls_color(book, font.colour_index):
+        style['font'] = Font(
+            name=font.name,
+            size=font.height / 20,
+            bold=bool(font.bold),
+            italic=bool(font.italic),
+            underline='single' if font.underline_type else None,
+            strike=bool(font.struck_out),
+            color=_xls_color(book, font.colour_index),
+        )
+
+    if xf.background.fill_pattern == 1:
+        color = _xls_color(book, xf.background.pattern_colour_index)
+        if color:
+            style['fill'] = PatternFill(fill_type='solid', fgColor=color)
+
+    border = xf.border
+    sides = {}
+    for side in ('left', 'right', 'top', 'bottom'):
+        line_style = XLS_BORDER_STYLES.get(getattr(border, f'{side}_line_style'))
+        if line_style:
+            sides[side] = Side(style=line_style, color=_xls_color(book, getattr(border, f'{side}_colour_index')))
+    if sides:
+        style['border'] = Border(**sides)
+
+    alignment = xf.alignment
+    horizontal = XLS_HORIZONTAL_ALIGNMENTS.get(alignment.hor_align)
+    vertical = XLS_VERTICAL_ALIGNMENTS.get(alignment.vert_align)
+    if horizontal or alignment.text_wrapped or vertical not in (None, 'bottom'):
+        style['alignment'] = Alignment(horizontal=horizontal, vertical=vertical,
+                                       wrap_text=bool(alignment.text_wrapped))
+
+    return style
+
+
+def _xls_value(book, cell_type, value):
+    """BIFF 셀 값 → openpyxl 값 (수식은 마지막 계산 결과만 남음)"""
+    if cell_type == xlrd.XL_CELL_NUMBER:
+        return int(value) if value.is_integer() else value
+    if cell_type == xlrd.XL_CELL_DATE:
+        try:
+            return xlrd.xldate.xldate_as_datetime(value, book.datemode)
+        except (ValueError, OverflowError, xlrd.xldate.XLDateError):
+            return value
+    if cell_type == xlrd.XL_CELL_BOOLEAN:
+        return bool(value)
+    if cell_type == xlrd.XL_CELL_ERROR:
+        return xlrd.error_text_from_code.get(value, '#N/A')
+    if cell_type == xlrd.XL_CELL_TEXT:
+        return value
+    return None
+
+
+def convert_xls(source_path, output_path):
+    """
+    .xls → .xlsx 변환 (write_only 로 시트별 순차 기록)
+    - 값, 스타일(XF 별 1회 생성 후 재사용), 열 너비/숨김, 병합 범위, 시트 숨김 상태 유지
+    - 수식은 BIFF 에서 복원할 수 없어 마지막 계산 결과 값으로 저장
+    반환: 변환한 시트 수
+    """
+    book = xlrd.open_workbook(source_path, formatting_info=True, on_demand=True)
+    try:
+        workbook = openpyxl.Workbook(write_only=True)
+        xf_styles = {}  # XF index → 대상 워크북 StyleArray (None: 기본 서식)
+
+        for sheet_index in range(book.nsheets):
+            sheet = book.sheet_by_index(sheet_index)
+            new_sheet = workbook.create_sheet(title=sheet.name[:31])
+            if sheet.visibility:
+                new_sheet.sheet_state = 'hidden' if sheet.visibility == 1 else 'veryHidden'
+
+            columns = [
+                {'min': col + 1, 'max': col + 1, 'width': info.width / 256, 'hidden': bool(info.hidden)}
+                for col, info in sorted(sheet.colinfo_map.items())
+            ]
+            merged = [
+                f"{get_column_letter(clo + 1)}{rlo + 1}:{get_column_letter(chi)}{rhi}"
+                for rlo, rhi, clo, chi in sheet.merged_cells
+                if rhi - rlo > 1 or chi - clo > 1
+            ]
+            _apply_streaming_layout(new_sheet, columns, merged)
+
+            for row_index in range(sheet.nrows):
+                values = []
+                for col_index, (cell_type, value) in enumerate(zip(sheet.row_types(row_index),
+                                                                   sheet.row_values(row_index))):
+                    value = _xls_value(book, cell_type, value)
+                    xf_index = sheet.cell_xf_index(row_index, col_index)
+
+                    if xf_index not in xf_styles:
+                        style = _xls_style(book, xf_index)
+                        if style:
+                            styled_cell = WriteOnlyCell(new_sheet)
+                            for attr, style_value in style.items():
+                                setattr(styled_cell, attr, style_value)
+                            xf_styles[xf_index] = styled_cell._style
+                        else:
+                            xf_styles[xf_index] = None
+
+                    if xf_styles[xf_index] is None:
+                        values.append(value)
+                    else:
+                        new_cell = WriteOnlyCell(new_sheet, value=value)
+                        new_cell._style = copy(xf_styles[xf_index])
+                        values.append(new_cell)
+                new_sheet.append(values)
+
+            book.unload_sheet(sheet_index)
+
+        workbook.save(output_path)
+        return book.nsheets
+    finally:
+        book.release_resources()
+
+
+def convert_xls_upload(path):
+    """
+    업로드된 .xls 를 같은 디렉토리의 .xlsx 로 변환하고 원본 삭제
+    - 원본 이름이 이미 .xlsx 이면 (.xlsx 이름의 BIFF 파일, secure_filename 이 'xlsx' 로 바꾼 한글 파일명)
+      <이름>.converted.xlsx 에 기록 (원본을 덮어쓴 뒤 삭제하지 않도록)
+    반환: 변환본 경로 (세션 temp_file 로 사용)
+    """
+    stem = os.path.splitext(path)[0]
+    output_path = stem + '.xlsx'
+    if os.path.normcase(os.path.abspath(output_path)) == os.path.normcase(os.path.abspath(path)):
+        output_path = stem + '.converted.xlsx'
+    temp_path = output_path + '.converting'
+    try:
+        sheet_count = convert_xls(path, temp_path)
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    os.remove(path)
+    logger.info(f"XLS converted: {os.path.basename(path)} -> {os.path.basename(output_path)} ({sheet_count} sheets)")
+    return output_path
+
+
+# ==================== COMPRESSION ====================
+# 출력 압축 정책: 시트별 xlsx(XLSX_COMPRESSION)와 결과 ZIP 멤버(ZIP_COMPRESSION)에 각각 적용
+# - store: 압축 안 함 / fast: deflate 1 / max: deflate 9
+# - auto: xlsx 는 원본의 압축 데이터를 재압축 없이 복사(원시 엔진), ZIP 은 압축 효과가 없는 멤버(xlsx 등)를 저장만 함
+
+COMPRESSION_LEVELS = {'fast': 1, 'max': 9}
+DEFAULT_COMPRESSION_LEVEL = 6  # zlib 기본 수준 (auto 에서 압축하는 경우)
+
+_COMPRESS_POOL = None
+_COMPRESS_POOL_LOCK = threading.Lock()
+
+
+def compression_settings(policy, path=None):
+    """
+    압축 정책 → (compress_type, compresslevel)
+    auto 이고 path 가 있으면 앞부분(COMPRESSION_PROBE_BYTES)을 빠르게 시험 압축해
+    COMPRESSION_MIN_SAVING 이상 줄지 않으면 저장(store) - 이미 deflate 된 xlsx 를 다시 압축하지 않음
+    """
+    if policy == 'store':
+        return zipfile.ZIP_STORED, None
+    if policy in COMPRESSION_LEVELS:
+        return zipfile.ZIP_DEFLATED, COMPRESSION_LEVELS[policy]
+    if path is not None:
+        with open(path, 'rb') as f:
+            sample = f.read(COMPRESSION_PROBE_BYTES)
+        if len(zlib.compress(sample, 1)) > len(sample) * (1 - COMPRESSION_MIN_SAVING):
+            return zipfile.ZIP_STORED, None
+    return zipfile.ZIP_DEFLATED, DEFAULT_COMPRESSION_LEVEL
+
+
+def save_workbook(workbook, path):
+    """openpyxl 워크북 저장 (XLSX_COMPRESSION 적용, auto 는 openpyxl 기본과 같은 deflate 6)"""
+    compress_type, level = compression_settings(XLSX_COMPRESSION)
+    archive = zipfile.ZipFile(path, 'w', compress_type, allowZip64=True, compresslevel=level)
+    try:
+        ExcelWriter(workbook, archive).save()
+    except Exception:
+        archive.close()
+        raise
+
+
+# raw_zip_member 가 사용하는 zipfile 내부 속성 (공개 API 가 없음)
+_RAW_ZIP_ATTRIBUTES = ('fp', 'filelist', 'NameToInfo', 'start_dir', '_writing', '_seekable', '_writecheck',
+                       '_didModify')
+
+
+def raw_zip_supported(zf):
+    """
+    raw_zip_member 를 쓸 수 있는지 (zipfile 내부 속성이 모두 있는지)
+    False 이면 호출 측은 압축 해제 → 재압축 경로를 사용 (내부 구현이 바뀐 Python 버전 대비)
+    """
+    return hasattr(zipfile.ZipInfo, 'FileHeader') and all(hasattr(zf, name) for name in _RAW_ZIP_ATTRIBUTES)
+
+
+@contextmanager
+def raw_zip_member(zf, zinfo):
+    """
+    이미 압축된 데이터를 재압축 없이 ZIP 멤버로 기록
+    - zinfo: compress_type, file_size, compress_size, CRC 를 채운 ZipInfo
+    - yield 된 스트림에 압축 데이터를 compress_size 만큼 기록
+    zipfile 에 공개 API 가 없어 ZipFile.open(mode='w') 의 헤더 기록 절차를 그대로 따른다.
+    (호출 전에 raw_zip_supported 로 확인, CPython 3.8 ~ 3.13 의 zipfile 기준)
+    블록 안에서 예외가 나면 기록하던 멤버는 central directory 에 넣지 않고 ZipFile 상태를 되돌린다.
+    """
+    if not raw_zip_supported(zf):
+        raise NotImplementedError('raw ZIP member write is not supported by this zipfile version')
+    if zf._writing:
+        raise ValueError("Can't write a raw member while another write handle is open")
+    zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+    zinfo.flag_bits = 0x00  # 크기/CRC 를 헤더에 기록하므로 data descriptor 없음
+    if not zinfo.external_attr:
+        zinfo.external_attr = 0o600 << 16
+    if zf._seekable:
+        zf.fp.seek(zf.start_dir)
+    zinfo.header_offset = zf.fp.tell()
+    zf._writecheck(zinfo)
+    zf._didModify = True
+    zf._writing = True  # 기록 중 다른 멤버 기록 방지 (ZipFile.open(mode='w') 와 동일)
+    try:
+        zf.fp.write(zinfo.FileHeader(zip64))
+        yield zf.fp
+    except BaseException:
+        if zf._seekable:
+            # 기록하다 만 멤버를 잘라내고 그 자리부터 다음 멤버/central directory 기록
+            zf.fp.seek(zinfo.header_offset)
+            zf.fp.truncate()
+            zf.start_dir = zinfo.header_offset
+        else:
+            # 이미 내보낸 바이트는 되돌릴 수 없으므로 그 뒤에 이어서 기록 (central directory 에서 제외돼 무시됨)
+            zf.start_dir = zf.fp.tell()
+        raise
+    else:
+        zf.filelist.append(zinfo)
+        zf.NameToInfo[zinfo.filename] = zinfo
+        zf.start_dir = zf.fp.tell()
+    finally:
+        zf._writing = False
+
+
+def iter_raw_member(zf, info):
+    """ZIP 멤버의 압축 데이터를 압축 해제 없이 COPY_CHUNK_SIZE 단위로 읽음"""
+    with open(zf.filename, 'rb') as f:
+        f.seek(info.header_offset)
+        header = f.read(30)
+        if header[:4] != b'PK\x03\x04':
+            raise zipfile.BadZipFile(f"Bad local file header: {info.filename}")
+        name_length, extra_length = struct.unpack('<HH', header[26:30])
+        f.seek(name_length + extra_length, os.SEEK_CUR)
+        remaining = info.compress_size
+        while remaining:
+            chunk = f.read(min(COPY_CHUNK_SIZE, remaining))
+            if not chunk:
+                raise zipfile.BadZipFile(f"Truncated member: {info.filename}")
+            remaining -= len(chunk)
+            yield chunk
+
+
+def deflate_file(path, level):
+    """
+    파일을 raw deflate 로 압축해 path + '.deflate' 에 기록 (압축 스레드 풀에서 실행)
+    반환: (압축 파일 경로, CRC, 원본 크기, 압축 크기, 소요 초)
+    """
+    start = time.perf_counter()
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    crc = 0
+    size = 0
+    deflated_path = path + '.deflate'
+    with open(path, 'rb') as src, open(deflated_path, 'wb') as dst:
+        for chunk in iter(lambda: src.read(COPY_CHUNK_SIZE), b''):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            dst.write(compressor.compress(chunk))
+        dst.write(compressor.flush())
+        compressed = dst.tell()
+    return deflated_path, crc, size, compressed, time.perf_counter() - start
+
+
+def get_compress_pool():
+    """
+    ZIP 멤버 병렬 압축 스레드 풀 (zlib 은 압축 중 GIL 을 놓으므로 스레드로 여러 코어 사용)
+    COMPRESS_WORKERS 가 1 이하이면 None (응답 스레드에서 순차 압축)
+    """
+    global _COMPRESS_POOL
+    if COMPRESS_WORKERS <= 1:
+        return None
+    with _COMPRESS_POOL_LOCK:
+        if _COMPRESS_POOL is None:
+            _COMPRESS_POOL = ThreadPoolExecutor(max_workers=COMPRESS_WORKERS, thread_name_prefix='compress')
+        return _COMPRESS_POOL
+
+
+# ==================== RAW XML SPLIT ENGINE ====================
+# openpyxl 셀 모델을 거치지 않고 zip/XML 수준에서 시트 파트를 그대로 복사한다.
+# 처리할 수 없는 워크북은 RawSplitUnsupported 를 던지고 openpyxl 경로로 대체된다.
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_DOC_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NS_PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+NS_CONTENT_TYPES = 'http://schemas.openxmlformats.org/package/2006/content-types'
+
+REL_OFFICE_DOCUMENT = NS_DOC_REL + '/officeDocument'
+REL_WORKSHEET = NS_DOC_REL + '/worksheet'
+REL_STYLES = NS_DOC_REL + '/styles'
+REL_THEME = NS_DOC_REL + '/theme'
+REL_SHARED_STRINGS = NS_DOC_REL + '/sharedStrings'
+
+CT_WORKBOOK = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml'
+CT_WORKSHEET = 'application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml'
+CT_STYLES = 'application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml'
+CT_THEME = 'application/vnd.openxmlformats-officedocument.theme+xml'
+CT_SHARED_STRINGS = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml'
+CT_RELS = 'application/vnd.openxmlformats-package.relationships+xml'
+
+# 출력 파일 내 고정 파트 경로: (원본 관계 타입, 출력 경로, content type)
+RAW_SHARED_PARTS = [
+    (REL_STYLES, 'xl/styles.xml', CT_STYLES),
+    (REL_THEME, 'xl/theme/theme1.xml', CT_THEME),
+    (REL_SHARED_STRINGS, 'xl/sharedStrings.xml', CT_SHARED_STRINGS),
+]
+
+
+DIMENSION_PATTERN = re.compile(rb'<(?:\w+:)?dimension\b[^>]*\bref="([^"]+)"')
+LAYOUT_PATTERN = re.compile(rb'<(?:\w+:)?(col|mergeCell)\b([^>]*)>')
+ATTRIBUTE_PATTERN = re.compile(rb'(\w+)="([^"]*)"')
+
+
+class RawSplitUnsupported(Exception):
+    """원시 XML 엔진이 처리할 수 없는 워크북/시트"""
+
+
+def _xml_attr(value):
+    """XML 속성값 (따옴표 포함) 이스케이프"""
+    return '"' + escape(value, {'"': '&quot;'}) + '"'
+
+
+def _resolve_part(base_dir, target):
+    """관계(Target)를 zip 내부 경로로 변환"""
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join(base_dir, target))
+
+
+def _rels_path(part):
+    """파트의 관계 파일 경로: xl/workbook.xml -> xl/_rels/workbook.xml.rels"""
+    directory, name = posixpath.split(part)
+    return posixpath.join(directory, '_rels', name + '.rels')
+
+
+def _read_rels(zf, part):
+    """
+    파트의 관계 목록 읽기
+    반환: [{'id', 'type', 'target', 'external'}, ...]
+    """
+    try:
+        data = zf.read(_rels_path(part))
+    except KeyError:
+        return []
+
+    base_dir = posixpath.dirname(part)
+    rels = []
+    for rel in ET.fromstring(data).iter(f'{{{NS_PKG_REL}}}Relationship'):
+        external = rel.get('TargetMode') == 'External'
+        target = rel.get('Target', '')
+        rels.append({
+            'id': rel.get('Id'),
+            'type': rel.get('Type'),
+            'target': target if external else _resolve_part(base_dir, target),
+            'external': external,
+        })
+    return rels
+
+
+def _dimension_fields(dimension):
+    """<dimension ref> → {'dimension', 'rows', 'columns'} (rows/columns 는 추정치, 해석 불가 시 None)"""
+    fields = {'dimension': dimension, 'rows': None, 'columns': None}
+    if dimension:
+        try:
+            min_col, min_row, max_col, max_row = range_boundaries(dimension)
+            fields['rows'] = max_row - min_row + 1
+            fields['columns'] = max_col - min_col + 1
+        except (ValueError, TypeError):
+            pass
+    return fields
+
+
+def _string_item_text(element):
+    """<si>/<is> 요소의 텍스트 (서식 있는 텍스트는 run 을 이어 붙이고, 윗주(rPh)는 제외)"""
+    if element is None:
+        return None
+    tag_t = f'{{{NS_MAIN}}}t'
+    tag_r = f'{{{NS_MAIN}}}r'
+    parts = []
+    for child in element:
+        if child.tag == tag_t:
+            parts.append(child.text or '')
+        elif child.tag == tag_r:
+            t = child.find(tag_t)
+            if t is not None:
+                parts.append(t.text or '')
+    return ''.join(parts)
+
+
+SHARED_STRING_ITEM_PATTERN = re.compile(rb'<(?:\w+:)?si\b[^>]*?(?:/>|>.*?</(?:\w+:)?si>)', re.S)
+SST_START_PATTERN = re.compile(rb'<((?:\w+:)?sst)\b[^>]*>')
+SST_COUNT_PATTERN = re.compile(rb'\s(?:count|uniqueCount)="[^"]*"')
+XML_ENCODING_PATTERN = re.compile(rb'<\?xml[^>]*\bencoding=["\']([^"\']+)')
+# 공유 문자열 셀 시작 태그 ~ <v> 인덱스 (CT_Cell 자식 순서: f, v, is)
+SHARED_CELL_PATTERN = re.compile(
+    rb'(<(?:\w+:)?c\b[^>]*?\bt=["\']s["\'][^>]*(?<!/)>\s*'
+    rb'(?:<(?:\w+:)?f\b[^>]*?(?:/>|>[^<]*</(?:\w+:)?f>)\s*)?<(?:\w+:)?v>)\s*(\d+)\s*(?=</)'
+)
+CELL_START_PATTERN = re.compile(rb'<(?:\w+:)?c[\s>/]')
+CELL_END_PATTERN = re.compile(rb'</(?:\w+:)?c>')
+CELL_SCAN_WINDOW = 64 * 1024  # 청크 경계 판단 시 뒤에서부터 살펴보는 범위 (공유 문자열 셀은 이보다 훨씬 짧음)
+
+
+class SharedStringTable:
+    """
+    sharedStrings.xml 의 <si> 원문 테이블 (요청/워커당 1회 파싱, 선택 시트마다 재사용)
+    - data: <si> 원문을 이어 붙인 bytes, offsets: 항목 경계 array('Q') (항목 수 + 1)
+    - 서식 있는 텍스트(run)/윗주 등은 원문 그대로 유지 (문자열 객체를 만들지 않음)
+    """
+
+    def __init__(self, root_tag, data, offsets):
+        self.root_tag = root_tag
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @classmethod
+    def parse(cls, zf, part):
+        """
+        sharedStrings 파트를 청크 단위 정규식 스캔으로 읽기 (XML 트리는 만들지 않음)
+        UTF-8 이 아닌 인코딩이면 None (원본 그대로 복사)
+        """
+        root_tag = None
+        data = bytearray()
+        offsets = array('Q', [0])
+        carry = b''
+
+        with zf.open(part) as reader:
+            while True:
+                chunk = reader.read(COPY_CHUNK_SIZE)
+                buffer = carry + chunk
+                position = 0
+                if root_tag is None:
+                    match = SST_START_PATTERN.search(buffer)
+                    if match is None:
+                        if not chunk:
+                            return None
+                        carry = buffer
+                        continue
+                    encoding = XML_ENCODING_PATTERN.search(buffer, 0, match.start())
+                    if encoding and encoding.group(1).lower().replace(b'-', b'') != b'utf8':
+                        return None
+                    root_tag = match.group(0)
+                    position = match.end()
+                for match in SHARED_STRING_ITEM_PATTERN.finditer(buffer, position):
+                    data += match.group(0)
+                    offsets.append(len(data))
+                    position = match.end()
+                carry = buffer[position:]
+                if not chunk:
+                    break
+
+        return cls(root_tag, bytes(data), offsets)
+
+    def write_subset(self, zout, dst, used, references):
+        """
+        used(원본 인덱스, 새 인덱스 순서)의 항목만 담은 sharedStrings 파트 기록
+        - references: 시트의 공유 문자열 셀 수 (count 속성)
+        """
+        name = SST_START_PATTERN.match(self.root_tag).group(1)
+        head = SST_COUNT_PATTERN.sub(b'', self.root_tag).rstrip(b'/>').rstrip()
+        with zout.open(dst, 'w', force_zip64=len(self.data) >= zipfile.ZIP64_LIMIT) as writer:
+            writer.write(head + b' count="%d" uniqueCount="%d">' % (references, len(used)))
+            items = []
+            size = 0
+            for index in used:
+                items.append(self.data[self.offsets[index]:self.offsets[index + 1]])
+                size += len(items[-1])
+                if size >= COPY_CHUNK_SIZE:
+                    writer.write(b''.join(items))
+                    items, size = [], 0
+            items.append(b'</' + name + b'>')
+            writer.write(b''.join(items))
+
+
+def _cell_safe_cut(buffer):
+    """
+    buffer 중 공유 문자열 셀이 잘리지 않는 처리 가능 길이
+    - 마지막 셀이 끝나지 않았으면 그 셀 시작 전까지, 끝났으면 뒤따르는 (잘렸을 수 있는) 태그 전까지
+    """
+    last_start = None
+    for last_start in CELL_START_PATTERN.finditer(buffer, max(0, len(buffer) - CELL_SCAN_WINDOW)):
+        pass
+    tail = buffer.rfind(b'<')
+    if last_start is None:
+        return tail if tail >= 0 else len(buffer)
+
+    start = last_start.start()
+    tag_end = buffer.find(b'>', start)
+    if tag_end < 0:
+        return start
+    if buffer[tag_end - 1:tag_end] == b'/':
+        cell_end = tag_end + 1
+    else:
+        match = CELL_END_PATTERN.search(buffer, tag_end)
+        if match is None:
+            return start
+        cell_end = match.end()
+    return max(cell_end, tail)
+
+
+class RawWorkbook:
+    """
+    xlsx 패키지를 zip 수준에서 읽는 워크북 핸들
+    - workbook.xml / 관계 파일만 파싱 (셀 데이터는 읽지 않음)
+    - split_sheet(): 시트 1개짜리 xlsx 를 원본 파트 복사로 생성
+    """
+
+    def __init__(self, path):
+        try:
+            self.zf = zipfile.ZipFile(path)
+        except (zipfile.BadZipFile, OSError) as e:
+            raise RawSplitUnsupported(f"not a zip package: {e}")
+
+        try:
+            self._load_index()
+        except RawSplitUnsupported:
+            self.zf.close()
+            raise
+        except (KeyError, ET.ParseError) as e:
+            self.zf.close()
+            raise RawSplitUnsupported(f"invalid workbook structure: {e}")
+
+    def _load_index(self):
+        root_rels = _read_rels(self.zf, '')
+        workbook_part = next(
+            (r['target'] for r in root_rels if r['type'] == REL_OFFICE_DOCUMENT),
+            'xl/workbook.xml'
+        )
+        self.workbook_part = workbook_part
+        self.workbook_root = ET.fromstring(self.zf.read(workbook_part))
+        self.workbook_rels = {r['id']: r for r in _read_rels(self.zf, workbook_part)}
+
+        self.sheets = []
+        sheets_el = self.workbook_root.find(f'{{{NS_MAIN}}}sheets')
+        if sheets_el is None:
+            raise RawSplitUnsupported("workbook has no <sheets>")
+
+        for index, sheet_el in enumerate(sheets_el.findall(f'{{{NS_MAIN}}}sheet')):
+            rel = self.workbook_rels.get(sheet_el.get(f'{{{NS_DOC_REL}}}id'), {})
+            self.sheets.append({
+                'index': index,
+                'name': sheet_el.get('name'),
+                'state': sheet_el.get('state', 'visible'),
+                'part': rel.get('target'),
+                'rel_type': rel.get('type'),
+            })
+
+    @property
+    def sheetnames(self):
+        return [s['name'] for s in self.sheets]
+
+    def _read_dimension(self, part):
+        """시트 XML 앞부분만 읽어 <dimension ref> 추출 (셀 데이터는 파싱하지 않음)"""
+        with self.zf.open(part) as reader:
+            head = reader.read(DIMENSION_PROBE_BYTES)
+        match = DIMENSION_PATTERN.search(head)
+        return match.group(1).decode('ascii', 'replace') if match else None
+
+    def _find_sheet(self, sheet_name):
+        sheet = next((s for s in self.sheets if s['name'] == sheet_name), None)
+        if sheet is None:
+            raise RawSplitUnsupported(f"sheet not found: {sheet_name}")
+        return sheet
+
+    def part_size(self, sheet_name):
+        """시트 XML 파트의 압축 해제 크기 (zip central directory 기준)"""
+        part = self._find_sheet(sheet_name)['part']
+        if part not in self.zf.NameToInfo:
+            return None
+        return self.zf.getinfo(part).file_size
+
+    def sheet_layout(self, sheet_name):
+        """
+        시트 XML 을 청크 단위 정규식 스캔으로 훑어 열 너비/병합 범위만 추출
+        (read_only 파서가 제공하지 않는 정보 - XML 트리는 만들지 않음)
+        반환: {'columns': [{'min', 'max', 'width', 'hidden'}, ...], 'merged': [ref, ...]}
+        """
+        part = self._find_sheet(sheet_name)['part']
+        layout = {'columns': [], 'merged': []}
+        carry = b''
+
+        with self.zf.open(part) as reader:
+            while True:
+                chunk = reader.read(COPY_CHUNK_SIZE)
+                buffer = carry + chunk
+                # 마지막 '>' 까지만 스캔 - 잘린 태그는 다음 청크와 합쳐서 처리
+                cut = len(buffer) if not chunk else buffer.rfind(b'>') + 1
+                for tag, attrs in LAYOUT_PATTERN.findall(buffer, 0, cut):
+                    values = {k.decode(): v.decode() for k, v in ATTRIBUTE_PATTERN.findall(attrs)}
+                    if tag == b'mergeCell':
+                        if values.get('ref'):
+                            layout['merged'].append(values['ref'])
+                    elif values.get('min') and values.get('max'):
+                        layout['columns'].append({
+                            'min': int(values['min']),
+                            'max': int(values['max']),
+                            'width': float(values['width']) if values.get('width') else None,
+                            'hidden': values.get('hidden') in ('1', 'true'),
+                        })
+                carry = buffer[cut:]
+                if not chunk:
+                    break
+
+        return layout
+
+    def sheet_info(self):
+        """
+        시트별 메타데이터 (workbook.xml + 시트 XML 헤더 + zip central directory)
+        반환: [{'name', 'hidden', 'dimension', 'rows', 'columns', 'size'}, ...]
+        - rows/columns: <dimension> 기준 추정치 (없으면 None)
+        - size: 시트 XML 파트의 압축 해제 크기 (bytes)
+        """
+        info = []
+        for sheet in self.sheets:
+            part = sheet['part']
+            entry = {
+                'name': sheet['name'],
+                'hidden': sheet['state'] != 'visible',
+                'dimension': None,
+                'rows': None,
+                'columns': None,
+                'size': None,
+            }
+
+            if part and part in self.zf.NameToInfo:
+                entry['size'] = self.zf.getinfo(part).file_size
+                entry.update(_dimension_fields(self._read_dimension(part)))
+
+            info.append(entry)
+        return info
+
+    def preview(self, sheet_name, max_rows, max_columns=PREVIEW_MAX_COLUMNS):
+        """
+        시트 앞부분 max_rows 행만 읽기 (시트 XML 을 iterparse 로 스트리밍, 필요한 행까지만 압축 해제)
+        - 공유 문자열은 미리보기에 나온 인덱스까지만 읽음
+        - 날짜 서식 셀은 datetime 으로 변환 (styles.xml 은 스타일 있는 숫자 셀이 있을 때만 읽음)
+        반환: {'dimension', 'rows', 'columns', 'data': [{'row', 'values'}], 'truncated_columns'}
+        """
+        sheet = self._find_sheet(sheet_name)
+        if sheet['rel_type'] != REL_WORKSHEET or sheet['part'] not in self.zf.NameToInfo:
+            raise RawSplitUnsupported(f"not a worksheet: {sheet_name}")
+
+        result = {'dimension': None, 'rows': None, 'columns': None, 'data': [], 'truncated_columns': False}
+        result.update(_dimension_fields(self._read_dimension(sheet['part'])))
+
+        tag_row = f'{{{NS_MAIN}}}row'
+        tag_c = f'{{{NS_MAIN}}}c'
+        tag_v = f'{{{NS_MAIN}}}v'
+        tag_is = f'{{{NS_MAIN}}}is'
+        shared_refs = []  # (values, 열 위치, 공유 문자열 인덱스)
+        numeric_refs = []  # (values, 열 위치, 스타일 id) - 날짜 서식 확인 대상
+
+        if max_rows > 0:
+            with self.zf.open(sheet['part']) as reader:
+                for _, element in ET.iterparse(reader, events=('end',)):
+                    if element.tag != tag_row:
+                        continue
+
+                    values = []
+                    next_column = 1
+                    for cell in element.iter(tag_c):
+                        ref = cell.get('r')
+                        column = column_index_from_string(ref.rstrip('0123456789')) if ref else next_column
+                        next_column = column + 1
+                        if column > max_columns:
+                            result['truncated_columns'] = True
+                            continue
+
+                        cell_type = cell.get('t', 'n')
+                        v = cell.find(tag_v)
+                        text = v.text if v is not None else None
+                        if cell_type == 'inlineStr':
+                            value = _string_item_text(cell.find(tag_is))
+                        elif text is None:
+                            value = None
+                        elif cell_type == 's':
+                            value = None
+                            shared_refs.append((values, column - 1, int(text)))
+                        elif cell_type == 'b':
+                            value = text == '1'
+                        elif cell_type in ('str', 'e'):
+                            value = text
+                        else:
+                            try:
+                                value = int(text)
+                            except ValueError:
+                                value = float(text)
+                            if cell.get('s', '0') != '0':
+                                numeric_refs.append((values, column - 1, int(cell.get('s'))))
+
+                        values.extend([None] * (column - 1 - len(values)))
+                        values.append(value)
+
+                    result['data'].append({'row': int(element.get('r') or len(result['data']) + 1), 'values': values})
+                    element.clear()
+                    if len(result['data']) >= max_rows:
+                        break
+
+        if shared_refs:
+            strings = self._shared_strings(max(index for _, _, index in shared_refs))
+            for values, position, index in shared_refs:
+                values[position] = strings[index] if index < len(strings) else None
+
+        if numeric_refs:
+            date_styles = self._date_style_ids()
+            if date_styles:
+                epoch = CALENDAR_MAC_1904 if self._date1904() else CALENDAR_WINDOWS_1900
+                for values, position, style_id in numeric_refs:
+                    if style_id in date_styles:
+                        try:
+                            values[position] = from_excel(values[position], epoch)
+                        except (ValueError, OverflowError):
+                            pass
+
+        return result
+
+    def _shared_strings(self, max_index):
+        """공유 문자열 0 ~ max_index 번만 읽기 (sharedStrings.xml 을 iterparse 로 앞부분만)"""
+        part = self._shared_part(REL_SHARED_STRINGS)
+        strings = []
+        if part is None:
+            return strings
+
+        tag_si = f'{{{NS_MAIN}}}si'
+        with self.zf.open(part) as reader:
+            for _, element in ET.iterparse(reader, events=('end',)):
+                if element.tag != tag_si:
+                    continue
+                strings.append(_string_item_text(element))
+                element.clear()
+                if len(strings) > max_index:
+                    break
+        return strings
+
+    def _date_style_ids(self):
+        """날짜/시간 표시 형식을 쓰는 cellXfs 인덱스 집합"""
+        part = self._shared_part(REL_STYLES)
+        if part is None:
+            return set()
+
+        root = ET.fromstring(self.zf.read(part))
+        formats = dict(BUILTIN_FORMATS)
+        num_fmts = root.find(f'{{{NS_MAIN}}}numFmts')
+        if num_fmts is not None:
+            for num_fmt in num_fmts.findall(f'{{{NS_MAIN}}}numFmt'):
+                formats[int(num_fmt.get('numFmtId', -1))] = num_fmt.get('formatCode', '')
+
+        date_styles = set()
+        cell_xfs = root.find(f'{{{NS_MAIN}}}cellXfs')
+        if cell_xfs is not None:
+            for index, xf in enumerate(cell_xfs.findall(f'{{{NS_MAIN}}}xf')):
+                if is_date_format(formats.get(int(xf.get('numFmtId', 0)), '')):
+                    date_styles.add(index)
+        return date_styles
+
+    def _date1904(self):
+        workbook_pr = self.workbook_root.find(f'{{{NS_MAIN}}}workbookPr')
+        return workbook_pr is not None and workbook_pr.get('date1904') in ('1', 'true')
+
+    def close(self):
+        self.zf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _raw_sheet_rels(self, sheet):
+        """원시 분리 가능 여부 확인 후 시트 관계 반환 (불가하면 RawSplitUnsupported)"""
+        if sheet['rel_type'] != REL_WORKSHEET or sheet['part'] not in self.zf.NameToInfo:
+            raise RawSplitUnsupported(f"not a plain worksheet: {sheet['name']}")
+
+        # 드로잉/댓글/표 등 내부 파트를 참조하는 시트는 지원하지 않음 (외부 하이퍼링크만 허용)
+        sheet_rels = _read_rels(self.zf, sheet['part'])
+        if any(not rel['external'] for rel in sheet_rels):
+            raise RawSplitUnsupported(f"sheet has embedded parts: {sheet['name']}")
+        return sheet_rels
+
+    def memory_profile(self, sheet_names):
+        """
+        메모리 추정용 파트 크기 (zip central directory 의 압축 해제 크기 - 시트 XML 은 읽지 않음)
+        반환: {
+            'worksheets': 전체 시트 XML 합계 (openpyxl 전체 로드는 선택과 무관하게 모든 시트를 파싱),
+            'shared_strings': sharedStrings 크기,
+            'fallback_sheets': sheet_names 중 원시 엔진으로 분리할 수 없는 시트 수
+        }
+        """
+        shared_strings = self._shared_part(REL_SHARED_STRINGS)
+        fallback_sheets = 0
+        for sheet_name in sheet_names:
+            try:
+                self._raw_sheet_rels(self._find_sheet(sheet_name))
+            except RawSplitUnsupported:
+                fallback_sheets += 1
+        return {
+            'worksheets': sum(self.zf.getinfo(sheet['part']).file_size for sheet in self.sheets
+                              if sheet['part'] in self.zf.NameToInfo),
+            'shared_strings': self.zf.getinfo(shared_strings).file_size if shared_strings else 0,
+            'fallback_sheets': fallback_sheets,
+        }
+
+    def _shared_part(self, rel_type):
+        for rel in self.workbook_rels.values():
+            if rel['type'] == rel_type and not rel['external'] and rel['target'] in self.zf.NameToInfo:
+                return rel['target']
+        return None
+
+    def _copy_part(self, zout, src, dst, cancel_token=None):
+        """
+        파트 복사 (메모리 사용량 = COPY_CHUNK_SIZE, 청크마다 cancel_token 확인)
+        - XLSX_COMPRESSION=auto 이고 원본이 deflate 이면 압축 데이터를 그대로 복사 (재압축 없음)
+        - 그 외에는 압축 해제 → zout 의 압축 방식으로 재압축
+        """
+        info = self.zf.getinfo(src)
+        if XLSX_COMPRESSION == 'auto' and info.compress_type == zipfile.ZIP_DEFLATED and not info.flag_bits & 0x1 \
+                and raw_zip_supported(zout):
+            zinfo = zipfile.ZipInfo(dst, date_time=info.date_time)
+            zinfo.compress_type = info.compress_type
+            zinfo.file_size, zinfo.compress_size, zinfo.CRC = info.file_size, info.compress_size, info.CRC
+            with raw_zip_member(zout, zinfo) as writer:
+                for chunk in iter_raw_member(self.zf, info):
+                    if cancel_token is not None:
+                        cancel_token.check()
+                    writer.write(chunk)
+            return
+        with self.zf.open(info) as reader, \
+                zout.open(dst, 'w', force_zip64=info.file_size >= zipfile.ZIP64_LIMIT) as writer:
+            for chunk in iter(lambda: reader.read(COPY_CHUNK_SIZE), b''):
+                if cancel_token is not None:
+                    cancel_token.check()
+                writer.write(chunk)
+
+    def shared_string_table(self, cache=None):
+        """
+        공유 문자열 부분 집합 출력용 SharedStringTable
+        - sharedStrings 가 없거나 SHARED_STRINGS_SUBSET_BYTES 미만이면 None (원본 그대로 복사가 더 쌈)
+        - cache: dict 지정 시 같은 원본 파일이면 파싱 결과 재사용 (source_cache 와 같은 dict)
+        """
+        part = self._shared_part(REL_SHARED_STRINGS)
+        if part is None or self.zf.getinfo(part).file_size < SHARED_STRINGS_SUBSET_BYTES:
+            return None
+
+        key = (self.zf.filename, os.path.getmtime(self.zf.filename)) if self.zf.filename else None
+        if cache is not None and key is not None and cache.get('shared_strings_key') == key:
+            return cache['shared_strings']
+        table = SharedStringTable.parse(self.zf, part)
+        if cache is not None and key is not None:
+            cache['shared_strings'] = table
+            cache['shared_strings_key'] = key
+        return table
+
+    def _copy_sheet_remapped(self, zout, src, dst, table, cancel_token=None):
+        """
+        시트 XML 을 스트리밍으로 복사하면서 공유 문자열 셀(t="s")의 인덱스를 새 번호로 바꿈
+        - 새 번호는 시트에 처음 나온 순서 (원본 → 새 번호: array('i'), 미사용 -1)
+        반환: (사용한 원본 인덱스 목록 - 새 번호 순서, 공유 문자열 셀 수)
+        """
+        mapping = array('i', [-1]) * len(table)
+        used = array('i')
+        references = 0
+
+        def remap_cell(match):
+            nonlocal references
+            references += 1
+            prefix, index = match.groups()
+            index = int(index)
+            if index >= len(mapping):
+                raise RawSplitUnsupported(f"shared string index out of range: {index}")
+            new_index = mapping[index]
+            if new_index < 0:
+                new_index = mapping[index] = len(used)
+                used.append(index)
+            return prefix + b'%d' % new_index
+
+        info = self.zf.getinfo(src)
+        carry = b''
+        with self.zf.open(info) as reader, \
+                zout.open(dst, 'w', force_zip64=info.file_size >= zipfile.ZIP64_LIMIT) as writer:
+            while True:
+                if cancel_token is not None:
+                    cancel_token.check()
+                chunk = reader.read(COPY_CHUNK_SIZE)
+                buffer = carry + chunk
+                cut = _cell_safe_cut(buffer) if chunk else len(buffer)
+                writer.write(SHARED_CELL_PATTERN.sub(remap_cell, buffer[:cut]))
+                carry = buffer[cut:]
+                if not chunk:
+                    break
+
+        return used, references
+
+    def _workbook_xml(self, sheet):
+        """선택 시트 1개만 담은 workbook.xml 생성"""
+        parts = [f'<workbook xmlns="{NS_MAIN}" xmlns:r="{NS_DOC_REL}">']
+
+        # date1904 등 날짜 체계는 값 해석에 영향을 주므로 유지
+        workbook_pr = self.workbook_root.find(f'{{{NS_MAIN}}}workbookPr')
+        if workbook_pr is not None and workbook_pr.get('date1904') is not None:
+            parts.append(f'<workbookPr date1904="{escape(workbook_pr.get("date1904"))}"/>')
+
+        parts.append('<sheets>')
+        parts.append(f'<sheet name={_xml_attr(sheet["name"])} sheetId="1" r:id="rId1"/>')
+        parts.append('</sheets>')
+
+        # 시트 로컬 이름(인쇄 영역, 인쇄 제목 등)만 유지 - 다른 시트를 가리키는 전역 이름은 제외
+        names = []
+        defined_names = self.workbook_root.find(f'{{{NS_MAIN}}}definedNames')
+        if defined_names is not None:
+            for dn in defined_names.findall(f'{{{NS_MAIN}}}definedName'):
+                if dn.get('localSheetId') != str(sheet['index']):
+                    continue
+                attrs = ''.join(
+                    f' {key}={_xml_attr("0" if key == "localSheetId" else value)}'
+                    for key, value in dn.attrib.items()
+                )
+                names.append(f'<definedName{attrs}>{escape(dn.text or "")}</definedName>')
+        if names:
+            parts.append('<definedNames>' + ''.join(names) + '</definedNames>')
+
+        parts.append('</workbook>')
+        return ''.join(parts)
+
+    def split_sheet(self, sheet_name, dest, cancel_token=None, string_cache=None):
+        """
+        시트 1개를 독립 xlsx 로 dest(경로 또는 file-like)에 기록
+        - 시트 XML, styles/theme 파트는 원본 그대로 복사
+        - sharedStrings: 큰 테이블(shared_string_table)은 시트가 쓰는 문자열만 기록하고 셀 인덱스를 바꿈,
+          작은 테이블은 원본 그대로 복사
+        - workbook.xml, 관계, [Content_Types].xml 은 시트 1개 기준으로 새로 생성
+        - cancel_token: 파트 복사 청크마다 확인
+        - string_cache: SharedStringTable 재사용용 dict (source_cache)
+        반환: 출력한 공유 문자열 수 (부분 집합을 만들지 않았으면 None)
+        """
+        sheet = self._find_sheet(sheet_name)
+        sheet_rels = self._raw_sheet_rels(sheet)
+        table = self.shared_string_table(string_cache)
+
+        # (원본 경로, 출력 경로, content type, 관계 타입)
+        shared = [
+            (self._shared_part(rel_type), dst, content_type, rel_type)
+            for rel_type, dst, content_type in RAW_SHARED_PARTS
+        ]
+        shared = [item for item in shared if item[0]]
+
+        overrides = [('xl/workbook.xml', CT_WORKBOOK), ('xl/worksheets/sheet1.xml', CT_WORKSHEET)]
+        overrides += [(dst, content_type) for _, dst, content_type, _ in shared]
+        content_types = (
+            f'<Types xmlns="{NS_CONTENT_TYPES}">'
+            f'<Default Extension="rels" ContentType="{CT_RELS}"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            + ''.join(f'<Override PartName="/{part}" ContentType="{ct}"/>' for part, ct in overrides)
+            + '</Types>'
+        )
+        root_rels = (
+            f'<Relationships xmlns="{NS_PKG_REL}">'
+            f'<Relationship Id="rId1" Type="{REL_OFFICE_DOCUMENT}" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        )
+        workbook_rels = (
+            f'<Relationships xmlns="{NS_PKG_REL}">'
+            f'<Relationship Id="rId1" Type="{REL_WORKSHEET}" Target="worksheets/sheet1.xml"/>'
+            + ''.join(
+                f'<Relationship Id="rId{i}" Type="{rel_type}" Target="{posixpath.relpath(dst, "xl")}"/>'
+                for i, (_, dst, _, rel_type) in enumerate(shared, start=2)
+            )
+            + '</Relationships>'
+        )
+
+        compress_type, level = compression_settings(XLSX_COMPRESSION)
+        with zipfile.ZipFile(dest, 'w', compress_type, compresslevel=level) as zout:
+            zout.writestr('[Content_Types].xml', content_types)
+            zout.writestr('_rels/.rels', root_rels)
+            zout.writestr('xl/workbook.xml', self._workbook_xml(sheet))
+            zout.writestr('xl/_rels/workbook.xml.rels', workbook_rels)
+            if table is None:
+                self._copy_part(zout, sheet['part'], 'xl/worksheets/sheet1.xml', cancel_token)
+            else:
+                used, references = self._copy_sheet_remapped(zout, sheet['part'], 'xl/worksheets/sheet1.xml', table,
+                                                              cancel_token)
+            if sheet_rels:
+                self._copy_part(zout, _rels_path(sheet['part']), 'xl/worksheets/_rels/sheet1.xml.rels', cancel_token)
+            for src, dst, _, rel_type in shared:
+                if rel_type == REL_SHARED_STRINGS and table is not None:
+                    table.write_subset(zout, dst, used, references)
+                else:
+                    self._copy_part(zout, src, dst, cancel_token)
+
+        return len(used) if table is not None else None
+
+
+# ==================== OPENPYXL COPY ENGINE ====================
+
+# 셀 스타일 구성 요소 (StyleArray 의 각 id 에 대응)
+STYLE_ATTRIBUTES = ('font', 'border', 'fill', 'number_format', 'alignment', 'protection')
+
+
+class StyleCache:
+    """
+    원본 스타일 → 대상 워크북 스타일 매핑 캐시
+    - 키: 원본 셀의 StyleArray (font/fill/border/numFmt/protection/alignment id 조합)
+    - 값: 대상 워크북에 등록된 StyleArray
+    스타일 id 는 워크북마다 다르므로 대상 워크북 1개당 인스턴스 1개를 사용한다.
+    """
+
+    def __init__(self):
+        self._styles = {}
+        self.hits = 0
+        self.misses = 0
+
+    def apply(self, source_cell, target_cell):
+        """원본 셀 스타일을 대상 셀에 적용 (처음 보는 조합만 스타일 객체 생성)"""
+        if isinstance(source_cell, ReadOnlyCell):
+            key = source_cell.style_array
+        else:
+            key = source_cell._style
+
+        target_style = self._styles.get(key)
+        if target_style is not None:
+            self.hits += 1
+            target_cell._style = copy(target_style)
+            return
+
+        self.misses += 1
+        for attr in STYLE_ATTRIBUTES:
+            try:
+                setattr(target_cell, attr, copy(getattr(source_cell, attr)))
+            except Exception:
+                pass
+        self._styles[copy(key)] = copy(target_cell._style)
+
+
+def _populated_extent(source_sheet):
+    """
+    값 또는 서식이 있는 셀과 병합 범위 기준의 실제 사용 영역 (max_row, max_col)
+    - <dimension> 이나 값/서식 없이 남아 있는 셀(phantom)은 무시
+    """
+    max_row = max_col = 0
+    for (row, column), cell in source_sheet._cells.items():
+        if cell._value is not None or cell.has_style:
+            max_row = max(max_row, row)
+            max_col = max(max_col, column)
+    for merged_range in source_sheet.merged_cells.ranges:
+        max_row = max(max_row, merged_range.max_row)
+        max_col = max(max_col, merged_range.max_col)
+    return max_row, max_col
+
+
+def copy_sheet_openpyxl(source_sheet, timer=None, cancel_token=None):
+    """
+    openpyxl 셀 모델 기반 시트 복사 (원시 XML 엔진 대체 경로)
+    - 원본에 실제로 있는 셀만 순회 (iter_rows 의 dimension 사각형 전체를 만들지 않음)
+    - 값/서식이 없는 셀은 복사하지 않고, 사용 영역(_populated_extent) 밖의 행 높이/열 너비는 잘라냄
+    - 열 너비는 <col> 범위(min~max) 단위로 복사
+    - timer: StageTimer 지정 시 복사 셀 수(cells/styled_cells/phantom_cells) 기록
+    - cancel_token: CANCEL_CHECK_ROWS 행마다 확인 (취소 시 만들던 워크북은 버림)
+    반환: 시트 1개가 담긴 새 Workbook
+    """
+    # 새 워크북 생성
+    new_workbook = openpyxl.Workbook()
+    new_sheet = new_workbook.active
+
+    # 새 시트 제목 (최대 31자)
+    new_sheet.title = source_sheet.title[:31]
+
+    max_row, max_col = _populated_extent(source_sheet)
+
+    # ===== 데이터 복사 =====
+    # 1. 셀 값 및 스타일 (원본 셀 dict 는 행 순서로 채워져 있음)
+    style_cache = StyleCache()
+    cell_count = 0
+    phantom_count = 0
+    row_count = 0
+    last_row = None
+    for (row, column), cell in source_sheet._cells.items():
+        if row != last_row:
+            last_row = row
+            row_count += 1
+            if cancel_token is not None and row_count % CANCEL_CHECK_ROWS == 0:
+                cancel_token.check()
+
+        if cell._value is None and not cell.has_style:
+            phantom_count += 1
+            continue
+
+        # 값 복사 (수식 포함)
+        new_cell = new_sheet.cell(row=row, column=column)
+        new_cell._value = cell._value
+        new_cell.data_type = cell.data_type
+        cell_count += 1
+
+        # 스타일 복사 (원본 스타일 조합당 1회만 객체 생성)
+        if cell.has_style:
+            style_cache.apply(cell, new_cell)
+
+    # 2. 열 너비/숨김 복사 (사용 영역 밖의 열 범위는 잘라냄)
+    for dimension in source_sheet.column_dimensions.values():
+        if not (dimension.width or dimension.hidden) or not dimension.min or dimension.min > max_col:
+            continue
+        col_max = min(dimension.max or dimension.min, max_col)
+        letter = get_column_letter(dimension.min)
+        new_sheet.column_dimensions[letter] = ColumnDimension(
+            new_sheet,
+            index=letter,
+            min=dimension.min,
+            max=col_max,
+            width=dimension.width,
+            customWidth=dimension.customWidth,
+            hidden=dimension.hidden,
+        )
+
+    # 3. 행 높이 복사
+    for row_num, dimension in source_sheet.row_dimensions.items():
+        if dimension.height and row_num <= max_row:
+            new_sheet.row_dimensions[row_num].height = dimension.height
+
+    # 4. Merged cells 복사
+    try:
+        for merged_cell_range in source_sheet.merged_cells.ranges:
+            new_sheet.merge_cells(str(merged_cell_range))
+    except:
+        pass
+
+    if timer is not None:
+        timer.count('cells', cell_count)
+        timer.count('styled_cells', style_cache.hits + style_cache.misses)
+        timer.count('phantom_cells', phantom_count)
+
+    logger.info(
+        f"Style cache for '{source_sheet.title}': "
+        f"hits={style_cache.hits}, misses={style_cache.misses}, skipped={phantom_count}"
+    )
+    return new_workbook
+
+
+def _apply_streaming_layout(new_sheet, columns, merged):
+    """write_only 시트에 열 너비/숨김 및 병합 범위 설정 (행을 쓰기 전에 호출)"""
+    for column in columns:
+        new_sheet.column_dimensions[get_column_letter(column['min'])] = ColumnDimension(
+            new_sheet,
+            index=get_column_letter(column['min']),
+            min=column['min'],
+            max=column['max'],
+            width=column['width'],
+            customWidth=column['width'] is not None,
+            hidden=column['hidden'],
+        )
+    for ref in merged:
+        new_sheet.merged_cells.add(ref)
+
+
+def _trim_phantom_cells(row):
+    """행 끝의 값/서식 없는 셀 제거 (빈 행이면 빈 tuple)"""
+    end = len(row)
+    while end and row[end - 1].value is None and not (
+            isinstance(row[end - 1], ReadOnlyCell) and row[end - 1].has_style):
+        end -= 1
+    return row[:end]
+
+
+def _append_streaming_row(new_sheet, row, style_cache):
+    """read_only 행 1개를 write_only 시트에 추가, 반환: 셀 수"""
+    values = []
+    for cell in row:
+        # 빈 칸(EmptyCell)은 스타일 정보가 없음
+        if isinstance(cell, ReadOnlyCell) and cell.has_style:
+            new_cell = WriteOnlyCell(new_sheet, value=cell.value)
+            style_cache.apply(cell, new_cell)
+            values.append(new_cell)
+        else:
+            values.append(cell.value)
+    new_sheet.append(values)
+    return len(values)
+
+
+def discard_write_only_sheet(sheet):
+    """저장하지 않은 write_only 시트 폐기 (행을 모아 두던 임시 파일 정리)"""
+    try:
+        sheet.close()
+        sheet._writer.cleanup()
+    except Exception:
+        pass
+
+
+def copy_sheet_streaming(source_path, sheet_name, output_path, timer=None, cancel_token=None):
+    """
+    메모리 고정 스트리밍 복사 (대용량 시트용)
+    - 원본: load_workbook(read_only=True) 로 행 단위 읽기
+    - 대상: Workbook(write_only=True) 로 행 단위 쓰기
+    - 값/표시형식/스타일(캐시), 열 너비, 병합 범위 유지 (행 높이 등 나머지 시트 속성은 제외)
+    - timer: StageTimer 지정 시 load_workbook/copy_cells/save 단계와 복사 셀 수 기록
+    - 행 끝의 값/서식 없는 셀과 시트 끝의 빈 행은 쓰지 않음
+    - cancel_token: CANCEL_CHECK_ROWS 행마다 확인 (취소 시 write_only 임시 파일 정리)
+    """
+    timer = timer or StageTimer()
+
+    with timer.stage('load_workbook'):
+        try:
+            with RawWorkbook(source_path) as raw_workbook:
+                layout = raw_workbook.sheet_layout(sheet_name)
+        except RawSplitUnsupported:
+            layout = {'columns': [], 'merged': []}
+
+        source_workbook = openpyxl.load_workbook(source_path, read_only=True, data_only=False)
+    try:
+        source_sheet = source_workbook[sheet_name]
+        # 잘못된 <dimension> 에 의존하지 않도록 실제 셀 기준으로 읽음
+        source_sheet.reset_dimensions()
+
+        new_workbook = openpyxl.Workbook(write_only=True)
+        new_sheet = new_workbook.create_sheet(title=sheet_name[:31])
+
+        # 열 너비/병합 범위는 행을 쓰기 전에 설정해야 함
+        _apply_streaming_layout(new_sheet, layout['columns'], layout['merged'])
+
+        style_cache = StyleCache()
+        cell_count = 0
+        phantom_count = 0
+        # 빈 행은 뒤에 내용 있는 행이 나올 때만 기록 (끝부분 빈 행 제거)
+        pending_empty_rows = 0
+        with timer.stage('copy_cells'):
+            try:
+                for row_number, row in enumerate(source_sheet.iter_rows(), start=1):
+                    if cancel_token is not None and row_number % CANCEL_CHECK_ROWS == 0:
+                        cancel_token.check()
+                    trimmed = _trim_phantom_cells(row)
+                    phantom_count += len(row) - len(trimmed)
+                    if not trimmed:
+                        pending_empty_rows += 1
+                        continue
+                    for _ in range(pending_empty_rows):
+                        new_sheet.append([])
+                    pending_empty_rows = 0
+                    cell_count += _append_streaming_row(new_sheet, trimmed, style_cache)
+            except BaseException:
+                discard_write_only_sheet(new_sheet)
+                raise
+
+        with timer.stage('save'):
+            save_workbook(new_workbook, output_path)
+        timer.count('cells', cell_count)
+        timer.count('phantom_cells', phantom_count)
+        timer.count('styled_cells', style_cache.hits + style_cache.misses)
+        logger.info(
+            f"Style cache for '{sheet_name}' (streaming): "
+            f"hits={style_cache.hits}, misses={style_cache.misses}"
+        )
+    finally:
+        source_workbook.close()
+
+
+def _partition_merged(merged, header_rows, rows_per_file):
+    """
+    행 범위 분리용 병합 범위 배분
+    - 머리글 행 안의 범위: 모든 파일에 그대로
+    - 데이터 행 범위: 한 파일 안에 완전히 들어가는 것만 해당 파일의 행 위치로 이동 (경계에 걸친 범위는 제외)
+    반환: (머리글 범위 목록, {파일 번호: [범위, ...]})
+    """
+    header = []
+    by_chunk = {}
+    for ref in merged:
+        min_col, min_row, max_col, max_row = range_boundaries(ref)
+        if max_row <= header_rows:
+            header.append(ref)
+            continue
+        if min_row <= header_rows:
+            continue
+        chunk = (min_row - header_rows - 1) // rows_per_file
+        if (max_row - header_rows - 1) // rows_per_file != chunk:
+            continue
+        shift = chunk * rows_per_file
+        by_chunk.setdefault(chunk, []).append(
+            f"{get_column_letter(min_col)}{min_row - shift}:{get_column_letter(max_col)}{max_row - shift}"
+        )
+    return header, by_chunk
+
+
+class StreamingSheetWriter:
+    """
+    write_only 출력 파일 1개 (행 범위/키 분리 공용)
+    생성 시 열 너비/병합 범위를 설정하고 머리글 행을 기록한다.
+    """
+
+    def __init__(self, sheet_name, columns, merged, header=()):
+        self.sheet_name = sheet_name
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet(title=sheet_name[:31])
+        _apply_streaming_layout(self.sheet, columns, merged)
+        self.style_cache = StyleCache()
+        self.timer = StageTimer()
+        self.rows = 0
+        self.cells = 0
+        for row in header:
+            self.cells += _append_streaming_row(self.sheet, row, self.style_cache)
+
+    def append(self, row):
+        started = time.perf_counter()
+        self.cells += _append_streaming_row(self.sheet, row, self.style_cache)
+        self.timer.add('copy_cells', time.perf_counter() - started)
+        self.rows += 1
+
+    def save(self, output_path, engine, **fields):
+        """저장 후 분리 결과 dict 반환 (fields 는 결과에 그대로 추가)"""
+        with self.timer.stage('save'):
+            save_workbook(self.workbook, output_path)
+        self.timer.count('cells', self.cells)
+        self.timer.count('styled_cells', self.style_cache.hits + self.style_cache.misses)
+        return {
+            'sheet': self.sheet_name,
+            'path': output_path,
+            'engine': engine,
+            'size': os.path.getsize(output_path),
+            **fields,
+            'stages': self.timer.stages,
+            'counts': self.timer.counts,
+        }
+
+    def discard(self):
+        """저장하지 않고 폐기 (중단 시 write_only 임시 파일 정리)"""
+        discard_write_only_sheet(self.sheet)
+
+
+def split_sheet_rows(source_path, sheet_name, output_prefix, rows_per_file, header_rows=0,
+                     cancel_token=None):
+    """
+    시트 1개를 행 범위 단위 파일 여러 개로 분리 (원본은 read_only 로 1회만 읽음)
+    - 파일마다 데이터 행 rows_per_file 개, 앞쪽 header_rows 행은 모든 파일에 반복
+    - 파일이 채워지는 즉시 저장해 반환하므로 시트 전체를 메모리에 올리지 않음
+    - 값/스타일/열 너비 유지, 병합 범위는 _partition_merged 기준
+    - 출력 경로: f"{output_prefix}_{파일 번호}.xlsx"
+    반환(generator): {'sheet', 'path', 'engine': 'rows', 'size', 'first_row', 'last_row', 'stages', 'counts'}
+    (first_row/last_row: 원본 기준 데이터 행 범위)
+    """
+    try:
+        with RawWorkbook(source_path) as raw_workbook:
+            layout = raw_workbook.sheet_layout(sheet_name)
+    except RawSplitUnsupported:
+        layout = {'columns': [], 'merged': []}
+    header_merged, chunk_merged = _partition_merged(layout['merged'], header_rows, rows_per_file)
+
+    source_workbook = openpyxl.load_workbook(source_path, read_only=True, data_only=False)
+    try:
+        source_sheet = source_workbook[sheet_name]
+        source_sheet.reset_dimensions()
+
+        header = []
+        writer = None
+        first_row = None
+        chunk_index = 0
+        row_number = 0
+
+        def close_chunk():
+            return writer.save(
+                f"{output_prefix}_{chunk_index}.xlsx", 'rows',
+                first_row=first_row, last_row=first_row + writer.rows - 1
+            )
+
+        try:
+            for row in source_sheet.iter_rows():
+                row_number += 1
+                if row_number <= header_rows:
+                    header.append(row)
+                    continue
+                if cancel_token is not None and row_number % CANCEL_CHECK_ROWS == 0:
+                    cancel_token.check()
+
+                if writer is None:
+                    if cancel_token is not None:
+                        cancel_token.check()
+                    merged = header_merged + chunk_merged.get(chunk_index, [])
+                    writer = StreamingSheetWriter(sheet_name, layout['columns'], merged, header)
+                    first_row = row_number
+
+                writer.append(row)
+                if writer.rows >= rows_per_file:
+                    result, writer = close_chunk(), None
+                    chunk_index += 1
+                    yield result
+
+            if writer is None and chunk_index == 0:
+                # 데이터 행이 없는 시트: 머리글만 담은 파일 1개
+                writer = StreamingSheetWriter(sheet_name, layout['columns'], header_merged, header)
+                first_row = row_number + 1
+            if writer is not None:
+                result, writer = close_chunk(), None
+                yield result
+        finally:
+            if writer is not None:
+                writer.discard()
+    finally:
+        source_workbook.close()
+
+
+class SplitLimitExceeded(Exception):
+    """분리 결과 파일 수 제한 초과 (메시지는 응답에 그대로 사용)"""
+
+
+def _partition_key(value):
+    """키 열 값 → 분할 키 (정수 값 float 은 int 로 통일, 빈 칸은 '')"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _pack_row(row):
+    """read_only 행 → 임시 파일 기록용 (값, 형식, 스타일 id) 목록 (빈 칸은 None)"""
+    return [
+        (cell.value, cell.data_type, cell._style_id) if isinstance(cell, ReadOnlyCell) else None
+        for cell in row
+    ]
+
+
+def _unpack_rows(path, source_sheet):
+    """
+    _pack_row 로 기록한 임시 파일 → (키, read_only 행)
+    스타일은 원본 워크북 기준으로 복원 (행 번호는 출력에 쓰이지 않으므로 0)
+    """
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                key, packed = pickle.load(f)
+            except EOFError:
+                return
+            yield key, tuple(
+                ReadOnlyCell(source_sheet, 0, column, *cell) if cell is not None else EMPTY_CELL
+                for column, cell in enumerate(packed, start=1)
+            )
+
+
+def _partition_records(records, open_writer, close_writer, spill_prefix, source_sheet, depth=0):
+    """
+    (키, 행) 스트림을 키별 출력 파일로 분배 (1회 순회)
+    - 열린 출력 파일은 PARTITION_MAX_OPEN_WRITERS 개까지
+    - 상한 이후 처음 나온 키의 행은 키 해시로 PARTITION_SPILL_BUCKETS 개 임시 파일에 기록하고,
+      순회가 끝나면 임시 파일마다 같은 방식으로 다시 분배 (키별 행 순서 유지)
+    반환(generator): close_writer 결과 - 열린 파일은 순회가 끝난 뒤 저장
+    """
+    writers = {}
+    spilled_keys = set()
+    spill_files = {}
+
+    try:
+        try:
+            for key, row in records:
+                writer = writers.get(key)
+                if writer is None and key not in spilled_keys:
+                    if len(writers) < PARTITION_MAX_OPEN_WRITERS:
+                        writer = writers[key] = open_writer(key)
+                    else:
+                        spilled_keys.add(key)
+
+                if writer is not None:
+                    writer.append(row)
+                    continue
+
+                bucket = hash((depth, key)) % PARTITION_SPILL_BUCKETS
+                spill_file = spill_files.get(bucket)
+                if spill_file is None:
+                    spill_file = spill_files[bucket] = open(f"{spill_prefix}_{bucket}.spill", 'wb')
+                pickle.dump((key, _pack_row(row)), spill_file, pickle.HIGHEST_PROTOCOL)
+        finally:
+            for spill_file in spill_files.values():
+                spill_file.close()
+
+        if spill_files:
+            logger.info(
+                f"Partition spill (depth={depth}): {len(spilled_keys)} keys in {len(spill_files)} buckets"
+            )
+
+        for key in list(writers):
+            yield close_writer(key, writers.pop(key))
+
+        for bucket in sorted(spill_files):
+            spill_path = f"{spill_prefix}_{bucket}.spill"
+            yield from _partition_records(
+                _unpack_rows(spill_path, source_sheet), open_writer, close_writer,
+                f"{spill_prefix}_{bucket}", source_sheet, depth + 1
+            )
+            os.remove(spill_path)
+    finally:
+        for writer in writers.values():
+            writer.discard()
+        for bucket in spill_files:
+            spill_path = f"{spill_prefix}_{bucket}.spill"
+            if os.path.exists(spill_path):
+                os.remove(spill_path)
+
+
+def split_sheet_partitions(source_path, sheet_name, output_prefix, key_column, header_rows=0,
+                           cancel_token=None):
+    """
+    시트 1개를 키 열 값별 파일로 분리 (원본은 read_only 로 1회만 읽음)
+    - key_column: 키 열 번호 (1부터)
+    - 앞쪽 header_rows 행과 열 너비는 모든 파일에 복사, 병합 범위는 머리글 안의 범위만 유지
+    - 키별 행은 원본 순서 유지, 출력 파일 수가 PARTITION_MAX_FILES 를 넘으면 SplitLimitExceeded
+    - 출력 경로: f"{output_prefix}_{파일 번호}.xlsx"
+    반환(generator): {'sheet', 'path', 'engine': 'partition', 'size', 'key', 'rows', 'stages', 'counts'}
+    """
+    try:
+        with RawWorkbook(source_path) as raw_workbook:
+            layout = raw_workbook.sheet_layout(sheet_name)
+    except RawSplitUnsupported:
+        layout = {'columns': [], 'merged': []}
+    header_merged = [ref for ref in layout['merged'] if range_boundaries(ref)[3] <= header_rows]
+
+    source_workbook = openpyxl.load_workbook(source_path, read_only=True, data_only=False)
+    try:
+        source_sheet = source_workbook[sheet_name]
+        source_sheet.reset_dimensions()
+        header = []
+        file_index = itertools.count()
+
+        def records():
+            """데이터 행 → (키, 행)"""
+            keys = set()
+            for row_number, row in enumerate(source_sheet.iter_rows(), start=1):
+                if row_number <= header_rows:
+                    header.append(row)
+                    continue
+                if cancel_token is not None and row_number % CANCEL_CHECK_ROWS == 0:
+                    cancel_token.check()
+
+                key = _partition_key(row[key_column - 1].value if len(row) >= key_column else None)
+                if key not in keys:
+                    keys.add(key)
+                    if len(keys) > PARTITION_MAX_FILES:
+                        raise SplitLimitExceeded(
+                            f'키 값이 너무 많습니다. (최대 {PARTITION_MAX_FILES:,}개 파일)'
+                        )
+                yield key, row
+
+        def open_writer(key):
+            return StreamingSheetWriter(sheet_name, layout['columns'], header_merged, header)
+
+        def close_writer(key, writer):
+            return writer.save(f"{output_prefix}_{next(file_index)}.xlsx", 'partition', key=key, rows=writer.rows)
+
+        yield from _partition_records(records(), open_writer, close_writer, output_prefix, source_sheet)
+    finally:
+        source_workbook.close()
+
+
+# ==================== FLAT EXPORT ====================
+# 데이터만 필요한 경우: Workbook 생성/save 없이 read_only 파싱 결과를 바로 텍스트로 기록
+
+# 출력 형식 → (확장자, MIME 타입)
+FLAT_FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'tsv': ('tsv', 'text/tab-separated-values'),
+    'jsonl': ('jsonl', 'application/x-ndjson'),
+}
+
+
+def _json_default(value):
+    """JSON 으로 표현할 수 없는 셀 값 (날짜/시간 → ISO 8601, 그 외 문자열)"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _formula_text(value):
+    """배열 수식/데이터 표 수식 객체 → 수식 텍스트 (그 외 값은 그대로)"""
+    if isinstance(value, ArrayFormula):
+        return value.text
+    if isinstance(value, DataTableFormula):
+        return f"=TABLE({value.r1 or ''},{value.r2 or ''})"
+    return value
+
+
+def export_sheet_flat(source_path, sheet_name, output_path, output_format, formulas=False, cancel_token=None):
+    """
+    시트 1개를 CSV/TSV/JSON Lines 로 저장 (값만, 스타일/병합/열 너비 제외)
+    - formulas=False: 마지막 계산 결과 값 (엑셀에서 저장한 파일만 값이 있음, 없으면 빈 칸)
+    - formulas=True: 수식 텍스트 (=SUM(A1:A3), 배열 수식은 기준 셀에 수식 텍스트, 데이터 표는 =TABLE(r1,r2))
+    - CSV/TSV 는 엑셀에서 한글이 깨지지 않도록 UTF-8 BOM 포함
+    - JSON Lines 는 행마다 값 배열 1개
+    - cancel_token: CANCEL_CHECK_ROWS 행마다 확인
+    반환: 기록한 행 수
+    """
+    source_workbook = openpyxl.load_workbook(source_path, read_only=True, data_only=not formulas)
+    try:
+        source_sheet = source_workbook[sheet_name]
+        source_sheet.reset_dimensions()
+        rows = source_sheet.iter_rows(values_only=True)
+        if formulas:
+            rows = (tuple(_formula_text(value) for value in row) for row in rows)
+        row_count = 0
+
+        if output_format == 'jsonl':
+            with open(output_path, 'w', encoding='utf-8', newline='\n') as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False, default=_json_default))
+                    f.write('\n')
+                    row_count += 1
+                    if cancel_token is not None and row_count % CANCEL_CHECK_ROWS == 0:
+                        cancel_token.check()
+        else:
+            with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+                writer = csv.writer(f, delimiter='\t' if output_format == 'tsv' else ',')
+                for row in rows:
+                    writer.writerow(row)
+                    row_count += 1
+                    if cancel_token is not None and row_count % CANCEL_CHECK_ROWS == 0:
+                        cancel_token.check()
+
+        return row_count
+    finally:
+        source_workbook.close()
+
+
+# ==================== RESULT CACHE ====================
+
+class ResultCache:
+    """
+    분리 결과 디스크 캐시 (content-addressed, LRU 용량 제한)
+    - 키: 업로드 파일 SHA-256 + 시트명 + 분리 옵션
+    - 값: 시트별 결과 xlsx 파일 (RESULT_CACHE_DIR/<key>.xlsx)
+    - 용량(max_bytes) 초과 시 가장 오래 사용하지 않은 항목부터 삭제
+    디렉토리는 모든 워커 프로세스가 공유한다. 사용 시각은 파일 mtime 으로 기록하고,
+    항목을 추가할 때마다 디렉토리를 다시 스캔해 전체 용량과 LRU 순서를 구한다.
+    (프로세스별 인덱스만으로는 여러 워커의 합이 max_bytes 를 넘을 수 있음)
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> size (오래된 순)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    # 결과 내용에 영향이 없는 옵션 (저메모리 입장 시 admit_split 이 바꾸는 streaming 등) - 키에서 제외
+    KEY_IGNORED_OPTIONS = ('streaming',)
+
+    @staticmethod
+    def make_key(content_hash, sheet_name, options):
+        options = {name: value for name, value in (options or {}).items()
+                   if name not in ResultCache.KEY_IGNORED_OPTIONS}
+        payload = json.dumps([content_hash, sheet_name, options, XLSX_COMPRESSION], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.xlsx")
+
+    def _scan(self):
+        """디스크의 캐시 항목(다른 프로세스가 저장한 항목 포함)을 mtime 순으로 인덱스에 다시 등록"""
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith('.xlsx'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, entry.name[:-len('.xlsx')], stat.st_size))
+        self._entries = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self._total_bytes = sum(self._entries.values())
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._scan()
+        self._loaded = True
+        self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            logger.info(f"Result cache evicted: {key} ({size} bytes)")
+
+    def contains(self, key):
+        """캐시 항목 존재 여부 (적중/미스 집계와 LRU 순서는 바꾸지 않음 - 입장 제어 전 확인용)"""
+        return os.path.exists(self._path(key))
+
+    def get(self, key, dest_path):
+        """캐시 항목을 dest_path 로 연결(하드 링크, 불가 시 복사). 반환: 적중 여부"""
+        with self._lock:
+            self._load()
+            try:
+                # 다른 프로세스가 저장한 항목도 적중 (인덱스에 없어도 파일이 있으면 사용)
+                _link_or_copy(self._path(key), dest_path)
+                os.utime(self._path(key))
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                else:
+                    size = os.path.getsize(dest_path)
+                    self._entries[key] = size
+                    self._total_bytes += size
+                self.hits += 1
+                return True
+            except OSError:
+                # 없는 항목 또는 다른 프로세스가 먼저 삭제한 경우
+                if key in self._entries:
+                    self._total_bytes -= self._entries.pop(key)
+            self.misses += 1
+            return False
+
+    def put(self, key, src_path):
+        """결과 파일을 캐시에 등록 (용량 초과 시 LRU 삭제)"""
+        size = os.path.getsize(src_path)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._load()
+            if key in self._entries:
+                return
+            temp_path = f"{self._path(key)}.{uuid.uuid4().hex}.tmp"
+            try:
+                _link_or_copy(src_path, temp_path)
+                os.replace(temp_path, self._path(key))
+            except OSError as e:
+                logger.warning(f"Result cache store failed: {str(e)}")
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                return
+            # 다른 프로세스가 저장/삭제한 항목까지 반영한 전체 용량 기준으로 삭제
+            self._scan()
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+            }
+
+
+def _link_or_copy(src, dst):
+    """같은 파일시스템이면 하드 링크, 아니면 복사"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+_RESULT_CACHE = None
+
+
+def get_result_cache():
+    """분리 결과 캐시 (RESULT_CACHE_MAX_BYTES 가 0 이하이면 None)"""
+    global _RESULT_CACHE
+    if RESULT_CACHE_MAX_BYTES <= 0:
+        return None
+    if _RESULT_CACHE is None:
+        _RESULT_CACHE = ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES)
+    return _RESULT_CACHE
+
+
+# ==================== SPLIT PIPELINE ====================
+
+_SPLIT_POOL = None
+_SPLIT_POOL_LOCK = threading.Lock()
+
+# 워커 프로세스별로 마지막에 로드한 openpyxl 워크북 (같은 파일의 연속 작업에서 재사용)
+# 요청이 끝난 뒤 메모리를 계속 잡고 있지 않도록 WORKER_CACHE_IDLE_SECONDS 동안 작업이 없으면 해제
+_WORKER_SOURCE_CACHE = {}
+_WORKER_CACHE_LOCK = threading.Lock()
+_WORKER_CACHE_STATE = {'busy': 0, 'timer': None}
+
+
+def probe_workbook(path):
+    """
+    워크북 시트 메타데이터 조회 (셀 데이터는 읽지 않음)
+    원시 패키지로 읽을 수 없으면 openpyxl(read_only)로 시트 이름만 조회
+    """
+    try:
+        with RawWorkbook(path) as raw_workbook:
+            return raw_workbook.sheet_info()
+    except RawSplitUnsupported as e:
+        logger.info(f"Workbook probe unavailable ({str(e)}), using openpyxl")
+        workbook = openpyxl.load_workbook(path, read_only=True)
+        try:
+            return [{'name': name} for name in workbook.sheetnames]
+        finally:
+            workbook.close()
+
+
+@functools.lru_cache(maxsize=PREVIEW_CACHE_SIZE)
+def sheet_preview(path, content_hash, sheet_name, rows):
+    """
+    시트 앞부분 미리보기 (최근 결과는 LRU 로 보관 - content_hash 는 캐시 키 구분용)
+    - 원시 패키지로 읽을 수 없으면 openpyxl(read_only)로 rows 행까지만 읽음
+    - 날짜/시간 값은 ISO 8601 문자열로 변환 (JSON 응답용)
+    """
+    try:
+        with RawWorkbook(path) as raw_workbook:
+            preview = raw_workbook.preview(sheet_name, rows)
+    except RawSplitUnsupported as e:
+        logger.info(f"Raw preview unavailable ({str(e)}), using openpyxl")
+        preview = {'dimension': None, 'rows': None, 'columns': None, 'data': [], 'truncated_columns': False}
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            sheet = workbook[sheet_name]
+            if hasattr(sheet, 'iter_rows') and rows > 0:
+                for row_number, values in enumerate(sheet.iter_rows(max_row=rows, values_only=True), start=1):
+                    preview['truncated_columns'] |= len(values) > PREVIEW_MAX_COLUMNS
+                    preview['data'].append({'row': row_number, 'values': list(values[:PREVIEW_MAX_COLUMNS])})
+        finally:
+            workbook.close()
+
+    for row in preview['data']:
+        row['values'] = [
+            value if value is None or isinstance(value, (str, int, float, bool)) else _json_default(value)
+            for value in row['values']
+        ]
+    return preview
+
+
+class SplitCancelled(Exception):
+    """분리 작업 취소 또는 시간 초과"""
+
+
+class CancelToken:
+    """
+    분리 작업 협조적 취소 토큰
+    - cancel(): 외부(취소 요청, 연결 종료)에서 중단 표시
+    - check(): 처리 루프에서 호출, 취소되었거나 deadline 이 지났으면 SplitCancelled
+    - probe: 지정 시 check() 에서 CANCEL_POLL_INTERVAL 마다 호출, 참이면 취소 (문자열이면 그 사유, 아니면 'disconnected')
+    - 프로세스 풀 워커와는 취소 표시 파일로 공유: shared_marker() 블록 안에서 cancel() 하면 파일을 만들고,
+      워커는 marker_path 를 지정한 토큰의 check() 에서 파일 존재를 확인
+    """
+
+    def __init__(self, timeout=None, probe=None, marker_path=None):
+        self._event = threading.Event()
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.reason = None
+        self.probe = probe
+        self.marker_path = marker_path
+        self._probed_at = time.monotonic()
+        self._markers = set()
+        self._lock = threading.Lock()
+
+    def cancel(self, reason='cancelled'):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            for path in self._markers:
+                _write_cancel_marker(path, reason)
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        if not self._event.is_set():
+            now = time.monotonic()
+            if self.deadline is not None and now > self.deadline:
+                self.cancel('timeout')
+            elif self.probe is not None and now - self._probed_at >= CANCEL_POLL_INTERVAL:
+                self._probed_at = now
+                reason = self.probe()
+                if reason:
+                    self.cancel(reason if isinstance(reason, str) else 'disconnected')
+            elif self.marker_path is not None and os.path.exists(self.marker_path):
+                try:
+                    with open(self.marker_path) as f:
+                        reason = f.read() or 'cancelled'
+                except OSError:
+                    reason = 'cancelled'
+                self.cancel(reason)
+        if self._event.is_set():
+            raise SplitCancelled(self.reason)
+
+    @contextmanager
+    def shared_marker(self):
+        """
+        프로세스 풀 워커와 공유할 취소 표시 파일 경로
+        블록을 벗어날 때 등록만 해제 - 파일 삭제는 release_cancel_marker() (실행 중인 워커가 확인한 뒤)
+        """
+        path = os.path.join(tempfile.gettempdir(), f"{CANCEL_MARKER_PREFIX}{uuid.uuid4().hex}")
+        with self._lock:
+            self._markers.add(path)
+            if self._event.is_set():
+                _write_cancel_marker(path, self.reason)
+        try:
+            yield path
+        finally:
+            with self._lock:
+                self._markers.discard(path)
+
+
+def _write_cancel_marker(path, reason):
+    try:
+        with open(path, 'w') as f:
+            f.write(reason)
+    except OSError as e:
+        logger.warning(f"Failed to write cancel marker: {str(e)}")
+
+
+def release_cancel_marker(path, futures):
+    """실행 중인 풀 작업이 모두 끝나면 취소 표시 파일 삭제 (남은 작업이 없으면 즉시)"""
+    running = [future for future in futures if not future.done()]
+    remaining = [len(running)]
+    lock = threading.Lock()
+
+    def remove(_=None):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] > 0:
+                return
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    if not running:
+        remaining[0] = 1
+        remove()
+        return
+    for future in running:
+        future.add_done_callback(remove)
+
+
+def _load_source_workbook(source_path, source_cache):
+    """openpyxl 원본 워크북 로드 (source_cache 에 1개만 유지)"""
+    key = (source_path, os.path.getmtime(source_path))
+    if source_cache.get('key') != key:
+        workbook = source_cache.pop('workbook', None)
+        if workbook is not None:
+            workbook.close()
+        source_cache['workbook'] = openpyxl.load_workbook(source_path, data_only=False)
+        source_cache['key'] = key
+    return source_cache['workbook']
+
+
+def release_source_cache(source_cache):
+    """source_cache 에 남은 워크북/공유 문자열 테이블 해제"""
+    workbook = source_cache.pop('workbook', None)
+    source_cache.pop('key', None)
+    source_cache.pop('shared_strings', None)
+    source_cache.pop('shared_strings_key', None)
+    if workbook is not None:
+        workbook.close()
+
+
+def split_sheet_to_file(source_path, sheet_name, output_path, options=None, source_cache=None, cancel_token=None):
+    """
+    시트 1개를 output_path 에 xlsx 로 저장 (프로세스 풀 작업 단위)
+    - 원시 XML 엔진 우선, 불가 시 openpyxl 복사로 대체
+    - options['streaming']: True/False 로 대체 경로 강제, None 이면 시트 XML 크기로 자동 선택
+    - options['output_format']: csv/tsv/jsonl 이면 export_sheet_flat 로 값만 기록 (options['values']: cached/formulas)
+    - source_cache: openpyxl 원본 워크북/공유 문자열 테이블 재사용용 dict (None 이면 작업마다 로드/해제)
+    - cancel_token: 복사 루프에서 CANCEL_CHECK_ROWS 행(원시 엔진은 청크)마다 확인 - 취소 시 SplitCancelled
+    반환: {'sheet', 'path', 'engine', 'size', 'stages', 'counts'}
+    - stages/counts: 단계별 소요 시간(초)과 복사 셀 수 (요청 프로세스에서 메트릭으로 기록)
+    """
+    options = options or {}
+    sheet_size = None
+    timer = StageTimer()
+
+    output_format = options.get('output_format') or 'xlsx'
+    if output_format in FLAT_FORMATS:
+        with timer.stage('export'):
+            rows = export_sheet_flat(source_path, sheet_name, output_path, output_format,
+                                     options.get('values') == 'formulas', cancel_token)
+        timer.count('rows', rows)
+        return {
+            'sheet': sheet_name,
+            'path': output_path,
+            'engine': output_format,
+            'size': os.path.getsize(output_path),
+            'stages': timer.stages,
+            'counts': timer.counts,
+        }
+
+    try:
+        with timer.stage('raw_split'):
+            with RawWorkbook(source_path) as raw_workbook:
+                sheet_size = raw_workbook.part_size(sheet_name)
+                shared_strings = raw_workbook.split_sheet(sheet_name, output_path, cancel_token, source_cache)
+        if shared_strings is not None:
+            timer.count('shared_strings', shared_strings)
+        engine = 'raw'
+    except RawSplitUnsupported as e:
+        logger.info(f"Raw split unavailable for '{sheet_name}' ({str(e)}), falling back to openpyxl")
+
+        streaming = options.get('streaming')
+        if streaming is None:
+            streaming = sheet_size is not None and sheet_size >= STREAMING_THRESHOLD_BYTES
+
+        if streaming:
+            copy_sheet_streaming(source_path, sheet_name, output_path, timer, cancel_token)
+            engine = 'streaming'
+        else:
+            cache = source_cache if source_cache is not None else {}
+            try:
+                with timer.stage('load_workbook'):
+                    source_workbook = _load_source_workbook(source_path, cache)
+                with timer.stage('copy_cells'):
+                    new_workbook = copy_sheet_openpyxl(source_workbook[sheet_name], timer, cancel_token)
+                with timer.stage('save'):
+                    save_workbook(new_workbook, output_path)
+                new_workbook.close()
+            finally:
+                if source_cache is None:
+                    release_source_cache(cache)
+            engine = 'openpyxl'
+
+    return {
+        'sheet': sheet_name,
+        'path': output_path,
+        'engine': engine,
+        'size': os.path.getsize(output_path),
+        'stages': timer.stages,
+        'counts': timer.counts,
+    }
+
+
+def discard_cancelled_split(output_path, source_cache=None):
+    """
+    취소된 시트 분리 정리: 만들던 결과 파일 삭제, 원본 워크북 캐시 해제,
+    복사 중이던 openpyxl 워크북(순환 참조)을 다음 GC 를 기다리지 않고 바로 회수
+    """
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    if source_cache is not None:
+        release_source_cache(source_cache)
+    gc.collect()
+
+
+def _release_idle_worker_cache():
+    """워커 원본 캐시 해제 (유휴 타이머 - 그 사이 새 작업이 시작됐으면 그대로 둠)"""
+    with _WORKER_CACHE_LOCK:
+        if _WORKER_CACHE_STATE['busy']:
+            return
+        _WORKER_CACHE_STATE['timer'] = None
+        if not _WORKER_SOURCE_CACHE:
+            return
+        release_source_cache(_WORKER_SOURCE_CACHE)
+    gc.collect()
+    logger.info(f"Worker source cache released after {WORKER_CACHE_IDLE_SECONDS}s idle")
+
+
+@contextmanager
+def _worker_cache_session(source_path):
+    """
+    워커 작업 1개 동안 원본 캐시 사용 표시
+    - 시작 시 대기 중인 해제 타이머 취소, 끝나면 WORKER_CACHE_IDLE_SECONDS 뒤 해제 예약 (0 이하: 바로 해제)
+    - 다른 원본 파일의 캐시(워크북, 공유 문자열 테이블)는 작업 시작 전에 해제 - 워커에는 현재 원본 것만 남음
+      (워크북은 openpyxl 경로, 공유 문자열 테이블은 원시 엔진 경로에서만 교체되므로 한쪽만 오래 남을 수 있음)
+    """
+    with _WORKER_CACHE_LOCK:
+        if _WORKER_CACHE_STATE['timer'] is not None:
+            _WORKER_CACHE_STATE['timer'].cancel()
+            _WORKER_CACHE_STATE['timer'] = None
+        _WORKER_CACHE_STATE['busy'] += 1
+        cached_sources = {key[0] for key in (_WORKER_SOURCE_CACHE.get('key'),
+                                             _WORKER_SOURCE_CACHE.get('shared_strings_key')) if key}
+        if cached_sources - {source_path}:
+            release_source_cache(_WORKER_SOURCE_CACHE)
+    try:
+        yield _WORKER_SOURCE_CACHE
+    finally:
+        with _WORKER_CACHE_LOCK:
+            _WORKER_CACHE_STATE['busy'] -= 1
+            if WORKER_CACHE_IDLE_SECONDS > 0 and not _WORKER_CACHE_STATE['busy']:
+                timer = threading.Timer(WORKER_CACHE_IDLE_SECONDS, _release_idle_worker_cache)
+                timer.daemon = True
+                _WORKER_CACHE_STATE['timer'] = timer
+                timer.start()
+        if WORKER_CACHE_IDLE_SECONDS <= 0:
+            _release_idle_worker_cache()
+
+
+def _pool_split_sheet(source_path, sheet_name, output_path, options, cancel_marker=None):
+    """
+    프로세스 풀 워커 진입점 (워커별 원본 캐시 사용 - 작업이 없으면 _worker_cache_session 이 해제)
+    - cancel_marker: 요청 측 CancelToken.shared_marker() 경로 - 파일이 생기면 복사 루프에서 중단
+    """
+    cancel_token = CancelToken(marker_path=cancel_marker) if cancel_marker else None
+    with _worker_cache_session(source_path) as source_cache:
+        try:
+            return split_sheet_to_file(source_path, sheet_name, output_path, options, source_cache, cancel_token)
+        except SplitCancelled:
+            discard_cancelled_split(output_path, source_cache)
+            logger.info(f"Sheet split cancelled in worker: {sheet_name}")
+            raise
+
+
+def _warm_worker():
+    """워커 예열 (모듈 import 비용을 최초 1회만 지불)"""
+    return os.getpid()
+
+
+def get_split_pool():
+    """
+    시트 분리용 프로세스 풀 (요청 간 재사용)
+    - 최초 호출 시 생성하고 모든 워커를 예열
+    - SPLIT_WORKERS 가 1 이하이면 None (요청 스레드에서 처리)
+    """
+    global _SPLIT_POOL
+
+    if SPLIT_WORKERS <= 1:
+        return None
+
+    with _SPLIT_POOL_LOCK:
+        if _SPLIT_POOL is None:
+            pool = ProcessPoolExecutor(
+                max_workers=SPLIT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            for future in [pool.submit(_warm_worker) for _ in range(SPLIT_WORKERS)]:
+                future.result()
+            _SPLIT_POOL = pool
+            logger.info(f"Split process pool started: workers={SPLIT_WORKERS}")
+        return _SPLIT_POOL
+
+
+def _discard_split_pool(pool):
+    """깨진 풀 폐기 (다음 요청에서 새로 생성)"""
+    global _SPLIT_POOL
+
+    with _SPLIT_POOL_LOCK:
+        if _SPLIT_POOL is pool:
+            _SPLIT_POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_split_tasks(source_path, tasks, options=None, cancel_token=None, content_hash=None, timer=None):
+    """
+    시트별 분리 실행
+    - tasks: [(sheet_name, output_path), ...]
+    - options: split_sheet_to_file 옵션 (모든 시트에 동일 적용)
+    - cancel_token: 시트 사이마다 확인, 취소 시 대기 중인 시트는 실행하지 않음 (SplitCancelled)
+    - content_hash: 원본 파일 SHA-256 - 지정 시 결과 캐시 적중 시트는 워크북을 열지 않고 바로 반환
+    - timer: 요청 StageTimer - 시트별 단계 시간/셀 수를 합산하고 메트릭에 기록
+    - 프로세스 풀이 있으면 시트별로 병렬 처리, 없으면 순차 처리
+    반환(generator): (task_index, result 또는 None) - 완료되는 순서대로
+    """
+    cancel_token = cancel_token or CancelToken()
+    timer = timer or StageTimer()
+    result_cache = get_result_cache() if content_hash else None
+    cache_keys = {}
+    pending = []
+
+    for index, (sheet_name, output_path) in enumerate(tasks):
+        if result_cache is not None:
+            cache_keys[index] = ResultCache.make_key(content_hash, sheet_name, options)
+            if result_cache.get(cache_keys[index], output_path):
+                result = {
+                    'sheet': sheet_name,
+                    'path': output_path,
+                    'engine': 'cache',
+                    'size': os.path.getsize(output_path),
+                }
+                timer.record_split(result)
+                yield index, result
+                continue
+        pending.append(index)
+
+    if result_cache is not None:
+        logger.info(
+            f"Result cache: {len(tasks) - len(pending)}/{len(tasks)} sheets served from cache "
+            f"(total hits={result_cache.hits}, misses={result_cache.misses})"
+        )
+
+    for index, result in _execute_split_tasks(source_path, tasks, pending, options, cancel_token):
+        if result is not None:
+            timer.record_split(result)
+            if result_cache is not None:
+                result_cache.put(cache_keys[index], result['path'])
+        yield index, result
+
+
+def _execute_split_tasks(source_path, tasks, indices, options, cancel_token):
+    """run_split_tasks 의 실제 분리 실행 (tasks 중 indices 만)"""
+    pool = get_split_pool() if len(indices) > 1 else None
+
+    if pool is None:
+        source_cache = {}
+        try:
+            for index in indices:
+                sheet_name, output_path = tasks[index]
+                cancel_token.check()
+                try:
+                    yield index, split_sheet_to_file(source_path, sheet_name, output_path, options, source_cache,
+                                                     cancel_token)
+                except SplitCancelled:
+                    discard_cancelled_split(output_path, source_cache)
+                    raise
+                except Exception as e:
+                    logger.error(f"Error splitting sheet '{sheet_name}': {str(e)}")
+                    yield index, None
+        finally:
+            release_source_cache(source_cache)
+        return
+
+    with cancel_token.shared_marker() as cancel_marker:
+        futures = {
+            pool.submit(_pool_split_sheet, source_path, tasks[index][0], tasks[index][1], options, cancel_marker): index
+            for index in indices
+        }
+        pending = set(futures)
+        try:
+            while pending:
+                cancel_token.check()
+                done, pending = wait(pending, timeout=CANCEL_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = futures[future]
+                    try:
+                        yield index, future.result()
+                    except SplitCancelled:
+                        raise
+                    except BrokenProcessPool as e:
+                        logger.error(f"Split process pool broken: {str(e)}")
+                        _discard_split_pool(pool)
+                        yield index, None
+                    except Exception as e:
+                        logger.error(f"Error splitting sheet '{tasks[index][0]}': {str(e)}")
+                        yield index, None
+        finally:
+            # 대기 중인 시트는 취소, 실행 중인 시트는 취소 표시 파일을 보고 멈춘 뒤 파일 삭제
+            for future in futures:
+                future.cancel()
+            release_cancel_marker(cancel_marker, futures)
+
+
+def plan_split_tasks(selected_sheets, sheet_names, base_filename, output_dir, extension='xlsx'):
+    """
+    선택 시트 → 분리 작업 목록 (출력 파일명은 선택 순서대로 결정)
+    - extension: 출력 파일 확장자 (xlsx 또는 FLAT_FORMATS 확장자)
+    반환: (tasks, output_names)
+    - tasks: [(sheet_name, output_path), ...] - run_split_tasks 입력
+    - output_names: 작업별 다운로드/ZIP 내 파일명
+    """
+    tasks = []
+    output_names = []
+    existing_names = set()
+
+    for sheet_name in selected_sheets:
+        if sheet_name not in sheet_names:
+            logger.warning(f"Sheet not found: {sheet_name}")
+            continue
+
+        safe_sheet_name = sanitize_filename(sheet_name)
+        output_filename = f"{base_filename}_{safe_sheet_name}.{extension}"
+        output_filename = handle_duplicate_filename(output_filename, existing_names)
+        existing_names.add(output_filename)
+
+        tasks.append((sheet_name, os.path.join(output_dir, f"{len(tasks)}.{extension}")))
+        output_names.append(output_filename)
+
+    return tasks, output_names
+
+
+def parse_output_format(data):
+    """
+    요청의 output_format / values 검증 (/api/split, /api/batch 공통)
+    반환: (split_sheet_to_file 옵션 추가분, 출력 확장자) - 잘못된 값이면 ValueError (사용자 메시지)
+    """
+    output_format = data.get('output_format') or 'xlsx'
+    if output_format == 'xlsx':
+        return {}, 'xlsx'
+    if output_format not in FLAT_FORMATS:
+        raise ValueError('지원하지 않는 출력 형식입니다. (xlsx, csv, tsv, jsonl)')
+    values = data.get('values') or 'cached'
+    if values not in ('cached', 'formulas'):
+        raise ValueError("values 는 'cached' 또는 'formulas' 여야 합니다.")
+    return {'output_format': output_format, 'values': values}, FLAT_FORMATS[output_format][0]
+
+
+def parse_split_mode_options(mode, data):
+    """
+    행 범위(mode='rows')/키(mode='partition') 분리 옵션 검증
+    반환: split_sheet_rows / split_sheet_partitions 인자 dict
+    잘못된 값이면 ValueError (메시지는 응답에 그대로 사용)
+    """
+    try:
+        header_rows = int(data.get('header_rows') or 0)
+    except (TypeError, ValueError):
+        raise ValueError('머리글 행 수(header_rows)를 숫자로 지정해주세요.')
+    if header_rows < 0:
+        raise ValueError('머리글 행 수는 0 이상이어야 합니다.')
+
+    if mode == 'partition':
+        key_column = data.get('key_column')
+        try:
+            if isinstance(key_column, str) and not key_column.isdigit():
+                key_column = column_index_from_string(key_column.strip().upper())
+            else:
+                key_column = int(key_column)
+        except (TypeError, ValueError):
+            raise ValueError('키 열(key_column)을 열 문자(예: C) 또는 번호로 지정해주세요.')
+        if key_column < 1:
+            raise ValueError('키 열 번호는 1 이상이어야 합니다.')
+        return {'key_column': key_column, 'header_rows': header_rows}
+
+    try:
+        rows_per_file = int(data.get('rows_per_file'))
+    except (TypeError, ValueError):
+        raise ValueError('파일당 행 수(rows_per_file)를 숫자로 지정해주세요.')
+    if rows_per_file < 1:
+        raise ValueError('파일당 행 수는 1 이상이어야 합니다.')
+    if rows_per_file + header_rows > EXCEL_MAX_ROWS:
+        raise ValueError(f'파일당 행 수는 머리글 포함 {EXCEL_MAX_ROWS:,}행 이하여야 합니다.')
+    return {'rows_per_file': rows_per_file, 'header_rows': header_rows}
+
+
+def iter_streaming_split_outputs(source_path, selected_sheets, sheet_names, base_filename, output_dir,
+                                 mode, mode_options, cancel_token=None, timer=None):
+    """
+    선택 시트를 차례로 행 범위/키 분리해 (다운로드 파일명, 경로)로 반환 (파일이 완성되는 대로)
+    - 파일명: rows → {원본}_{시트}_{시작행}-{끝행}.xlsx (원본 기준 데이터 행 번호)
+              partition → {원본}_{시트}_{키 값}.xlsx (빈 키는 blank)
+    - 결과 캐시/프로세스 풀은 사용하지 않음 (시트당 1회 순차 읽기)
+    """
+    timer = timer or StageTimer()
+    existing_names = set()
+
+    for sheet_index, sheet_name in enumerate(selected_sheets):
+        if sheet_name not in sheet_names:
+            logger.warning(f"Sheet not found: {sheet_name}")
+            continue
+
+        safe_sheet_name = sanitize_filename(sheet_name)
+        output_prefix = os.path.join(output_dir, str(sheet_index))
+        if mode == 'partition':
+            results = split_sheet_partitions(source_path, sheet_name, output_prefix,
+                                             cancel_token=cancel_token, **mode_options)
+        else:
+            results = split_sheet_rows(source_path, sheet_name, output_prefix,
+                                       cancel_token=cancel_token, **mode_options)
+
+        for result in results:
+            timer.record_split(result)
+            if mode == 'partition':
+                suffix = sanitize_filename(str(result['key'])) if result['key'] != '' else 'blank'
+            else:
+                suffix = f"{result['first_row']}-{result['last_row']}"
+            output_filename = handle_duplicate_filename(f"{base_filename}_{safe_sheet_name}_{suffix}.xlsx",
+                                                        existing_names)
+            existing_names.add(output_filename)
+            yield output_filename, result['path']
+
+
+# ==================== ADMISSION CONTROL ====================
+# 메모리 예산 기반 입장 제어: 워크북을 열기 전에 zip central directory 로 메모리 사용량을 추정해
+# 입장 / 대기 / 저메모리(스트리밍 복사) 전환 / 거부를 결정 (프로세스 단위 예산)
+
+UNKNOWN_XML_RATIO = 10  # 파트 크기를 알 수 없을 때 압축 파일 대비 XML 크기 추정 배수
+LOAD_BASE_MEMORY = 32 * 1024 * 1024  # 워크북을 여는 프로세스당 고정 메모리 추정 (파서/스타일/쓰기 버퍼)
+
+
+class AdmissionRejected(Exception):
+    """메모리 예산 부족으로 요청 거부 (status: HTTP 상태 코드)"""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+class AdmissionTicket:
+    """입장 허가 (release() 로 예약한 메모리 반환, 여러 번 호출해도 1회만 반환)"""
+
+    def __init__(self, controller, cost, low_memory):
+        self.controller = controller
+        self.cost = cost
+        self.low_memory = low_memory
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.controller.release(self.cost)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class MemoryAdmission:
+    """
+    메모리 예산 입장 제어
+    - 예상 메모리가 남은 예산에 들어오면 즉시 입장
+    - 단독으로도 예산을 넘거나, 지금은 자리가 없지만 저메모리 추정치는 들어오면 저메모리 모드로 입장
+    - 그 외에는 대기열에서 대기 (최대 queue_size 요청, wait_seconds) - 초과 시 거부
+    """
+
+    def __init__(self, budget, queue_size=ADMISSION_QUEUE_SIZE, wait_seconds=ADMISSION_WAIT_SECONDS):
+        self.budget = budget
+        self.queue_size = queue_size
+        self.wait_seconds = wait_seconds
+        self.in_use = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+
+    def admit(self, estimate, low_memory_estimate=None, timer=None):
+        """
+        estimate: 일반 모드 예상 메모리, low_memory_estimate: 저메모리 모드 예상 메모리 (None: 전환 불가)
+        반환: AdmissionTicket - 예산 초과/대기 초과 시 AdmissionRejected
+        """
+        if self.budget <= 0 or estimate <= 0:
+            return AdmissionTicket(self, 0, False)
+        if low_memory_estimate is None or low_memory_estimate >= estimate:
+            low_memory_estimate = None
+
+        with self._condition:
+            cost, low_memory = estimate, False
+            if low_memory_estimate is not None and (
+                    estimate > self.budget or
+                    (self.in_use + estimate > self.budget and self.in_use + low_memory_estimate <= self.budget)):
+                cost, low_memory = low_memory_estimate, True
+
+            if cost > self.budget:
+                ADMISSIONS.inc(decision='rejected')
+                raise AdmissionRejected('서버 메모리 한도를 넘는 파일입니다. 시트를 나누어 선택하거나 CSV 로 내보내 주세요.', 413)
+
+            if self.in_use + cost > self.budget:
+                if self.waiting >= self.queue_size:
+                    ADMISSIONS.inc(decision='rejected')
+                    raise AdmissionRejected('처리 중인 작업이 많습니다. 잠시 후 다시 시도해주세요.', 503)
+                ADMISSIONS.inc(decision='queued')
+                self.waiting += 1
+                start = time.perf_counter()
+                try:
+                    admitted = self._condition.wait_for(lambda: self.in_use + cost <= self.budget, self.wait_seconds)
+                finally:
+                    self.waiting -= 1
+                    waited = time.perf_counter() - start
+                    ADMISSION_WAIT_SECONDS_HISTOGRAM.observe(waited)
+                    if timer is not None:
+                        timer.add('admission', waited)
+                if not admitted:
+                    ADMISSIONS.inc(decision='rejected')
+                    raise AdmissionRejected('처리 중인 작업이 많습니다. 잠시 후 다시 시도해주세요.', 503)
+
+            self.in_use += cost
+            ADMISSIONS.inc(decision='low_memory' if low_memory else 'admitted')
+
+        if low_memory:
+            logger.info(f"Admission: routed to low-memory mode (estimate={estimate}, cost={cost}, in_use={self.in_use})")
+        return AdmissionTicket(self, cost, low_memory)
+
+    def release(self, cost):
+        if cost <= 0:
+            return
+        with self._condition:
+            self.in_use -= cost
+            self._condition.notify_all()
+
+
+def _total_memory():
+    """컨테이너(cgroup) 메모리 제한 또는 시스템 메모리 (알 수 없으면 0)"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:  # 'max' / 무제한 값 제외
+            return int(value)
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return 0
+
+
+def default_memory_budget():
+    """
+    프로세스별 기본 메모리 예산: 전체 메모리의 절반을 서버 워커 프로세스 수(WEB_CONCURRENCY)로 나눈 값
+    (예산은 프로세스마다 따로 계산되므로 나누지 않으면 워커 N개가 N/2 × 메모리까지 입장시킴, 알 수 없으면 0: 제한 없음)
+    """
+    return _total_memory() // 2 // max(WEB_CONCURRENCY, 1)
+
+
+MEMORY_ADMISSION = MemoryAdmission(default_memory_budget() if MEMORY_BUDGET_BYTES < 0 else MEMORY_BUDGET_BYTES)
+
+
+def estimate_split_memory(source_path, selected_sheets, options=None, mode='sheets'):
+    """
+    분리 요청의 예상 메모리 (bytes) - zip central directory 의 압축 해제 크기로 추정 (파트 내용은 읽지 않음)
+    반환: (일반 모드 추정, 저메모리 모드 추정 또는 None)
+    - 원시 엔진으로 처리되는 시트: 청크 단위 복사이므로 0
+      (sharedStrings 가 SHARED_STRINGS_SUBSET_BYTES 이상이면 문자열 테이블 크기 × 2 × 테이블을 여는 프로세스 수)
+    - openpyxl 전체 로드: (모든 시트 XML + sharedStrings) × ADMISSION_MEMORY_FACTOR × 동시 로드 프로세스 수
+    - 읽기 전용 경로(스트리밍 복사, mode=rows/partition, csv/tsv/jsonl): sharedStrings 만 메모리에 올림
+    - 로드하는 프로세스마다 LOAD_BASE_MEMORY 추가
+    """
+    options = options or {}
+    try:
+        with RawWorkbook(source_path) as raw_workbook:
+            known = [name for name in selected_sheets if name in raw_workbook.sheetnames]
+            profile = raw_workbook.memory_profile(known)
+    except RawSplitUnsupported:
+        # 패키지 구조를 읽을 수 없으면 압축 파일 크기로 대략 추정 (모든 시트가 openpyxl 경로)
+        xml_size = os.path.getsize(source_path) * UNKNOWN_XML_RATIO
+        known = selected_sheets
+        profile = {'worksheets': xml_size, 'shared_strings': xml_size // 2, 'fallback_sheets': len(known)}
+
+    read_only = mode != 'sheets' or options.get('output_format') in FLAT_FORMATS
+    loaded_sheets = len(known) if read_only else profile['fallback_sheets']
+    raw_sheets = 0 if read_only else len(known) - profile['fallback_sheets']
+    parallel = len(known) > 1 and SPLIT_WORKERS > 1
+
+    raw_memory = 0
+    if raw_sheets and profile['shared_strings'] and profile['shared_strings'] >= SHARED_STRINGS_SUBSET_BYTES:
+        raw_memory = profile['shared_strings'] * 2 * (min(raw_sheets, SPLIT_WORKERS) if parallel else 1)
+    if not loaded_sheets:
+        return raw_memory, None
+    processes = min(loaded_sheets, SPLIT_WORKERS) if parallel else 1
+
+    low_memory = int((profile['shared_strings'] * ADMISSION_MEMORY_FACTOR + LOAD_BASE_MEMORY) * processes)
+    if read_only or options.get('streaming'):
+        return low_memory + raw_memory, None
+    full = int(((profile['worksheets'] + profile['shared_strings']) * ADMISSION_MEMORY_FACTOR + LOAD_BASE_MEMORY)
+               * processes)
+    return full + raw_memory, low_memory + raw_memory
+
+
+def admit_split(source_path, selected_sheets, options, mode='sheets', timer=None, content_hash=None):
+    """
+    분리 전 메모리 입장 (요청/작업/일괄 분리 공통)
+    저메모리 모드로 입장하면 options['streaming'] = True 로 바꿔 스트리밍 복사 엔진 사용
+    - content_hash: 지정 시 결과 캐시에 있는 시트는 워크북을 열지 않으므로 추정에서 제외
+                    (모두 캐시에 있으면 대기/거부 없이 바로 입장)
+    반환: AdmissionTicket - 거부 시 AdmissionRejected
+    """
+    result_cache = get_result_cache() if content_hash and mode == 'sheets' else None
+    if result_cache is not None:
+        selected_sheets = [sheet for sheet in selected_sheets
+                           if not result_cache.contains(ResultCache.make_key(content_hash, sheet, options))]
+        if not selected_sheets:
+            return AdmissionTicket(MEMORY_ADMISSION, 0, False)
+    estimate, low_memory_estimate = estimate_split_memory(source_path, selected_sheets, options, mode)
+    ticket = MEMORY_ADMISSION.admit(estimate, low_memory_estimate, timer)
+    if ticket.low_memory:
+        options['streaming'] = True
+    return ticket
+
+
+# ==================== STREAMING RESPONSE ====================
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def output_mimetype(filename):
+    """다운로드 파일명 확장자 → MIME 타입"""
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension == 'zip':
+        return 'application/zip'
+    for flat_extension, mimetype in FLAT_FORMATS.values():
+        if extension == flat_extension:
+            return mimetype
+    return XLSX_MIMETYPE
+
+
+class ZipStreamBuffer(io.RawIOBase):
+    """
+    ZipFile 출력용 쓰기 전용 스트림
+    기록된 바이트를 모아 두었다가 drain() 으로 꺼내 응답 청크로 내보낸다.
+    (seek 불가 스트림이므로 ZipFile 은 data descriptor 방식으로 기록)
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _write_zip_member(zf, buffer, timer, arcname, path, compress_type, level, job):
+    """
+    stream_zip 멤버 1개 기록 generator (기록한 바이트를 청크 단위로 반환, 기록 후 로컬 파일 삭제)
+    - job: 병렬 압축 Future (deflate_file 결과) - 있으면 압축 데이터를 그대로 기록
+    """
+    if job is not None:
+        deflated_path, crc, size, compressed, seconds = job.result()
+        timer.add('compress', seconds)
+        zinfo = zipfile.ZipInfo(arcname, date_time=time.localtime(time.time())[:6])
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        zinfo.file_size, zinfo.compress_size, zinfo.CRC = size, compressed, crc
+        with open(deflated_path, 'rb') as src, raw_zip_member(zf, zinfo) as dst:
+            for chunk in iter(lambda: src.read(COPY_CHUNK_SIZE), b''):
+                with timer.stage('zip'):
+                    dst.write(chunk)
+                data = buffer.drain()
+                if data:
+                    yield data
+        os.remove(deflated_path)
+    else:
+        size = os.path.getsize(path)
+        zf.compression, zf.compresslevel = compress_type, level  # 멤버별 압축 방식
+        with open(path, 'rb') as src, zf.open(arcname, 'w', force_zip64=size >= zipfile.ZIP64_LIMIT) as dst:
+            while True:
+                with timer.stage('zip'):
+                    chunk = src.read(COPY_CHUNK_SIZE)
+                    if chunk:
+                        dst.write(chunk)
+                if not chunk:
+                    break
+                data = buffer.drain()
+                if data:
+                    yield data
+        compressed = zf.getinfo(arcname).compress_size
+    os.remove(path)
+
+    ZIP_MEMBERS.inc(method='store' if compress_type == zipfile.ZIP_STORED else 'deflate')
+    ZIP_MEMBER_BYTES.inc(size, kind='uncompressed')
+    ZIP_MEMBER_BYTES.inc(compressed, kind='compressed')
+    timer.count('zip_uncompressed_bytes', size)
+    timer.count('zip_compressed_bytes', compressed)
+
+    data = buffer.drain()
+    if data:
+        yield data
+
+
+def stream_zip(entries, timer=None, policy=None):
+    """
+    ZIP 스트리밍 generator
+    - entries: (zip 내 파일명, 로컬 파일 경로) iterable - 준비되는 대로 전달
+    - 멤버를 COPY_CHUNK_SIZE 단위로 기록하며 즉시 내보내고, 기록한 로컬 파일은 삭제
+    - policy: 멤버 압축 정책 (기본 ZIP_COMPRESSION) - auto 는 이미 압축된 xlsx 등은 저장만 함
+    - 압축할 멤버는 압축 스레드 풀에서 최대 COMPRESS_WORKERS 개까지 미리 압축하고, 들어온 순서대로 기록
+    - timer: StageTimer 지정 시 기록 시간을 'zip', 병렬 압축 시간을 'compress' 단계로 기록
+             (entries 대기/전송 시간 제외), 멤버 압축 전/후 크기 합계도 기록
+    메모리 사용량은 멤버 수와 무관하게 청크 1~2개 수준으로 유지된다.
+    """
+    timer = timer or StageTimer()
+    policy = policy or ZIP_COMPRESSION
+    pool = get_compress_pool()
+    buffer = ZipStreamBuffer()
+    pending = deque()  # (arcname, path, compress_type, level, job)
+    try:
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for arcname, path in entries:
+                compress_type, level = compression_settings(policy, path)
+                job = None
+                if pool is not None and compress_type == zipfile.ZIP_DEFLATED and raw_zip_supported(zf):
+                    job = pool.submit(deflate_file, path, level)
+                pending.append((arcname, path, compress_type, level, job))
+
+                # 맨 앞 멤버가 준비되었으면 바로 기록, 압축 대기가 풀 크기를 넘으면 완료를 기다려 기록
+                while pending and (pending[0][4] is None or pending[0][4].done()
+                                   or len(pending) > COMPRESS_WORKERS):
+                    yield from _write_zip_member(zf, buffer, timer, *pending.popleft())
+
+            while pending:
+                yield from _write_zip_member(zf, buffer, timer, *pending.popleft())
+    finally:
+        # 중단 시 대기 중인 압축 취소 (남은 파일은 호출 측 출력 디렉토리와 함께 삭제)
+        for *_, job in pending:
+            if job is not None:
+                job.cancel()
+
+    data = buffer.drain()
+    if data:
+        yield data
+
+
+def connection_probe(environ):
+    """
+    클라이언트 연결 종료 감지 함수 (CancelToken probe 용)
+    요청 소켓을 MSG_PEEK 로 엿보아 EOF(상대가 연결을 닫음)면 True
+    서버가 소켓을 노출하지 않으면(테스트 클라이언트 등) None - 응답 전송 중 GeneratorExit 로만 감지
+    """
+    sock = environ.get('gunicorn.socket') or environ.get('werkzeug.socket')
+    flags = socket.MSG_PEEK | getattr(socket, 'MSG_DONTWAIT', 0)
+    if sock is None or not hasattr(socket, 'MSG_DONTWAIT'):
+        return None
+
+    def disconnected():
+        try:
+            return sock.recv(1, flags) == b''
+        except (BlockingIOError, InterruptedError, ValueError):
+            return False  # 읽을 데이터 없음 (연결 유지) / TLS 소켓은 엿보기 불가
+        except OSError:
+            return True
+
+    return disconnected
+
+
+def download_headers(download_name):
+    """첨부 파일 응답 헤더 (비 ASCII 파일명은 RFC 5987 filename* 사용)"""
+    headers = Headers()
+    try:
+        download_name.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        quoted = quote(download_name, safe="!#$&+-.^_`|~")
+        headers.set('Content-Disposition', 'attachment', **{'filename': simple, 'filename*': f"UTF-8''{quoted}"})
+    else:
+        headers.set('Content-Disposition', 'attachment', filename=download_name)
+    return headers
+
+
+# ==================== SPLIT JOBS ====================
+# 비동기 분리 작업: 제한된 작업 큐 + 고정 수의 작업 스레드 (CPU 작업은 프로세스 풀에서 실행)
+# 작업은 제출받은 워커 프로세스에서 실행되고, 상태는 세션 저장소(job:<id>)에 기록해
+# 다른 워커 프로세스로 간 상태 조회/결과 다운로드/취소 요청도 처리한다.
+
+JOBS = {}
+JOBS_LOCK = threading.Lock()
+JOB_QUEUE = queue.Queue(maxsize=JOB_QUEUE_SIZE)
+_JOB_THREADS = []
+
+JOB_FINAL_STATES = ('completed', 'failed', 'cancelled', 'timeout')
+JOB_KEY_PREFIX = 'job:'
+
+
+def _job_key(job_id, suffix=''):
+    return f"{JOB_KEY_PREFIX}{job_id}{suffix}"
+
+
+def _ensure_job_workers():
+    """작업 스레드 기동 (최초 작업 제출 시 1회)"""
+    with JOBS_LOCK:
+        if _JOB_THREADS:
+            return
+        for index in range(max(JOB_WORKERS, 1)):
+            thread = threading.Thread(target=_job_worker, name=f"split-job-{index}", daemon=True)
+            thread.start()
+            _JOB_THREADS.append(thread)
+        logger.info(f"Split job workers started: {len(_JOB_THREADS)}")
+
+
+def submit_job(session_id, temp_file, tasks, output_names, options, zip_name, output_dir, content_hash=None):
+    """
+    분리 작업 등록 후 큐에 추가
+    큐가 가득 차면 queue.Full (등록 취소)
+    """
+    _ensure_job_workers()
+
+    job_id = uuid.uuid4().hex
+    job = {
+        'job_id': job_id,
+        'session_id': session_id,
+        'temp_file': temp_file,
+        'content_hash': content_hash,
+        'tasks': tasks,
+        'output_names': output_names,
+        'options': options,
+        'zip_name': zip_name,
+        'output_dir': output_dir,
+        'status': 'queued',
+        'sheets': [{'name': sheet_name, 'status': 'pending'} for sheet_name, _ in tasks],
+        'error': None,
+        'result_path': None,
+        'download_name': None,
+        'token': CancelToken(),
+        'created_at': datetime.now(),
+    }
+
+    with JOBS_LOCK:
+        JOBS[job_id] = job
+    publish_job(job)  # 큐에 넣기 전에 기록 (작업 스레드의 진행 상태 기록을 덮어쓰지 않도록)
+    try:
+        JOB_QUEUE.put_nowait(job_id)
+    except queue.Full:
+        with JOBS_LOCK:
+            JOBS.pop(job_id, None)
+        get_session_store().delete(_job_key(job_id))
+        raise
+    logger.info(f"Split job queued: {job_id} ({len(tasks)} sheets)")
+    return job
+
+
+def job_status(job):
+    """작업 상태 응답 (JSON 직렬화 가능한 필드만)"""
+    done = sum(1 for sheet in job['sheets'] if sheet['status'] == 'done')
+    failed = sum(1 for sheet in job['sheets'] if sheet['status'] == 'failed')
+    return {
+        'job_id': job['job_id'],
+        'session_id': job['session_id'],
+        'status': job['status'],
+        'progress': {'done': done, 'failed': failed, 'total': len(job['sheets'])},
+        'sheets': [dict(sheet) for sheet in job['sheets']],
+        'error': job['error'],
+        'download_name': job['download_name'],
+        'created_at': job['created_at'].isoformat(),
+    }
+
+
+def job_record(job):
+    """세션 저장소에 기록하는 작업 상태 (job_status + 결과 파일 경로)"""
+    return {**job_status(job), 'result_path': job['result_path']}
+
+
+def publish_job(job):
+    """작업 상태를 세션 저장소에 기록 (다른 워커 프로세스에서 조회용, 세션과 같은 만료 시간)"""
+    try:
+        get_session_store().put(_job_key(job['job_id']), job_record(job), TEMP_CLEANUP_INTERVAL)
+    except Exception as e:
+        logger.warning(f"Failed to publish job state {job['job_id']}: {str(e)}")
+
+
+def find_job_record(job_id):
+    """작업 상태 조회 - 이 프로세스의 작업이면 최신 상태, 아니면 세션 저장소 기록 (없으면 None)"""
+    job = JOBS.get(job_id)
+    if job is not None:
+        return job_record(job)
+    record = get_session_store().get(_job_key(job_id))
+    return record if record is not None and record.get('job_id') == job_id else None
 
-    base, ext = filename.rsplit('.', 1)
-    counter = 1
 
+def _job_cancel_requested(job_id):
+    """다른 워커 프로세스에서 받은 취소 요청 확인 (CancelToken probe)"""
+    return 'cancelled' if get_session_store().get(_job_key(job_id, ':cancel')) is not None else None
+
+
+def _job_worker():
+    """작업 스레드: 큐에서 작업을 꺼내 순서대로 실행"""
     while True:
-        new_name = f"{base}({counter}).{ext}"
-        if new_name not in existing_names:
-            return new_name
-        counter += 1
+        job_id = JOB_QUEUE.get()
+        try:
+            job = JOBS.get(job_id)
+            if job is not None:
+                run_job(job)
+        except Exception as e:
+            logger.error(f"Split job worker error: {str(e)}")
+        finally:
+            JOB_QUEUE.task_done()
 
 
-def cleanup_old_sessions():
+def run_job(job):
     """
-    1시간 이상 된 세션 파일 삭제
+    분리 작업 실행
+    - 실행 시작 시점부터 JOB_TIMEOUT 적용
+    - 시트 1개: 해당 xlsx, 여러 개: ZIP 파일을 작업 디렉토리에 생성
     """
-    now = datetime.now()
-    expired = [sid for sid, ts in CLEANUP_TIME.items() if now - ts > timedelta(seconds=TEMP_CLEANUP_INTERVAL)]
+    token = job['token']
+    token.probe = functools.partial(_job_cancel_requested, job['job_id'])
+    if token.cancelled or _job_cancel_requested(job['job_id']):
+        job['status'] = 'cancelled'
+        shutil.rmtree(job['output_dir'], ignore_errors=True)
+        publish_job(job)
+        return
 
-    for sid in expired:
-        temp_path = SESSION_STORE.get(sid, {}).get('temp_dir')
-        if temp_path and os.path.exists(temp_path):
-            try:
-                shutil.rmtree(temp_path, ignore_errors=True)
-                logger.info(f"Cleaned up session: {sid}")
-            except Exception as e:
-                logger.error(f"Failed to cleanup {sid}: {str(e)}")
+    token.deadline = time.monotonic() + JOB_TIMEOUT
+    job['status'] = 'running'
+    publish_job(job)
+    logger.info(f"Split job started: {job['job_id']}")
+
+    timer = StageTimer()
+    outputs = []
+    ticket = None
+    try:
+        ticket = admit_split(job['temp_file'], [sheet for sheet, _ in job['tasks']], job['options'], timer=timer,
+                             content_hash=job['content_hash'])
+        for index, result in run_split_tasks(job['temp_file'], job['tasks'], job['options'], token,
+                                             job['content_hash'], timer):
+            job['sheets'][index]['status'] = 'done' if result else 'failed'
+            if result is not None:
+                outputs.append((job['output_names'][index], result['path']))
+            publish_job(job)
+        ticket.release()
+
+        if not outputs:
+            job['error'] = '분리할 수 있는 시트가 없습니다.'
+            job['status'] = 'failed'
+            return
+
+        if len(job['tasks']) == 1:
+            job['download_name'], job['result_path'] = outputs[0]
+        else:
+            result_path = os.path.join(job['output_dir'], 'result.zip')
+            with open(result_path, 'wb') as f:
+                for chunk in stream_zip(outputs, timer):
+                    f.write(chunk)
+            job['download_name'], job['result_path'] = job['zip_name'], result_path
 
-        SESSION_STORE.pop(sid, None)
-        CLEANUP_TIME.pop(sid, None)
+        RESPONSE_BYTES.observe(os.path.getsize(job['result_path']))
+        job['status'] = 'completed'
+        logger.info(f"Split job completed: {job['job_id']} -> {job['download_name']}")
 
+    except SplitCancelled as e:
+        job['status'] = 'timeout' if str(e) == 'timeout' else 'cancelled'
+        job['error'] = '처리 시간 초과' if job['status'] == 'timeout' else '작업이 취소되었습니다.'
+        shutil.rmtree(job['output_dir'], ignore_errors=True)
+        logger.info(f"Split job {job['status']}: {job['job_id']}")
 
-def timeout_handler(signum, frame):
-    """타임아웃 처리"""
-    raise TimeoutError("처리 시간 초과")
+    except AdmissionRejected as e:
+        job['status'] = 'failed'
+        job['error'] = str(e)
+        shutil.rmtree(job['output_dir'], ignore_errors=True)
+        logger.warning(f"Split job rejected by admission control: {job['job_id']}")
+
+    except Exception as e:
+        job['status'] = 'failed'
+        job['error'] = '처리 중 오류가 발생했습니다.'
+        logger.error(f"Split job failed: {job['job_id']}: {str(e)}")
+
+    finally:
+        if ticket is not None:
+            ticket.release()
+        publish_job(job)
+        timer.finish('job', job_id=job['job_id'], status=job['status'])
 
 
 # ==================== API ENDPOINTS ====================
+
+@app.before_request
+def ensure_background_workers():
+    """임시 파일 정리 스레드는 첫 요청 시 기동 (테스트 모드 제외)"""
+    if JANITOR_ENABLED and not app.testing and _JANITOR_THREAD is None:
+        start_janitor()
+
+
 # 프론트엔드 정적 파일 서빙
 @app.route('/')
 def index():
@@ -152,6 +3723,48 @@ def health():
     return jsonify({'status': 'ok', 'timestamp': datetime.now().isoformat()}), 200
 
 
+@app.route('/api/sessions/<session_id>/sheets/<path:sheet_name>/preview', methods=['GET'])
+def preview_sheet(session_id, sheet_name):
+    """
+    GET /api/sessions/<session_id>/sheets/<sheet_name>/preview?rows=N
+    응답: {
+        'sheet': str,
+        'dimension': str, 'rows': int, 'columns': int (<dimension> 기준 추정치),
+        'data': [{'row': int, 'values': [...]}, ...] (앞에서부터 최대 N행, 기본 20 / 최대 200),
+        'truncated_columns': bool (열이 PREVIEW_MAX_COLUMNS 를 넘어 생략되었는지)
+    }
+    """
+    session = get_session_store().get(session_id)
+    if session is None or not os.path.exists(session['temp_file']):
+        return jsonify({'error': '세션을 찾을 수 없습니다.'}), 404
+
+    if sheet_name not in session['sheets']:
+        return jsonify({'error': '시트를 찾을 수 없습니다.'}), 404
+
+    rows = request.args.get('rows', PREVIEW_DEFAULT_ROWS, type=int)
+    rows = max(0, min(rows, PREVIEW_MAX_ROWS))
+
+    timer = StageTimer()
+    try:
+        with timer.stage('preview'):
+            preview = sheet_preview(session['temp_file'], session.get('sha256'), sheet_name, rows)
+    except Exception as e:
+        logger.error(f"Preview failed for '{sheet_name}': {str(e)}")
+        return jsonify({'error': '미리보기를 만들 수 없습니다.'}), 400
+
+    timer.finish('preview', session_id=session_id, rows=rows)
+    return jsonify({'sheet': sheet_name, **preview}), 200
+
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """
+    GET /api/metrics
+    응답: Prometheus text format (요청/단계별 시간 히스토그램, 입출력 bytes, 복사 셀 수)
+    """
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     """
@@ -161,10 +3774,14 @@ def upload_file():
         'session_id': str,
         'temp_file': str,
         'filename': str,
-        'sheets': [str, ...]
+        'sheets': [str, ...],
+        'sheet_info': [{'name', 'hidden', 'dimension', 'rows', 'columns', 'size'}, ...],
+        'sha256': str,
+        'source_format': 'xlsx' | 'xls' (xls 는 업로드 시 xlsx 로 변환, temp_file 은 변환본)
     }
     """
     temp_dir = None
+    timer = StageTimer()
 
     try:
         # 요청 체크
@@ -194,50 +3811,307 @@ def upload_file():
         session_id = os.path.basename(temp_dir)
         temp_file_path = os.path.join(temp_dir, secure_filename(file.filename))
 
-        # 파일 저장
-        file.save(temp_file_path)
-        logger.info(f"File uploaded: {session_id}, size={file_size} bytes")
+        # 파일 저장 (저장하면서 SHA-256 계산)
+        with timer.stage('receive'):
+            file_size, digest = write_stream(file.stream, temp_file_path)
+        content_hash = digest.hexdigest()
+        BYTES_IN.inc(file_size)
+        UPLOAD_BYTES.observe(file_size)
+        logger.info(f"File uploaded: {session_id}, size={file_size} bytes, sha256={content_hash}")
 
-        # 워크북 로드 및 시트 목록 추출
-        try:
-            workbook = openpyxl.load_workbook(temp_file_path, data_only=False)
-            sheet_names = workbook.sheetnames
-            workbook.close()
+        response = register_session(session_id, temp_dir, temp_file_path, file.filename, content_hash, timer)
+        timer.finish('upload', session_id=session_id, bytes_in=file_size, status=response[1])
+        return response
 
-            logger.info(f"Sheets extracted: {sheet_names}")
+    except Exception as e:
+        if temp_dir and os.path.exists(temp_dir):
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        logger.error(f"Upload handler error: {str(e)}")
+        return jsonify({'error': '업로드 중 오류가 발생했습니다.'}), 500
 
-            # 세션 저장
-            SESSION_STORE[session_id] = {
-                'temp_dir': temp_dir,
-                'temp_file': temp_file_path,
-                'filename': file.filename,
-                'sheets': sheet_names,
-                'created_at': datetime.now()
-            }
-            CLEANUP_TIME[session_id] = datetime.now()
 
-            return jsonify({
-                'session_id': session_id,
-                'temp_file': temp_file_path,
-                'filename': file.filename,
-                'sheets': sheet_names
-            }), 200
+def register_session(session_id, temp_dir, temp_file_path, filename, content_hash, timer=None):
+    """
+    업로드 완료 파일의 시트 목록을 추출하고 세션 등록 (/api/upload, 분할 업로드 완료 공통)
+    - timer: StageTimer 지정 시 시트 목록 추출 시간을 'probe' 단계로 기록
+    반환: (응답, 상태 코드) - 읽을 수 없는 파일이면 임시 디렉토리 삭제 후 400
+    """
+    timer = timer or StageTimer()
+    source_format = 'xlsx'
 
-        except openpyxl.utils.exceptions.InvalidFileException:
-            shutil.rmtree(temp_dir, ignore_errors=True)
-            logger.error(f"Invalid file format: {file.filename}")
-            return jsonify({'error': '손상된 엑셀 파일입니다.'}), 400
+    # .xls: 1회 xlsx 로 변환 (세션에는 변환본만 저장)
+    try:
+        if is_xls_file(temp_file_path):
+            source_format = 'xls'
+            if xlrd is None:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                logger.error("XLS upload rejected: xlrd is not installed")
+                return jsonify({'error': 'XLS 파일 변환을 지원하지 않는 서버입니다. XLSX 로 저장 후 업로드해주세요.'}), 400
+            with timer.stage('convert'):
+                temp_file_path = convert_xls_upload(temp_file_path)
+    except Exception as e:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        logger.error(f"XLS conversion failed: {filename}: {str(e)}")
+        return jsonify({'error': '손상된 엑셀 파일입니다.'}), 400
 
-        except Exception as e:
-            shutil.rmtree(temp_dir, ignore_errors=True)
-            logger.error(f"Workbook load failed: {str(e)}")
-            return jsonify({'error': '파일을 읽을 수 없습니다.'}), 400
+    # 시트 목록 추출: workbook.xml 만 읽고, 원시 패키지로 읽을 수 없으면 openpyxl(read_only)로 대체
+    try:
+        with timer.stage('probe'):
+            sheet_info = probe_workbook(temp_file_path)
+        sheet_names = [info['name'] for info in sheet_info]
+
+        logger.info(f"Sheets extracted: {sheet_names}")
+
+    except openpyxl.utils.exceptions.InvalidFileException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        logger.error(f"Invalid file format: {filename}")
+        return jsonify({'error': '손상된 엑셀 파일입니다.'}), 400
 
     except Exception as e:
-        if temp_dir and os.path.exists(temp_dir):
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        logger.error(f"Workbook load failed: {str(e)}")
+        return jsonify({'error': '파일을 읽을 수 없습니다.'}), 400
+
+    # 세션 저장
+    get_session_store().put(session_id, {
+        'temp_dir': temp_dir,
+        'temp_file': temp_file_path,
+        'filename': filename,
+        'sheets': sheet_names,
+        'sheet_info': sheet_info,
+        'sha256': content_hash,
+        'source_format': source_format,
+        'created_at': datetime.now().isoformat()
+    }, TEMP_CLEANUP_INTERVAL)
+
+    return jsonify({
+        'session_id': session_id,
+        'temp_file': temp_file_path,
+        'filename': filename,
+        'sheets': sheet_names,
+        'sheet_info': sheet_info,
+        'sha256': content_hash,
+        'source_format': source_format
+    }), 200
+
+
+# ==================== CHUNKED UPLOAD ====================
+# 분할/재개 가능한 업로드: init → 청크 PUT (offset 지정) → complete
+# 업로드 상태는 세션 임시 디렉토리에 저장 (수신 offset = .part 파일 크기)
+
+UPLOAD_META_FILE = 'upload.json'
+UPLOAD_ID_PATTERN = re.compile(r'^excel_splitter_[A-Za-z0-9_]+$')
+
+# 진행 중 업로드의 증분 해시 {upload_id: (해시한 offset, digest)} - 없으면 디스크에서 재계산
+_UPLOAD_DIGESTS = {}
+# 업로드별 잠금 {upload_id: Lock} - 같은 업로드의 청크 PUT/complete 직렬화 (프로세스 내)
+_UPLOAD_LOCKS = {}
+_UPLOAD_DIGESTS_LOCK = threading.Lock()
+
+
+def _upload_dir(upload_id):
+    """업로드 ID → 임시 디렉토리 (형식이 다르거나 없으면 None)"""
+    if not UPLOAD_ID_PATTERN.match(upload_id or ''):
+        return None
+    temp_dir = os.path.join(tempfile.gettempdir(), upload_id)
+    if not os.path.isfile(os.path.join(temp_dir, UPLOAD_META_FILE)):
+        return None
+    return temp_dir
+
+
+def _load_upload_meta(temp_dir):
+    with open(os.path.join(temp_dir, UPLOAD_META_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _upload_status(upload_id, meta, received):
+    return {
+        'upload_id': upload_id,
+        'filename': meta['filename'],
+        'size': meta['size'],
+        'offset': received,
+        'complete': received == meta['size'],
+        'chunk_size': UPLOAD_CHUNK_SIZE
+    }
+
+
+def _upload_lock(upload_id):
+    """업로드별 잠금 (없으면 생성)"""
+    with _UPLOAD_DIGESTS_LOCK:
+        return _UPLOAD_LOCKS.setdefault(upload_id, threading.Lock())
+
+
+def prune_upload_state():
+    """디렉토리가 사라진 업로드(만료/고아 정리/디스크 예산 삭제)의 해시·잠금 항목 제거"""
+    temp_root = tempfile.gettempdir()
+    with _UPLOAD_DIGESTS_LOCK:
+        for upload_id in set(_UPLOAD_DIGESTS) | set(_UPLOAD_LOCKS):
+            if not os.path.isdir(os.path.join(temp_root, upload_id)):
+                _UPLOAD_DIGESTS.pop(upload_id, None)
+                _UPLOAD_LOCKS.pop(upload_id, None)
+
+
+def _upload_digest(upload_id, part_path, received):
+    """received 까지의 증분 해시 (프로세스 재시작/다른 워커 수신 시 파일에서 재계산)"""
+    with _UPLOAD_DIGESTS_LOCK:
+        cached = _UPLOAD_DIGESTS.get(upload_id)
+    if cached is not None and cached[0] == received:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    with open(part_path, 'rb') as f:
+        remaining = received
+        while remaining > 0:
+            chunk = f.read(min(COPY_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest
+
+
+@app.route('/api/uploads', methods=['POST'])
+def init_chunked_upload():
+    """
+    POST /api/uploads
+    요청: {'filename': str, 'size': int, 'sha256': str (선택)}
+    응답: 201 {'upload_id', 'filename', 'size', 'offset', 'complete', 'chunk_size'}
+    """
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename') or ''
+    size = data.get('size')
+
+    if not filename:
+        return jsonify({'error': '파일명이 없습니다.'}), 400
+
+    if not allowed_file(filename):
+        return jsonify({'error': 'XLSX 또는 XLS 파일만 지원합니다.'}), 400
+
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({'error': '파일 크기가 올바르지 않습니다.'}), 400
+
+    if size > CHUNKED_UPLOAD_MAX_SIZE:
+        return jsonify({
+            'error': f'파일 크기 초과. 최대 {CHUNKED_UPLOAD_MAX_SIZE / 1024 / 1024:.0f}MB입니다.'
+        }), 400
+
+    temp_dir = tempfile.mkdtemp(prefix='excel_splitter_')
+    upload_id = os.path.basename(temp_dir)
+    meta = {
+        'filename': filename,
+        'stored_name': secure_filename(filename) or 'upload.xlsx',
+        'size': size,
+        'sha256': (data.get('sha256') or '').lower() or None,
+    }
+    with open(os.path.join(temp_dir, UPLOAD_META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    open(os.path.join(temp_dir, meta['stored_name'] + '.part'), 'wb').close()
+
+    logger.info(f"Chunked upload started: {upload_id}, size={size} bytes")
+    return jsonify(_upload_status(upload_id, meta, 0)), 201
+
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_chunked_upload(upload_id):
+    """
+    GET /api/uploads/<upload_id>
+    응답: {'upload_id', 'offset', 'size', 'complete', ...} - 재개 시 offset 부터 전송
+    """
+    temp_dir = _upload_dir(upload_id)
+    if temp_dir is None:
+        return jsonify({'error': '업로드를 찾을 수 없습니다.'}), 404
+
+    meta = _load_upload_meta(temp_dir)
+    part_path = os.path.join(temp_dir, meta['stored_name'] + '.part')
+    received = os.path.getsize(part_path) if os.path.exists(part_path) else meta['size']
+    return jsonify(_upload_status(upload_id, meta, received)), 200
+
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def put_upload_chunk(upload_id):
+    """
+    PUT /api/uploads/<upload_id>?offset=N
+    요청 본문: 청크 바이트 (application/octet-stream)
+    offset 은 현재 수신 크기와 같아야 함 (다르면 409 + 현재 offset)
+    """
+    temp_dir = _upload_dir(upload_id)
+    if temp_dir is None:
+        return jsonify({'error': '업로드를 찾을 수 없습니다.'}), 404
+
+    meta = _load_upload_meta(temp_dir)
+    part_path = os.path.join(temp_dir, meta['stored_name'] + '.part')
+    # 같은 offset 의 동시 청크가 둘 다 확인을 통과하지 않도록 확인 → 쓰기 → 해시 갱신을 잠금 안에서
+    with _upload_lock(upload_id):
+        if not os.path.exists(part_path):
+            return jsonify({'error': '이미 완료된 업로드입니다.'}), 409
+
+        received = os.path.getsize(part_path)
+        offset = request.args.get('offset', type=int)
+        if offset != received:
+            return jsonify({'error': '청크 위치가 맞지 않습니다.', 'offset': received}), 409
+
+        if request.content_length is not None and received + request.content_length > meta['size']:
+            return jsonify({'error': '파일 크기를 초과하는 청크입니다.', 'offset': received}), 400
+
+        digest = _upload_digest(upload_id, part_path, received)
+        written, digest = write_stream(request.stream, part_path, mode='ab', digest=digest)
+        received += written
+        BYTES_IN.inc(written)
+
+        if received > meta['size']:
+            # Content-Length 없이 초과 전송된 경우: 초과분 잘라내고 해시는 재계산
+            with open(part_path, 'r+b') as f:
+                f.truncate(meta['size'])
+            with _UPLOAD_DIGESTS_LOCK:
+                _UPLOAD_DIGESTS.pop(upload_id, None)
+            return jsonify({'error': '파일 크기를 초과하는 청크입니다.', 'offset': meta['size']}), 400
+
+        with _UPLOAD_DIGESTS_LOCK:
+            _UPLOAD_DIGESTS[upload_id] = (received, digest)
+
+    return jsonify(_upload_status(upload_id, meta, received)), 200
+
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def complete_chunked_upload(upload_id):
+    """
+    POST /api/uploads/<upload_id>/complete
+    응답: /api/upload 와 동일 ({'session_id', 'temp_file', 'filename', 'sheets', 'sheet_info', 'sha256'})
+    """
+    temp_dir = _upload_dir(upload_id)
+    if temp_dir is None:
+        return jsonify({'error': '업로드를 찾을 수 없습니다.'}), 404
+
+    meta = _load_upload_meta(temp_dir)
+    part_path = os.path.join(temp_dir, meta['stored_name'] + '.part')
+    temp_file_path = os.path.join(temp_dir, meta['stored_name'])
+
+    with _upload_lock(upload_id):
+        if not os.path.exists(part_path):
+            return jsonify({'error': '이미 완료된 업로드입니다.'}), 409
+
+        received = os.path.getsize(part_path)
+        if received != meta['size']:
+            return jsonify({'error': '업로드가 완료되지 않았습니다.', 'offset': received}), 409
+
+        content_hash = _upload_digest(upload_id, part_path, received).hexdigest()
+        with _UPLOAD_DIGESTS_LOCK:
+            _UPLOAD_DIGESTS.pop(upload_id, None)
+
+        if meta['sha256'] and meta['sha256'] != content_hash:
             shutil.rmtree(temp_dir, ignore_errors=True)
-        logger.error(f"Upload handler error: {str(e)}")
-        return jsonify({'error': '업로드 중 오류가 발생했습니다.'}), 500
+            logger.error(f"Chunked upload hash mismatch: {upload_id}")
+            return jsonify({'error': '파일 해시가 일치하지 않습니다. 다시 업로드해주세요.'}), 400
+
+        os.replace(part_path, temp_file_path)
+
+    UPLOAD_BYTES.observe(received)
+    logger.info(f"Chunked upload completed: {upload_id}, size={received} bytes, sha256={content_hash}")
+
+    timer = StageTimer()
+    response = register_session(upload_id, temp_dir, temp_file_path, meta['filename'], content_hash, timer)
+    timer.finish('upload_complete', session_id=upload_id, bytes_in=received, status=response[1])
+    return response
 
 
 @app.route('/api/split', methods=['POST'])
@@ -248,16 +4122,30 @@ def split_sheets():
         'session_id': str,
         'temp_file': str,
         'filename': str,
-        'sheets': [str, ...]
+        'sheets': [str, ...],
+        'streaming': bool (선택, 생략 시 시트 크기로 자동 선택),
+        'async': bool (선택, true 이면 작업 ID 반환),
+        'mode': 'sheets' | 'rows' | 'partition' (선택, 기본 sheets),
+        'rows_per_file': int (mode=rows, 파일당 데이터 행 수),
+        'key_column': str | int (mode=partition, 키 열 문자 또는 번호),
+        'header_rows': int (mode=rows/partition 선택, 파일마다 반복할 머리글 행 수),
+        'output_format': 'xlsx' | 'csv' | 'tsv' | 'jsonl' (선택, 기본 xlsx - mode=sheets 만),
+        'values': 'cached' | 'formulas' (선택, csv/tsv/jsonl 의 수식 셀 출력 - 기본 cached)
     }
-    응답: Excel파일 또는 ZIP파일 (다운로드)
+    응답: Excel/CSV/TSV/JSONL 파일 또는 ZIP파일 (다운로드) - mode=rows/partition 은 항상 ZIP
+          async: 202 {'job_id', 'status', 'status_url', 'result_url'}
     """
+    timer = StageTimer()
+    ticket = None
+
     try:
         data = request.get_json()
         session_id = data.get('session_id')
         temp_file = data.get('temp_file')
         filename = data.get('filename')
         selected_sheets = data.get('sheets', [])
+        options = {'streaming': data.get('streaming')}
+        mode = data.get('mode') or 'sheets'
 
         # 유효성 체크
         if not temp_file or not os.path.exists(temp_file):
@@ -269,202 +4157,597 @@ def split_sheets():
         if len(selected_sheets) > 100:
             return jsonify({'error': '선택 시트가 너무 많습니다. (최대 100개)'}), 400
 
+        if mode not in ('sheets', 'rows', 'partition'):
+            return jsonify({'error': '지원하지 않는 분리 방식입니다.'}), 400
+
+        try:
+            output_options, extension = parse_output_format(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if output_options and mode != 'sheets':
+            return jsonify({'error': '행/키 단위 분리는 xlsx 출력만 지원합니다.'}), 400
+        options.update(output_options)
+
+        if mode != 'sheets':
+            if data.get('async'):
+                return jsonify({'error': '행/키 단위 분리는 비동기 작업을 지원하지 않습니다.'}), 400
+            try:
+                mode_options = parse_split_mode_options(mode, data)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
         logger.info(f"Splitting sheets for session {session_id}: {selected_sheets}")
 
         # 원본 파일명 (확장자 제외)
         base_filename = os.path.splitext(filename)[0]
         base_filename = sanitize_filename(base_filename)
 
-        # 분리 처리
-        output_files = {}
-        existing_names = set()
-
         try:
-            source_workbook = openpyxl.load_workbook(temp_file, data_only=False)
+            with timer.stage('probe'):
+                sheet_names = [info['name'] for info in probe_workbook(temp_file)]
         except Exception as e:
             logger.error(f"Failed to load workbook: {str(e)}")
             return jsonify({'error': '파일을 읽을 수 없습니다.'}), 400
 
-        for sheet_name in selected_sheets:
-            if sheet_name not in source_workbook.sheetnames:
-                logger.warning(f"Sheet not found: {sheet_name}")
-                continue
-
-            try:
-                # 새 워크북 생성
-                new_workbook = openpyxl.Workbook()
-                new_sheet = new_workbook.active
-                
-                # 원본 시트 참조
-                source_sheet = source_workbook[sheet_name]
-
-                # 새 시트 제목 (최대 31자)
-                new_sheet.title = sheet_name[:31]
-
-                # ===== 데이터 복사 =====
-                # 1. 셀 값 및 스타일
-                for row in source_sheet.iter_rows():
-                    for cell in row:
-                        new_cell = new_sheet.cell(row=cell.row, column=cell.column)
-
-                        # 값 복사 (수식 포함)
-                        if cell.data_type == 'f':  # 수식
-                            new_cell.value = cell.value
-                        else:
-                            new_cell.value = cell.value
+        # 결과 캐시 키용 원본 해시 (업로드 시 계산한 값 재사용)
+        session = get_session_store().get(session_id) or {}
+        content_hash = session.get('sha256') if session.get('temp_file') == temp_file else None
+        if content_hash is None:
+            with timer.stage('hash'):
+                content_hash = file_sha256(temp_file)
+        bytes_in = os.path.getsize(temp_file)
 
-                        # 스타일 복사
-                        if cell.has_style:
-                            try:
-                                new_cell.font = Font(
-                                    name=cell.font.name,
-                                    size=cell.font.size,
-                                    bold=cell.font.bold,
-                                    italic=cell.font.italic,
-                                    vertAlign=cell.font.vertAlign,
-                                    underline=cell.font.underline,
-                                    strike=cell.font.strike,
-                                    color=cell.font.color
-                                )
-                            except:
-                                pass
+        if data.get('async'):
+            # 비동기 작업: 작업 ID 즉시 반환, 작업 큐에서 처리
+            output_dir = tempfile.mkdtemp(prefix='job_', dir=os.path.dirname(temp_file))
+            tasks, output_names = plan_split_tasks(selected_sheets, sheet_names, base_filename, output_dir,
+                                                   extension)
+            if not tasks:
+                shutil.rmtree(output_dir, ignore_errors=True)
+                return jsonify({'error': '분리할 수 있는 시트가 없습니다.'}), 400
 
-                            try:
-                                new_cell.border = Border(
-                                    left=cell.border.left,
-                                    right=cell.border.right,
-                                    top=cell.border.top,
-                                    bottom=cell.border.bottom,
-                                    diagonal=cell.border.diagonal,
-                                    diagonal_direction=cell.border.diagonal_direction
-                                )
-                            except:
-                                pass
+            try:
+                job = submit_job(session_id, temp_file, tasks, output_names, options,
+                                 f"{base_filename}_split.zip", output_dir, content_hash)
+            except queue.Full:
+                shutil.rmtree(output_dir, ignore_errors=True)
+                logger.warning(f"Job queue full, rejected split for session {session_id}")
+                return jsonify({'error': '대기 중인 작업이 너무 많습니다. 잠시 후 다시 시도해주세요.'}), 503
 
-                            try:
-                                new_cell.fill = PatternFill(
-                                    fill_type=cell.fill.fill_type,
-                                    start_color=cell.fill.start_color,
-                                    end_color=cell.fill.end_color,
-                                    fgColor=cell.fill.fgColor,
-                                    bgColor=cell.fill.bgColor
-                                )
-                            except:
-                                pass
+            return jsonify({
+                'job_id': job['job_id'],
+                'status': job['status'],
+                'status_url': f"/api/jobs/{job['job_id']}",
+                'result_url': f"/api/jobs/{job['job_id']}/result"
+            }), 202
 
-                            try:
-                                new_cell.number_format = cell.number_format
-                            except:
-                                pass
+        # 요청 처리 제한 시간 + 클라이언트 연결 종료 시 시트 분리 중단
+        cancel_token = CancelToken(REQUEST_TIMEOUT, probe=connection_probe(request.environ))
 
-                            try:
-                                new_cell.alignment = Alignment(
-                                    horizontal=cell.alignment.horizontal,
-                                    vertical=cell.alignment.vertical,
-                                    text_rotation=cell.alignment.text_rotation,
-                                    wrap_text=cell.alignment.wrap_text,
-                                    shrink_to_fit=cell.alignment.shrink_to_fit,
-                                    indent=cell.alignment.indent
-                                )
-                            except:
-                                pass
+        # 메모리 예산 입장 (대기하거나 저메모리 모드로 전환될 수 있음)
+        try:
+            ticket = admit_split(temp_file, selected_sheets, options, mode, timer, content_hash)
+        except AdmissionRejected as e:
+            return jsonify({'error': str(e)}), e.status
 
-                            try:
-                                new_cell.protection = Protection(
-                                    locked=cell.protection.locked,
-                                    hidden=cell.protection.hidden
-                                )
-                            except:
-                                pass
-
-                # 2. 열 너비 복사
-                for col_letter in source_sheet.column_dimensions:
-                    col_width = source_sheet.column_dimensions[col_letter].width
-                    if col_width:
-                        new_sheet.column_dimensions[col_letter].width = col_width
-
-                # 3. 행 높이 복사
-                for row_num in source_sheet.row_dimensions:
-                    row_height = source_sheet.row_dimensions[row_num].height
-                    if row_height:
-                        new_sheet.row_dimensions[row_num].height = row_height
-
-                # 4. Merged cells 복사
-                try:
-                    for merged_cell_range in source_sheet.merged_cells.ranges:
-                        new_sheet.merge_cells(str(merged_cell_range))
-                except:
-                    pass
-
-                # 파일명 생성
-                safe_sheet_name = sanitize_filename(sheet_name)
-                output_filename = f"{base_filename}_{safe_sheet_name}.xlsx"
-                output_filename = handle_duplicate_filename(output_filename, existing_names)
-                existing_names.add(output_filename)
-
-                # 버퍼에 저장
-                output_buffer = io.BytesIO()
-                new_workbook.save(output_buffer)
-                output_buffer.seek(0)
-                output_files[output_filename] = output_buffer.getvalue()
+        output_dir = tempfile.mkdtemp(prefix='output_', dir=os.path.dirname(temp_file))
 
-                new_workbook.close()
-                logger.info(f"Sheet split completed: {sheet_name} -> {output_filename}")
+        if mode != 'sheets':
+            # 행 범위/키 분리: 파일 수를 미리 알 수 없으므로 항상 ZIP
+            logger.info(f"Streaming split: mode={mode}, options={mode_options}")
+            outputs = iter_streaming_split_outputs(temp_file, selected_sheets, sheet_names, base_filename,
+                                                   output_dir, mode, mode_options, cancel_token, timer)
+            single_file = False
+        else:
+            tasks, output_names = plan_split_tasks(selected_sheets, sheet_names, base_filename, output_dir,
+                                                   extension)
 
-            except Exception as e:
-                logger.error(f"Error splitting sheet '{sheet_name}': {str(e)}")
-                continue
+            def completed_outputs():
+                """완료된 시트 결과를 (파일명, 경로)로 순차 반환"""
+                for index, result in run_split_tasks(temp_file, tasks, options, cancel_token, content_hash,
+                                                     timer):
+                    if result is None:
+                        continue
+                    logger.info(
+                        f"Sheet split completed: {tasks[index][0]} -> {output_names[index]} "
+                        f"(engine={result['engine']})"
+                    )
+                    yield output_names[index], result['path']
 
-        source_workbook.close()
+            outputs = completed_outputs()
+            single_file = len(tasks) == 1
 
-        if not output_files:
+        # 첫 결과가 나올 때까지 기다린 뒤 응답 형식 결정
+        try:
+            first_output = next(outputs, None)
+        except SplitLimitExceeded as e:
+            ticket.release()
+            shutil.rmtree(output_dir, ignore_errors=True)
+            return jsonify({'error': str(e)}), 400
+        except SplitCancelled as e:
+            ticket.release()
+            shutil.rmtree(output_dir, ignore_errors=True)
+            logger.warning(f"Split {str(e)} before response for session {session_id}")
+            timer.finish('split', session_id=session_id, bytes_in=bytes_in, status=str(e))
+            if str(e) == 'timeout':
+                return jsonify({'error': '처리 시간 초과'}), 504
+            return jsonify({'error': '요청이 취소되었습니다.'}), 499  # 클라이언트 연결 종료
+        if first_output is None:
+            outputs.close()
+            ticket.release()
+            shutil.rmtree(output_dir, ignore_errors=True)
             return jsonify({'error': '분리할 수 있는 시트가 없습니다.'}), 400
 
         # 결과 반환
-        if len(output_files) == 1:
-            # 파일 1개: 직접 다운로드
-            filename, content = list(output_files.items())[0]
-            logger.info(f"Single file download: {filename}")
+        if single_file:
+            # 파일 1개: 직접 다운로드 (열어 둔 뒤 출력 디렉토리는 바로 정리)
+            output_filename, output_path = first_output
+            ticket.release()
+            output_file = open(output_path, 'rb')
+            bytes_out = os.path.getsize(output_path)
+            shutil.rmtree(output_dir, ignore_errors=True)
+            logger.info(f"Single file download: {output_filename}")
+
+            BYTES_OUT.inc(bytes_out)
+            RESPONSE_BYTES.observe(bytes_out)
+            timer.finish('split', session_id=session_id, bytes_in=bytes_in, bytes_out=bytes_out)
 
             return send_file(
-                io.BytesIO(content),
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                output_file,
+                mimetype=output_mimetype(output_filename),
                 as_attachment=True,
-                download_name=filename
+                download_name=output_filename
             )
 
-        else:
-            # 여러 파일: ZIP 생성
-            zip_buffer = io.BytesIO()
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-                for fname, content in output_files.items():
-                    zf.writestr(fname, content)
+        # 여러 파일: 시트가 완료되는 대로 ZIP 멤버로 스트리밍
+        zip_filename = f"{base_filename}_split.zip"
+        logger.info(f"ZIP download: {zip_filename} (streaming)")
 
-            zip_buffer.seek(0)
-            zip_filename = f"{base_filename}_split.zip"
-            logger.info(f"ZIP download: {zip_filename} ({len(output_files)} files)")
+        def generate():
+            bytes_out = 0
+            # 응답을 시작한 뒤에는 시간 제한 없음 (REQUEST_TIMEOUT 은 응답 전 분리 작업에만 적용, 다운로드 시간 제외)
+            cancel_token.deadline = None
+            try:
+                for chunk in stream_zip(itertools.chain([first_output], outputs), timer):
+                    bytes_out += len(chunk)
+                    yield chunk
+            except GeneratorExit:
+                # 클라이언트 연결 종료: 실행 중인 시트 분리(풀 워커 포함)를 중단
+                cancel_token.cancel('disconnected')
+                logger.info(f"Client disconnected during split for session {session_id}")
+                raise
+            except Exception as e:
+                # 응답 전송 중 취소/오류: 그대로 끝내면 잘린 ZIP 이 정상 응답(200)처럼 전달되므로
+                # 예외를 다시 던져 서버가 연결을 끊도록 함 (클라이언트는 불완전한 응답으로 인식)
+                logger.warning(f"Split aborted during response for session {session_id}: {str(e)}")
+                raise
+            finally:
+                outputs.close()
+                ticket.release()
+                shutil.rmtree(output_dir, ignore_errors=True)
+                BYTES_OUT.inc(bytes_out)
+                RESPONSE_BYTES.observe(bytes_out)
+                timer.finish('split', session_id=session_id, bytes_in=bytes_in, bytes_out=bytes_out)
 
-            return send_file(
-                zip_buffer,
-                mimetype='application/zip',
-                as_attachment=True,
-                download_name=zip_filename
-            )
+        return Response(
+            stream_with_context(generate()),
+            mimetype='application/zip',
+            headers=download_headers(zip_filename)
+        )
 
     except Exception as e:
+        if ticket is not None:
+            ticket.release()
         logger.error(f"Split handler error: {str(e)}")
         return jsonify({'error': '처리 중 오류가 발생했습니다.'}), 500
 
-    finally:
-        # 오래된 세션 정리
-        cleanup_old_sessions()
+    # 오래된 세션 정리는 백그라운드 정리 스레드(start_janitor)에서 수행
+    # 처리 후 임시 파일 삭제 (선택)
+    # 다운로드 직후 삭제하려면 응답 반환 전에 (보안 강화):
+    # session = get_session_store().get(session_id)
+    # if session and session.get('temp_dir'):
+    #     shutil.rmtree(session['temp_dir'], ignore_errors=True)
+    #     get_session_store().delete(session_id)
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    GET /api/jobs/<job_id>
+    응답: {'job_id', 'status', 'progress': {'done', 'failed', 'total'}, 'sheets': [{'name', 'status'}], ...}
+    status: queued | running | completed | failed | cancelled | timeout
+    """
+    record = find_job_record(job_id)
+    if record is None:
+        return jsonify({'error': '작업을 찾을 수 없습니다.'}), 404
+    record.pop('result_path', None)
+    return jsonify(record), 200
+
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """
+    GET /api/jobs/<job_id>/result
+    응답: Excel파일 또는 ZIP파일 (작업 완료 후)
+    """
+    job = find_job_record(job_id)
+    if job is None:
+        return jsonify({'error': '작업을 찾을 수 없습니다.'}), 404
+
+    if job['status'] != 'completed':
+        return jsonify({'error': '작업이 완료되지 않았습니다.', 'status': job['status']}), 409
+
+    if not os.path.exists(job['result_path']):
+        return jsonify({'error': '결과 파일이 만료되었습니다.'}), 410
+
+    BYTES_OUT.inc(os.path.getsize(job['result_path']))
+    return send_file(
+        job['result_path'],
+        mimetype=output_mimetype(job['download_name']),
+        as_attachment=True,
+        download_name=job['download_name']
+    )
+
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """
+    POST /api/jobs/<job_id>/cancel
+    대기 중인 작업은 실행하지 않고, 실행 중인 작업은 다음 확인 지점에서 중단
+    다른 워커 프로세스의 작업이면 세션 저장소에 취소 요청을 남기고, 실행 중인 프로세스가 확인해서 중단
+    """
+    job = JOBS.get(job_id)
+    if job is not None:
+        if job['status'] not in JOB_FINAL_STATES:
+            job['token'].cancel()
+            if job['status'] == 'queued':
+                job['status'] = 'cancelled'
+            publish_job(job)
+            logger.info(f"Split job cancel requested: {job_id}")
+        return jsonify(job_status(job)), 200
+
+    record = find_job_record(job_id)
+    if record is None:
+        return jsonify({'error': '작업을 찾을 수 없습니다.'}), 404
+
+    if record['status'] not in JOB_FINAL_STATES:
+        get_session_store().put(_job_key(job_id, ':cancel'), {'job_id': job_id}, TEMP_CLEANUP_INTERVAL)
+        logger.info(f"Split job cancel requested for another worker: {job_id}")
+
+    record.pop('result_path', None)
+    return jsonify(record), 200
+
+
+# ==================== WORKBOOK SPLIT ====================
+# 워크북 1개 분리 핵심 처리 (입장 제어 + 시트별 분리) - /api/batch 와 헤드리스 CLI(cli.py) 공통
+
+def split_workbook(source_path, output_dir, base_filename, selected_sheets=None, options=None, extension='xlsx',
+                   cancel_token=None, content_hash=None, skip_output=None, timer=None):
+    """
+    워크북 1개를 시트별 파일로 분리 (요청 컨텍스트 없이 동작 - /api/batch, cli.py 공통)
+    - .xls 는 output_dir 에 xlsx 로 변환해서 사용 (원본은 그대로 둠)
+    - selected_sheets: 시트 이름 목록 (None: 전체 시트) 또는 callable(전체 시트 이름 목록) → 시트 이름 목록
+    - skip_output: callable(출력 파일명) - True 이면 해당 시트는 분리하지 않음 (report['skipped_sheets'])
+    - 메모리 입장 제어(admit_split) 후 run_split_tasks 로 분리, 결과 파일은 output_dir 안의 임시 이름
+    반환: (outputs, report, timer)
+    - outputs: [(출력 파일명, 결과 경로), ...] - 완료 순서
+    - report: {'status': completed/skipped/failed, 'sheets', 'failed_sheets', 'skipped_sheets',
+               'missing_sheets'(있을 때), 'error'(실패 시)}
+    """
+    timer = timer or StageTimer()
+    report = {'sheets': [], 'failed_sheets': [], 'skipped_sheets': []}
+    outputs = []
+    os.makedirs(output_dir, exist_ok=True)
+
+    try:
+        path = source_path
+        if is_xls_file(path):
+            if xlrd is None:
+                raise ValueError('XLS 파일 변환을 지원하지 않는 서버입니다.')
+            with timer.stage('convert'):
+                path = os.path.join(output_dir, 'source.xlsx')
+                convert_xls(source_path, path)
+        with timer.stage('probe'):
+            sheet_names = [info['name'] for info in probe_workbook(path)]
+    except SplitCancelled:
+        raise
+    except Exception as e:
+        logger.error(f"Workbook load failed: {source_path}: {str(e)}")
+        report.update({'status': 'failed', 'error': str(e) if isinstance(e, ValueError) else '파일을 읽을 수 없습니다.'})
+        return outputs, report, timer
+
+    if callable(selected_sheets):
+        selected_sheets = selected_sheets(sheet_names)
+        if not selected_sheets:
+            report['status'] = 'skipped'
+            return outputs, report, timer
+
+    tasks, output_names = plan_split_tasks(selected_sheets or sheet_names, sheet_names, base_filename, output_dir,
+                                           extension)
+    missing = [sheet for sheet in (selected_sheets or []) if sheet not in sheet_names]
+    if missing:
+        report['missing_sheets'] = missing
+
+    if skip_output is not None:
+        pending = []
+        for task, output_name in zip(tasks, output_names):
+            if skip_output(output_name):
+                report['skipped_sheets'].append(task[0])
+            else:
+                pending.append((task, output_name))
+        tasks = [task for task, _ in pending]
+        output_names = [output_name for _, output_name in pending]
+        if not tasks and report['skipped_sheets']:
+            report['status'] = 'skipped'
+            return outputs, report, timer
+
+    options = dict(options or {})  # 워크북마다 저메모리 모드 여부가 다를 수 있음
+    try:
+        ticket = admit_split(path, [sheet for sheet, _ in tasks], options, timer=timer, content_hash=content_hash)
+    except AdmissionRejected as e:
+        report.update({'status': 'failed', 'error': str(e)})
+        return outputs, report, timer
+    with ticket:
+        for index, result in run_split_tasks(path, tasks, options, cancel_token, content_hash, timer):
+            if result is None:
+                report['failed_sheets'].append(tasks[index][0])
+                continue
+            report['sheets'].append(tasks[index][0])
+            outputs.append((output_names[index], result['path']))
+
+    report['status'] = 'completed' if outputs else 'failed'
+    if not outputs:
+        report['error'] = '분리할 수 있는 시트가 없습니다.'
+    return outputs, report, timer
+
+
+# ==================== BATCH SPLIT ====================
+# 여러 워크북(또는 워크북 ZIP)을 한 요청으로 분리: 워크북별 폴더로 묶은 ZIP 1개를 완료 순서대로 스트리밍
+
+def _batch_selection(raw):
+    """
+    selection 폼 필드(JSON) 검증: {파일명: [시트, ...] | '*'}
+    생략/'*' 인 워크북은 전체 시트 분리
+    """
+    if not raw:
+        return {}
+    try:
+        selection = json.loads(raw)
+    except ValueError:
+        raise ValueError('selection 은 JSON 객체여야 합니다.')
+    if not isinstance(selection, dict):
+        raise ValueError('selection 은 JSON 객체여야 합니다.')
+    for name, sheets in selection.items():
+        if sheets == '*':
+            continue
+        if not isinstance(sheets, list) or not sheets or not all(isinstance(sheet, str) for sheet in sheets):
+            raise ValueError(f"'{name}' 의 시트 선택은 시트 이름 목록 또는 '*' 여야 합니다.")
+        if len(sheets) > 100:
+            raise ValueError(f"'{name}' 의 선택 시트가 너무 많습니다. (최대 100개)")
+    return selection
+
+
+def collect_batch_workbooks(files, batch_dir):
+    """
+    업로드 파일 → 워크북 목록 (ZIP 은 안의 .xlsx/.xls 를 꺼냄, 그 외 멤버와 폴더 구조는 무시)
+    반환: [{'filename', 'keys', 'path', 'sha256'}, ...] - keys: selection 조회용 이름 (업로드명 또는 ZIP 내 경로/파일명)
+    잘못된 입력이면 ValueError (사용자 메시지)
+    """
+    workbooks = []
+    extracted = 0
+
+    def add_workbook(stream, filename, keys):
+        if len(workbooks) >= BATCH_MAX_FILES:
+            raise ValueError(f'워크북이 너무 많습니다. (최대 {BATCH_MAX_FILES}개)')
+        extension = filename.rsplit('.', 1)[1].lower()
+        path = os.path.join(batch_dir, f"source_{len(workbooks)}.{extension}")
+        size, digest = write_stream(stream, path)
+        workbooks.append({'filename': filename, 'keys': keys, 'path': path, 'sha256': digest.hexdigest()})
+        return size
+
+    for file in files:
+        if not file.filename:
+            continue
+        if file.filename.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(file.stream) as zf:
+                    for info in zf.infolist():
+                        member_name = posixpath.basename(info.filename)
+                        if info.is_dir() or info.filename.startswith('__MACOSX/') or member_name.startswith('.') \
+                                or not allowed_file(member_name):
+                            continue
+                        extracted += info.file_size
+                        if extracted > BATCH_MAX_EXTRACT_SIZE:
+                            raise ValueError('ZIP 압축 해제 크기가 너무 큽니다.')
+                        with zf.open(info) as member:
+                            add_workbook(member, member_name, (info.filename, member_name))
+            except zipfile.BadZipFile:
+                raise ValueError(f"'{file.filename}' 은(는) 올바른 ZIP 파일이 아닙니다.")
+        elif allowed_file(file.filename):
+            add_workbook(file.stream, file.filename, (file.filename,))
+        else:
+            raise ValueError(f"'{file.filename}': XLSX, XLS 또는 ZIP 파일만 지원합니다.")
+
+    return workbooks
+
+
+def split_batch_workbook(workbook, folder, selected_sheets, options, extension, cancel_token):
+    """
+    일괄 분리 워크북 1개 처리 (스레드 풀에서 실행, 시트 분리는 run_split_tasks - 프로세스 풀 공유)
+    반환: (outputs, report, timer)
+    - outputs: [(ZIP 내 '폴더/파일명', 결과 경로), ...]
+    - report: 워크북 처리 결과 (batch_report.json 항목)
+    """
+    output_dir = os.path.splitext(workbook['path'])[0] + '_output'
+    outputs, report, timer = split_workbook(workbook['path'], output_dir, folder, selected_sheets, options,
+                                            extension, cancel_token, workbook['sha256'])
+    report = {'filename': workbook['filename'], 'folder': folder, **report}
+    report.pop('skipped_sheets')
+    return [(f"{folder}/{output_name}", path) for output_name, path in outputs], report, timer
+
 
-        # 처리 후 임시 파일 삭제 (선택)
-        # 주석 제거 시 다운로드 직후 삭제 (보안 강화)
-        # if session_id in SESSION_STORE:
-        #     temp_dir = SESSION_STORE[session_id].get('temp_dir')
-        #     if temp_dir:
-        #         shutil.rmtree(temp_dir, ignore_errors=True)
+_BATCH_POOL = None
+_BATCH_POOL_LOCK = threading.Lock()
+
+
+def get_batch_pool():
+    """
+    일괄 분리 워크북 처리 스레드 풀 (모든 /api/batch 요청이 공유)
+    동시에 처리하는 워크북 수는 요청 수와 관계없이 BATCH_WORKERS 이하
+    """
+    global _BATCH_POOL
+    with _BATCH_POOL_LOCK:
+        if _BATCH_POOL is None:
+            _BATCH_POOL = ThreadPoolExecutor(max_workers=max(BATCH_WORKERS, 1), thread_name_prefix='batch')
+        return _BATCH_POOL
+
+
+@app.route('/api/batch', methods=['POST'])
+def batch_split():
+    """
+    POST /api/batch
+    요청: multipart/form-data (최대 BATCH_MAX_SIZE)
+        - files: 워크북(.xlsx/.xls) 또는 워크북 ZIP (여러 번 지정 가능)
+        - selection: JSON {파일명: [시트, ...] | '*'} (선택, 생략된 워크북은 전체 시트)
+                     ZIP 안의 워크북은 ZIP 내 경로 또는 파일명으로 지정
+        - output_format / values: /api/split 과 동일 (선택)
+    응답: ZIP (스트리밍) - 워크북별 폴더, 워크북이 완료되는 순서대로 기록
+          마지막에 batch_report.json (워크북별 status, sheets, failed_sheets, error)
+    """
+    timer = StageTimer()
+    batch_dir = None
+
+    try:
+        try:
+            selection = _batch_selection(request.form.get('selection'))
+            options, extension = parse_output_format(request.form)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        batch_dir = tempfile.mkdtemp(prefix=SESSION_DIR_PREFIX)
+        try:
+            with timer.stage('receive'):
+                workbooks = collect_batch_workbooks(request.files.getlist('files'), batch_dir)
+        except ValueError as e:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+            return jsonify({'error': str(e)}), 400
+
+        if not workbooks:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+            return jsonify({'error': '분리할 워크북이 없습니다.'}), 400
+
+        bytes_in = sum(os.path.getsize(workbook['path']) for workbook in workbooks)
+        BYTES_IN.inc(bytes_in)
+        UPLOAD_BYTES.observe(bytes_in)
+
+        # 워크북별 ZIP 폴더명 (원본 파일명 기준, 중복 시 name(1) ...)
+        folders = []
+        existing_names = {BATCH_REPORT_NAME}
+        for workbook in workbooks:
+            folder = sanitize_filename(os.path.splitext(workbook['filename'])[0]) or 'workbook'
+            folder = handle_duplicate_filename(folder, existing_names)
+            existing_names.add(folder)
+            folders.append(folder)
+
+        batch_id = os.path.basename(batch_dir)
+        logger.info(f"Batch split: {batch_id}, {len(workbooks)} workbooks, {bytes_in} bytes")
+        cancel_token = CancelToken(REQUEST_TIMEOUT, probe=connection_probe(request.environ))
+
+        def batch_outputs():
+            """워크북이 완료되는 순서대로 결과 (ZIP 내 파일명, 경로) 반환, 마지막에 처리 결과 파일"""
+            reports = [None] * len(workbooks)
+            pool = get_batch_pool()
+            futures = {}
+            try:
+                for index, workbook in enumerate(workbooks):
+                    selected = next((selection[key] for key in workbook['keys'] if key in selection), '*')
+                    futures[pool.submit(split_batch_workbook, workbook, folders[index],
+                                        None if selected == '*' else selected,
+                                        options, extension, cancel_token)] = index
+
+                for future in as_completed(futures):
+                    index = futures[future]
+                    try:
+                        outputs, report, workbook_timer = future.result()
+                    except SplitCancelled:
+                        raise
+                    except Exception as e:
+                        # 워크북 1개의 예기치 못한 오류는 처리 결과에 기록하고 나머지 워크북은 계속
+                        logger.error(f"Batch workbook failed: {workbooks[index]['filename']}: {str(e)}")
+                        outputs, workbook_timer = [], None
+                        report = {'filename': workbooks[index]['filename'], 'folder': folders[index],
+                                  'sheets': [], 'failed_sheets': [], 'status': 'failed',
+                                  'error': '처리 중 오류가 발생했습니다.'}
+                    reports[index] = report
+                    if workbook_timer is not None:
+                        timer.merge(workbook_timer)
+                    logger.info(f"Batch workbook {report['status']}: {report['filename']} "
+                                f"({len(report['sheets'])} sheets)")
+                    yield from outputs
+
+                report_path = os.path.join(batch_dir, BATCH_REPORT_NAME)
+                with open(report_path, 'w', encoding='utf-8') as f:
+                    json.dump({'workbooks': reports}, f, ensure_ascii=False, indent=2)
+                yield BATCH_REPORT_NAME, report_path
+            finally:
+                # 연결 종료 등으로 중단되면 남은 시트는 실행하지 않음 (공유 풀이므로 이 요청의 작업만 취소하고 종료 대기)
+                cancel_token.cancel()
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+
+        outputs = batch_outputs()
+
+        # 첫 결과가 나올 때까지 기다린 뒤 응답 시작 (그 전의 시간 초과/연결 종료는 오류 응답)
+        try:
+            first_output = next(outputs)
+        except SplitCancelled as e:
+            outputs.close()
+            shutil.rmtree(batch_dir, ignore_errors=True)
+            logger.warning(f"Batch split {str(e)} before response: {batch_id}")
+            timer.finish('batch', batch_id=batch_id, workbooks=len(workbooks), bytes_in=bytes_in, status=str(e))
+            if str(e) == 'timeout':
+                return jsonify({'error': '처리 시간 초과'}), 504
+            return jsonify({'error': '요청이 취소되었습니다.'}), 499  # 클라이언트 연결 종료
+
+        def generate():
+            bytes_out = 0
+            # 응답을 시작한 뒤에는 시간 제한 없음 (/api/split 과 동일)
+            cancel_token.deadline = None
+            try:
+                for chunk in stream_zip(itertools.chain([first_output], outputs), timer):
+                    bytes_out += len(chunk)
+                    yield chunk
+            except GeneratorExit:
+                cancel_token.cancel('disconnected')
+                logger.info(f"Client disconnected during batch split: {batch_id}")
+                raise
+            except Exception as e:
+                # 잘린 ZIP 이 정상 응답처럼 끝나지 않도록 연결을 끊음 (/api/split 과 동일)
+                logger.warning(f"Batch split aborted during response: {batch_id}: {str(e)}")
+                raise
+            finally:
+                outputs.close()
+                shutil.rmtree(batch_dir, ignore_errors=True)
+                BYTES_OUT.inc(bytes_out)
+                RESPONSE_BYTES.observe(bytes_out)
+                timer.finish('batch', batch_id=batch_id, workbooks=len(workbooks),
+                             bytes_in=bytes_in, bytes_out=bytes_out)
+
+        zip_filename = f"batch_split_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        return Response(
+            stream_with_context(generate()),
+            mimetype='application/zip',
+            headers=download_headers(zip_filename)
+        )
+
+    except Exception as e:
+        if batch_dir:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+        if isinstance(e, HTTPException):
+            raise  # 요청 크기 초과(413) 등은 에러 핸들러에서 응답
+        logger.error(f"Batch handler error: {str(e)}")
+        return jsonify({'error': '처리 중 오류가 발생했습니다.'}), 500
 
 
 # ==================== ERROR HANDLERS ====================
@@ -472,8 +4755,9 @@ def split_sheets():
 @app.errorhandler(413)
 def request_entity_too_large(error):
     """파일 크기 초과"""
+    limit = BATCH_MAX_SIZE if request.endpoint == 'batch_split' else MAX_FILE_SIZE
     return jsonify({
-        'error': f'파일이 너무 큽니다. 최대 {MAX_FILE_SIZE / 1024 / 1024:.0f}MB입니다.'
+        'error': f'파일이 너무 큽니다. 최대 {limit / 1024 / 1024:.0f}MB입니다.'
     }), 413
 
 
@@ -490,8 +4774,12 @@ if __name__ == '__main__':
     logger.info("=" * 60)
     logger.info("Excel Sheet Splitter - Backend Server Starting")
     logger.info(f"Max file size: {MAX_FILE_SIZE / 1024 / 1024:.0f}MB")
+    logger.info(f"Split workers: {SPLIT_WORKERS}")
     logger.info("=" * 60)
 
+    # 프로세스 풀 예열 (첫 요청에서 워커 기동 비용이 발생하지 않도록)
+    get_split_pool()
+
     # Flask 실행
     app.run(
         host='0.0.0.0',
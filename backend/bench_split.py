@@ -0,0 +1,439 @@
+"""
+Excel Sheet Splitter - 분리 파이프라인 벤치마크
+실행:
+    python bench_split.py --output baseline.json            # 기준값 기록
+    python bench_split.py --compare baseline.json           # 기준값 대비 회귀 확인 (회귀 시 exit 1)
+    python bench_split.py --quick --scenario tall_plain     # 축소 크기로 일부 시나리오만
+
+시나리오마다 합성 워크북을 생성하고, 별도 프로세스에서 분리를 실행해
+wall time / peak RSS / tracemalloc peak / 출력 크기를 측정한다.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import re
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import openpyxl
+from openpyxl.comments import Comment
+from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# ==================== SCENARIOS ====================
+# sheets: 시트 수 / rows, cols: 시트별 크기 / style_density: 스타일 적용 셀 비율
+# merged: 시트별 병합 범위 수 / formulas: 수식 셀 비율 / shared_strings: 문자열 풀 크기 (0: 숫자만)
+# comments: 시트별 댓글 수 (1 이상이면 원시 엔진 대신 openpyxl 경로 사용)
+# options: /api/split 옵션
+
+SCENARIOS = {
+    'many_small_sheets': {
+        'sheets': 40, 'rows': 200, 'cols': 8, 'style_density': 0.2,
+        'merged': 5, 'formulas': 0.05, 'shared_strings': 200, 'comments': 0,
+        'options': {},
+    },
+    'wide_styled': {
+        'sheets': 3, 'rows': 5000, 'cols': 30, 'style_density': 0.8,
+        'merged': 20, 'formulas': 0.1, 'shared_strings': 1000, 'comments': 0,
+        'options': {},
+    },
+    'tall_plain': {
+        'sheets': 2, 'rows': 100000, 'cols': 10, 'style_density': 0.0,
+        'merged': 0, 'formulas': 0.0, 'shared_strings': 5000, 'comments': 0,
+        'options': {},
+    },
+    'openpyxl_copy_loop': {
+        'sheets': 3, 'rows': 5000, 'cols': 20, 'style_density': 0.5,
+        'merged': 10, 'formulas': 0.05, 'shared_strings': 500, 'comments': 1,
+        'options': {'streaming': False},
+    },
+    'streaming_copy': {
+        'sheets': 2, 'rows': 30000, 'cols': 10, 'style_density': 0.3,
+        'merged': 5, 'formulas': 0.0, 'shared_strings': 1000, 'comments': 1,
+        'options': {'streaming': True},
+    },
+    'csv_export': {
+        'sheets': 3, 'rows': 5000, 'cols': 20, 'style_density': 0.5,
+        'merged': 10, 'formulas': 0.05, 'shared_strings': 500, 'comments': 1,
+        'options': {'output_format': 'csv', 'values': 'cached'},
+    },
+}
+
+# 회귀 판단 대상 지표
+COMPARED_METRICS = ('wall_s', 'peak_rss_bytes', 'tracemalloc_peak_bytes', 'output_bytes')
+COMPARED_META = ('mode', 'quick', 'workers')  # 기준값과 같아야 비교할 수 있는 측정 조건
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+INLINE_STRING_PATTERN = re.compile(
+    r'<c r="([A-Z]+[0-9]+)"((?: s="[0-9]+")?) t="inlineStr"><is>(<t[^>]*>.*?</t>)</is></c>'
+)
+
+
+# ==================== WORKBOOK GENERATOR ====================
+
+def generate_workbook(path, sheets=1, rows=100, cols=5, style_density=0.0, merged=0,
+                      formulas=0.0, shared_strings=0, comments=0, seed=0):
+    """
+    합성 워크북 생성
+    - 문자열 셀은 shared_strings 크기의 풀에서 선택하고, 저장 후 sharedStrings.xml 로 변환
+      (openpyxl 은 inline 문자열로 저장하므로 엑셀 저장본과 같은 구조로 맞춤)
+    """
+    rng = random.Random(seed)
+    styles = [
+        {'font': Font(bold=True)},
+        {'fill': PatternFill(fill_type='solid', fgColor='FFFF00')},
+        {'font': Font(italic=True, color='FF0000'), 'number_format': '0.00'},
+        {'alignment': Alignment(horizontal='center', wrap_text=True)},
+        {'number_format': 'yyyy-mm-dd'},
+    ]
+    pool = [f"문자열_{i}_{'x' * (i % 17)}" for i in range(shared_strings)]
+
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+
+    for sheet_index in range(sheets):
+        ws = wb.create_sheet(f"Sheet{sheet_index + 1}")
+
+        for row in range(1, rows + 1):
+            values = []
+            for col in range(1, cols + 1):
+                roll = rng.random()
+                if roll < formulas and row > 1:
+                    values.append(f"=SUM({get_column_letter(col)}1:{get_column_letter(col)}{row - 1})")
+                elif pool and col % 2 == 0:
+                    values.append(pool[rng.randrange(len(pool))])
+                else:
+                    values.append(round(rng.random() * 10000, 2))
+            ws.append(values)
+
+            if style_density:
+                for col in range(1, cols + 1):
+                    if rng.random() < style_density:
+                        cell = ws.cell(row=row, column=col)
+                        for attr, value in styles[rng.randrange(len(styles))].items():
+                            setattr(cell, attr, value)
+
+        for col in range(1, cols + 1, 3):
+            ws.column_dimensions[get_column_letter(col)].width = 10 + col % 7
+
+        for index in range(merged):
+            row = 1 + (index * 3) % max(rows - 1, 1)
+            col = 1 + (index * 2) % max(cols - 1, 1)
+            ws.merge_cells(start_row=row, start_column=col, end_row=row + 1, end_column=col + 1)
+
+        for index in range(comments):
+            ws.cell(row=1, column=1 + index % cols).comment = Comment(f"memo {index}", 'bench')
+
+    wb.save(path)
+    wb.close()
+
+    if shared_strings:
+        convert_to_shared_strings(path)
+
+
+def convert_to_shared_strings(path):
+    """openpyxl 이 저장한 inline 문자열 셀을 공유 문자열 테이블(sharedStrings.xml) 참조로 변환"""
+    table = {}
+    temp_path = path + '.tmp'
+
+    with zipfile.ZipFile(path) as zin, zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as zout:
+        def intern(match):
+            index = table.setdefault(match.group(3), len(table))
+            return f'<c r="{match.group(1)}"{match.group(2)} t="s"><v>{index}</v></c>'
+
+        for info in zin.infolist():
+            data = zin.read(info.filename)
+            if info.filename.startswith('xl/worksheets/sheet'):
+                data = INLINE_STRING_PATTERN.sub(intern, data.decode('utf-8')).encode('utf-8')
+            elif info.filename == '[Content_Types].xml':
+                data = data.replace(b'</Types>', (
+                    b'<Override PartName="/xl/sharedStrings.xml" ContentType="application/'
+                    b'vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>'
+                ))
+            elif info.filename == 'xl/_rels/workbook.xml.rels':
+                data = data.replace(b'</Relationships>', (
+                    b'<Relationship Id="rIdSst" Type="http://schemas.openxmlformats.org/officeDocument/'
+                    b'2006/relationships/sharedStrings" Target="sharedStrings.xml"/></Relationships>'
+                ))
+            zout.writestr(info, data)
+
+        count = len(table)
+        zout.writestr('xl/sharedStrings.xml', (
+            f'<sst xmlns="{NS_MAIN}" count="{count}" uniqueCount="{count}">'
+            + ''.join(f'<si>{text}</si>' for text in table)
+            + '</sst>'
+        ))
+
+    os.replace(temp_path, path)
+
+
+# ==================== MEASUREMENT ====================
+
+def _run_split(app_module, path, mode, options, output_dir):
+    """분리 1회 실행, 반환: 출력 bytes"""
+    if mode == 'core':
+        sheet_names = [info['name'] for info in app_module.probe_workbook(path)]
+        tasks = [(name, os.path.join(output_dir, f"{i}.xlsx")) for i, name in enumerate(sheet_names)]
+        total = 0
+        for _, result in app_module.run_split_tasks(path, tasks, options):
+            if result is not None:
+                total += result['size']
+                os.remove(result['path'])
+        return total
+
+    client = app_module.app.test_client()
+    with open(path, 'rb') as f:
+        upload = client.post('/api/upload', data={'file': (f, os.path.basename(path))},
+                             content_type='multipart/form-data')
+    upload_data = upload.get_json()
+    response = client.post('/api/split', json={
+        'session_id': upload_data['session_id'],
+        'temp_file': upload_data['temp_file'],
+        'filename': upload_data['filename'],
+        'sheets': upload_data['sheets'],
+        **options
+    })
+    output_bytes = len(response.data)
+    shutil.rmtree(os.path.dirname(upload_data['temp_file']), ignore_errors=True)
+    return output_bytes
+
+
+def _peak_rss_bytes():
+    """
+    프로세스 peak RSS
+    - Linux 의 ru_maxrss 는 exec 이후에도 부모(워크북 생성)의 값을 이어받으므로 VmHWM 을 우선 사용
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Linux: KB, macOS: bytes
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+def measure_scenario(path, mode, options, workers, repeat):
+    """
+    별도 프로세스에서 실행되는 측정 본체
+    - 시간: tracemalloc 없이 repeat 회 실행한 중앙값
+    - 메모리: tracemalloc peak (1회 추가 실행), 프로세스 peak RSS
+    """
+    import logging
+    import app as app_module
+
+    logging.getLogger(app_module.__name__).setLevel(logging.WARNING)
+    app_module.SPLIT_WORKERS = workers
+    app_module.RESULT_CACHE_MAX_BYTES = 0
+    app_module._RESULT_CACHE = None
+    app_module.SESSION_STORE = app_module.MemorySessionStore()
+    app_module.app.config['TESTING'] = True
+
+    output_dir = tempfile.mkdtemp(prefix='bench_out_')
+    try:
+        timings = []
+        output_bytes = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output_bytes = _run_split(app_module, path, mode, options, output_dir)
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        _run_split(app_module, path, mode, options, output_dir)
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+        if app_module._SPLIT_POOL is not None:
+            app_module._SPLIT_POOL.shutdown()
+
+    return {
+        'wall_s': round(statistics.median(timings), 4),
+        'wall_runs_s': [round(t, 4) for t in timings],
+        'peak_rss_bytes': _peak_rss_bytes(),
+        'tracemalloc_peak_bytes': traced_peak,
+        'output_bytes': output_bytes,
+    }
+
+
+def _scenario_params(name, quick):
+    params = dict(SCENARIOS[name])
+    if quick:
+        params['rows'] = max(params['rows'] // 10, 10)
+        params['sheets'] = max(params['sheets'] // 4, 1)
+    return params
+
+
+def _workbook_for(name, params, workdir):
+    """시나리오 워크북 (파라미터 해시로 캐시해 재생성 비용 절약)"""
+    generator_params = {k: v for k, v in params.items() if k != 'options'}
+    digest = hashlib.sha256(json.dumps(generator_params, sort_keys=True).encode()).hexdigest()[:12]
+    path = os.path.join(workdir, f"{name}_{digest}.xlsx")
+    if not os.path.exists(path):
+        print(f"  generating {os.path.basename(path)} ...", file=sys.stderr)
+        generate_workbook(path, **generator_params)
+    return path
+
+
+def run_benchmarks(names, mode='core', workers=1, repeat=3, quick=False, workdir=None):
+    """시나리오 실행 후 결과 dict 반환 (시나리오마다 새 프로세스 - peak RSS 분리)"""
+    workdir = workdir or os.path.join(tempfile.gettempdir(), 'excel_splitter.bench')
+    os.makedirs(workdir, exist_ok=True)
+
+    results = {}
+    for name in names:
+        params = _scenario_params(name, quick)
+        path = _workbook_for(name, params, workdir)
+        print(f"  running {name} ({mode}) ...", file=sys.stderr)
+
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            result = executor.submit(measure_scenario, path, mode, params['options'], workers, repeat).result()
+
+        result['input_bytes'] = os.path.getsize(path)
+        result['params'] = params
+        results[name] = result
+
+    return {
+        'meta': {
+            'created_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'openpyxl': openpyxl.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'mode': mode,
+            'workers': workers,
+            'repeat': repeat,
+            'quick': quick,
+        },
+        'scenarios': results,
+    }
+
+
+# ==================== COMPARE ====================
+
+def meta_mismatches(baseline_meta, current_meta):
+    """측정 조건(COMPARED_META)이 다른 항목 [(항목, 기준값, 현재값), ...] - 양쪽에 모두 기록된 항목만 비교"""
+    return [
+        (key, baseline_meta[key], current_meta[key]) for key in COMPARED_META
+        if key in baseline_meta and key in current_meta and baseline_meta[key] != current_meta[key]
+    ]
+
+
+def compare_results(baseline, current, threshold=0.2):
+    """
+    기준값 대비 회귀 목록
+    반환: [(시나리오, 지표, 기준값, 현재값, 변화율), ...] - 변화율이 threshold 를 넘는 항목만
+    측정 조건(mode/quick/workers)이 다르면 ValueError (다른 조건끼리의 차이를 회귀로 보고하지 않도록)
+    """
+    mismatches = meta_mismatches(baseline.get('meta', {}), current.get('meta', {}))
+    if mismatches:
+        raise ValueError('baseline was recorded with different settings: ' + ', '.join(
+            f"{key}={old!r} (current {new!r})" for key, old, new in mismatches))
+
+    regressions = []
+    for name, result in current['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change > threshold:
+                regressions.append((name, metric, old, new, change))
+    return regressions
+
+
+def print_report(current, baseline=None):
+    header = f"{'scenario':<22}{'wall_s':>10}{'rss_MB':>10}{'traced_MB':>11}{'out_KB':>10}"
+    print(header)
+    print('-' * len(header))
+    for name, result in current['scenarios'].items():
+        line = (
+            f"{name:<22}{result['wall_s']:>10.3f}"
+            f"{result['peak_rss_bytes'] / 1024 / 1024:>10.1f}"
+            f"{result['tracemalloc_peak_bytes'] / 1024 / 1024:>11.1f}"
+            f"{result['output_bytes'] / 1024:>10.1f}"
+        )
+        base = (baseline or {}).get('scenarios', {}).get(name)
+        if base and base.get('wall_s'):
+            line += f"   ({(result['wall_s'] - base['wall_s']) / base['wall_s']:+.0%} wall)"
+        print(line)
+
+
+# ==================== MAIN ====================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Excel Sheet Splitter 분리 파이프라인 벤치마크')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='실행할 시나리오 (여러 번 지정 가능, 기본: 전체)')
+    parser.add_argument('--mode', choices=('core', 'client'), default='core',
+                        help='core: 분리 코어 직접 호출 / client: Flask 테스트 클라이언트로 업로드+분리')
+    parser.add_argument('--workers', type=int, default=1, help='SPLIT_WORKERS (기본 1: 순차 처리)')
+    parser.add_argument('--repeat', type=int, default=3, help='시간 측정 반복 횟수 (중앙값 사용)')
+    parser.add_argument('--quick', action='store_true', help='행/시트 수를 줄여 빠르게 실행')
+    parser.add_argument('--workdir', help='생성 워크북 보관 디렉토리')
+    parser.add_argument('--output', help='결과 JSON 저장 경로 (기준값으로 사용)')
+    parser.add_argument('--compare', help='비교할 기준값 JSON')
+    parser.add_argument('--threshold', type=float, default=0.2, help='회귀 판단 변화율 (기본 0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        # 측정 조건이 다른 기준값은 실행 전에 거부
+        mismatches = meta_mismatches(baseline.get('meta', {}),
+                                     {'mode': args.mode, 'quick': args.quick, 'workers': args.workers})
+        if mismatches:
+            parser.error('baseline was recorded with different settings: ' + ', '.join(
+                f"--{key} {old!r} (current {new!r})" for key, old, new in mismatches))
+
+    current = run_benchmarks(
+        args.scenario or list(SCENARIOS),
+        mode=args.mode,
+        workers=args.workers,
+        repeat=args.repeat,
+        quick=args.quick,
+        workdir=args.workdir,
+    )
+
+    print_report(current, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+        print(f"\nresults written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare_results(baseline, current, args.threshold)
+        if regressions:
+            print(f"\nREGRESSIONS (> {args.threshold:.0%}):")
+            for name, metric, old, new, change in regressions:
+                print(f"  {name}.{metric}: {old} -> {new} ({change:+.0%})")
+            return 1
+        print(f"\nno regressions (threshold {args.threshold:.0%})")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
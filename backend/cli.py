@@ -0,0 +1,234 @@
+"""
+Excel Sheet Splitter - 헤드리스 일괄 분리 CLI
+실행:
+    python cli.py INPUT_DIR OUTPUT_DIR                                   # 하위 디렉토리까지 모든 워크북 분리
+    python cli.py INPUT_DIR OUTPUT_DIR --include 'Sales*' --exclude '*_old'
+    python cli.py INPUT_DIR OUTPUT_DIR --format csv --jobs 4 --report report.json
+
+웹 서버 없이 app.split_workbook (/api/batch 와 같은 분리 핵심 처리)을 직접 호출한다.
+- 워크북 단위로 프로세스 풀에서 병렬 처리 (--jobs, 기본: CPU 코어 수 - 워크북 안의 시트는 순차 처리)
+- 출력: OUTPUT_DIR/<INPUT_DIR 기준 상대 경로>/<워크북 이름>/<워크북 이름>_<시트>.<확장자>
+- 출력 파일이 원본보다 새로우면 해당 시트는 건너뜀 (--force: 모두 다시 분리)
+- 실패한 워크북이 있으면 exit 1
+"""
+
+import argparse
+import fnmatch
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app as splitter
+
+OUTPUT_FORMATS = ('xlsx',) + tuple(splitter.FLAT_FORMATS)
+
+
+# ==================== DISCOVERY ====================
+
+def find_workbooks(input_dir, output_dir=None):
+    """
+    INPUT_DIR 아래 워크북(.xlsx/.xls) 상대 경로 목록 (정렬)
+    - 숨김 파일/디렉토리, Excel 잠금 파일(~$*), OUTPUT_DIR 은 제외
+    """
+    output_dir = os.path.realpath(output_dir) if output_dir else None
+    workbooks = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs[:] = sorted(
+            name for name in dirs
+            if not name.startswith('.') and os.path.realpath(os.path.join(root, name)) != output_dir
+        )
+        for name in sorted(files):
+            if name.startswith(('.', '~$')) or not splitter.allowed_file(name):
+                continue
+            workbooks.append(os.path.relpath(os.path.join(root, name), input_dir))
+    return workbooks
+
+
+def plan_output_folders(workbooks):
+    """
+    워크북별 출력 폴더 (OUTPUT_DIR 기준 상대 경로)
+    같은 디렉토리의 같은 이름 워크북(a.xlsx, a.xls)은 폴더 이름에만 handle_duplicate_filename 적용 (a, a(1))
+    (전체 경로에 적용하면 'v1.2/a' 처럼 디렉토리의 '.' 을 확장자로 보고 'v1(1).2/a' 가 됨)
+    """
+    existing = {}  # 상위 디렉토리 -> 사용한 폴더 이름
+    folders = []
+    for rel_path in workbooks:
+        parent, name = os.path.split(rel_path)
+        folder = splitter.sanitize_filename(os.path.splitext(name)[0]) or 'workbook'
+        names = existing.setdefault(parent, set())
+        folder = splitter.handle_duplicate_filename(folder, names)
+        names.add(folder)
+        folders.append(os.path.join(parent, folder))
+    return folders
+
+
+def sheet_selector(include, exclude):
+    """
+    --include/--exclude glob 패턴 → split_workbook 의 시트 선택 callable (대소문자 구분)
+    - include 가 없으면 전체 시트, exclude 는 include 결과에서 제외
+    """
+    def select(sheet_names):
+        selected = []
+        for name in sheet_names:
+            if include and not any(fnmatch.fnmatchcase(name, pattern) for pattern in include):
+                continue
+            if any(fnmatch.fnmatchcase(name, pattern) for pattern in exclude):
+                continue
+            selected.append(name)
+        return selected
+    return select
+
+
+# ==================== WORKER ====================
+
+def init_worker(jobs):
+    """
+    워크북 병렬 처리용 워커 초기화
+    - 시트 분리는 워커 안에서 순차 처리 (프로세스 풀 중첩 방지)
+    - 메모리 예산은 워커 수로 나눠서 적용
+    """
+    splitter.SPLIT_WORKERS = 1
+    budget = splitter.MEMORY_ADMISSION.budget
+    if budget > 0:
+        splitter.MEMORY_ADMISSION = splitter.MemoryAdmission(max(budget // jobs, 1))
+
+
+def split_one(input_dir, rel_path, output_dir, folder, include, exclude, options, extension, force):
+    """
+    워크북 1개 분리 후 결과를 OUTPUT_DIR/folder 로 이동
+    - 분리 결과는 출력 폴더 안 임시 디렉토리에 만든 뒤 os.replace (중단돼도 불완전한 출력이 남지 않음)
+    반환: 워크북 처리 결과 (report.json 항목)
+    """
+    started = time.perf_counter()
+    source_path = os.path.join(input_dir, rel_path)
+    dest_dir = os.path.join(output_dir, folder)
+    os.makedirs(dest_dir, exist_ok=True)
+    source_mtime = os.path.getmtime(source_path)
+
+    def up_to_date(output_name):
+        dest_path = os.path.join(dest_dir, output_name)
+        return not force and os.path.exists(dest_path) and os.path.getmtime(dest_path) >= source_mtime
+
+    scratch_dir = tempfile.mkdtemp(prefix='.splitting_', dir=dest_dir)
+    try:
+        base_filename = os.path.basename(folder)
+        outputs, report, _ = splitter.split_workbook(
+            source_path, scratch_dir, base_filename, sheet_selector(include, exclude), options, extension,
+            skip_output=up_to_date,
+        )
+        for output_name, path in outputs:
+            os.replace(path, os.path.join(dest_dir, output_name))
+    except Exception as e:
+        report = {'status': 'failed', 'error': str(e), 'sheets': [], 'failed_sheets': [], 'skipped_sheets': []}
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        try:
+            os.rmdir(dest_dir)  # 출력이 없으면 빈 폴더를 남기지 않음
+        except OSError:
+            pass
+
+    return {
+        'file': rel_path,
+        'folder': folder,
+        **report,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+# ==================== MAIN ====================
+
+def run(input_dir, output_dir, include=(), exclude=(), output_format='xlsx', values='cached', jobs=None,
+        force=False, echo=print):
+    """
+    INPUT_DIR 아래 워크북 전체 분리
+    반환: 워크북별 처리 결과 목록 (입력 경로 순)
+    """
+    options, extension = splitter.parse_output_format({'output_format': output_format, 'values': values})
+    workbooks = find_workbooks(input_dir, output_dir)
+    folders = plan_output_folders(workbooks)
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(workbooks) or 1))
+    echo(f"{len(workbooks)} workbooks, jobs={jobs}")
+
+    arguments = [
+        (input_dir, rel_path, output_dir, folder, list(include), list(exclude), options, extension, force)
+        for rel_path, folder in zip(workbooks, folders)
+    ]
+    reports = {}
+
+    def report_done(index, report):
+        reports[index] = report
+        detail = report.get('error') or (
+            f"{len(report['sheets'])} split, {len(report['skipped_sheets'])} up to date"
+            + (f", {len(report['failed_sheets'])} failed" if report['failed_sheets'] else '')
+        )
+        echo(f"[{report['status']}] {report['file']}: {detail} ({report['seconds']:.2f}s)")
+
+    if jobs == 1:
+        # 단일 프로세스: 워크북 안의 시트는 app 의 분리 프로세스 풀(SPLIT_WORKERS)로 병렬 처리
+        for index, args in enumerate(arguments):
+            report_done(index, split_one(*args))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=init_worker, initargs=(jobs,)) as pool:
+            futures = {pool.submit(split_one, *args): index for index, args in enumerate(arguments)}
+            try:
+                for future in as_completed(futures):
+                    report_done(futures[future], future.result())
+            except BaseException:
+                pool.shutdown(wait=True, cancel_futures=True)
+                raise
+
+    return [reports[index] for index in sorted(reports)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Excel 워크북 시트 일괄 분리 (웹 서버 없이 실행)')
+    parser.add_argument('input_dir', help='워크북(.xlsx/.xls)이 있는 디렉토리 (하위 디렉토리 포함)')
+    parser.add_argument('output_dir', help='분리 결과를 저장할 디렉토리')
+    parser.add_argument('--include', action='append', default=[], metavar='PATTERN',
+                        help='분리할 시트 이름 glob 패턴 (여러 번 지정 가능, 생략 시 전체 시트)')
+    parser.add_argument('--exclude', action='append', default=[], metavar='PATTERN',
+                        help='제외할 시트 이름 glob 패턴 (여러 번 지정 가능)')
+    parser.add_argument('--format', dest='output_format', choices=OUTPUT_FORMATS, default='xlsx',
+                        help='출력 형식 (기본: xlsx)')
+    parser.add_argument('--values', choices=('cached', 'formulas'), default='cached',
+                        help='csv/tsv/jsonl 의 수식 셀 출력 (기본: cached)')
+    parser.add_argument('--jobs', type=int, default=None, help='동시에 처리할 워크북 수 (기본: CPU 코어 수)')
+    parser.add_argument('--force', action='store_true', help='최신 출력이 있어도 다시 분리')
+    parser.add_argument('--report', help='워크북별 처리 결과를 JSON 으로 저장할 경로')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"input directory not found: {args.input_dir}")
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    try:
+        reports = run(args.input_dir, args.output_dir, args.include, args.exclude, args.output_format,
+                      args.values, args.jobs, args.force)
+    except KeyboardInterrupt:
+        print('Interrupted', file=sys.stderr)
+        return 130
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+    failed = [report for report in reports if report['status'] == 'failed']
+    print(
+        f"Done: {len(reports)} workbooks, {len(failed)} failed, "
+        f"{sum(len(report['sheets']) for report in reports)} sheets split "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,16 +9,47 @@ import sys
 import io
 import tempfile
 import json
+import hashlib
+import zipfile
+import zlib
+import time
+import threading
+import functools
+from datetime import datetime
 from pathlib import Path
 
 # 현재 디렉토리를 Python 경로에 추가
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app import app, sanitize_filename, handle_duplicate_filename
+import app as app_module
+import cli
+from app import app, sanitize_filename, handle_duplicate_filename, RawWorkbook, RawSplitUnsupported, \
+    StyleCache, copy_sheet_openpyxl, copy_sheet_streaming, \
+    CancelToken, SplitCancelled, run_split_tasks, ResultCache, \
+    CANCEL_CHECK_ROWS, release_cancel_marker, split_sheet_to_file, discard_cancelled_split, \
+    MemorySessionStore, SQLiteSessionStore, SessionStore, export_sheet_flat
+from openpyxl.styles import Font, PatternFill
+from openpyxl.worksheet.formula import ArrayFormula, DataTableFormula
 import openpyxl
 
 # ==================== FIXTURES ====================
 
+@pytest.fixture(autouse=True)
+def isolated_result_cache(tmp_path, monkeypatch):
+    """테스트마다 빈 결과 캐시 사용"""
+    cache = ResultCache(str(tmp_path / 'result_cache'), 64 * 1024 * 1024)
+    monkeypatch.setattr(app_module, '_RESULT_CACHE', cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_session_store(tmp_path, monkeypatch):
+    """테스트마다 빈 세션 저장소 사용"""
+    store = SQLiteSessionStore(str(tmp_path / 'sessions.db'))
+    monkeypatch.setattr(app_module, 'SESSION_STORE', store)
+    return store
+
+
 @pytest.fixture
 def client():
     """Flask 테스트 클라이언트"""
@@ -183,6 +214,32 @@ class TestUploadAPI:
         assert 'sheets' in result
         assert result['sheets'] == ['Sales', 'Expenses']
     
+    def test_upload_sheet_info(self, client, tmp_path):
+        """시트 메타데이터 (크기 추정, 숨김 여부) 반환"""
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = 'Data'
+        for row in range(1, 11):
+            for col in range(1, 4):
+                ws.cell(row=row, column=col, value=row * col)
+        hidden = wb.create_sheet('Hidden')
+        hidden.sheet_state = 'hidden'
+        path = tmp_path / 'info.xlsx'
+        wb.save(path)
+
+        with open(path, 'rb') as f:
+            response = client.post('/api/upload', data={'file': (f, 'info.xlsx')},
+                                   content_type='multipart/form-data')
+
+        assert response.status_code == 200
+        info = {item['name']: item for item in json.loads(response.data)['sheet_info']}
+        assert info['Data']['dimension'] == 'A1:C10'
+        assert info['Data']['rows'] == 10
+        assert info['Data']['columns'] == 3
+        assert info['Data']['size'] > 0
+        assert info['Data']['hidden'] is False
+        assert info['Hidden']['hidden'] is True
+
     def test_upload_valid_korean_sheets(self, client, sample_excel_korean):
         """한글 시트명 업로드"""
         with open(sample_excel_korean, 'rb') as f:
@@ -197,6 +254,190 @@ class TestUploadAPI:
         assert '2024년 매출' in result['sheets']
 
 
+# ==================== TEST: XLS CONVERSION ====================
+
+class TestXlsUpload:
+    """.xls 업로드 변환 테스트"""
+
+    @pytest.fixture
+    def sample_xls(self, tmp_path):
+        """시트 2개 (굵은 글꼴, 날짜, 병합, 열 너비)"""
+        xlwt = pytest.importorskip('xlwt')
+        book = xlwt.Workbook()
+        sheet = book.add_sheet('매출')
+        sheet.write(0, 0, '지역', xlwt.easyxf('font: bold on'))
+        sheet.write(0, 1, '금액')
+        sheet.write(1, 0, '서울')
+        sheet.write(1, 1, 1500)
+        sheet.write(2, 0, datetime(2024, 1, 31), xlwt.easyxf(num_format_str='yyyy-mm-dd'))
+        sheet.write_merge(3, 3, 0, 1, '합계')
+        sheet.col(0).width = 20 * 256
+        book.add_sheet('메모').write(0, 0, 'note')
+        path = tmp_path / 'legacy.xls'
+        book.save(str(path))
+        return str(path)
+
+    def test_xls_converted_once_at_upload(self, client, sample_xls, monkeypatch):
+        """업로드 시 xlsx 로 변환, 분리는 변환본만 사용"""
+        with open(sample_xls, 'rb') as f:
+            response = client.post('/api/upload', data={'file': (f, 'legacy.xls')},
+                                   content_type='multipart/form-data')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['source_format'] == 'xls'
+        assert data['sheets'] == ['매출', '메모']
+        assert data['temp_file'].endswith('.xlsx')
+        assert not os.path.exists(data['temp_file'][:-1])
+
+        converted = openpyxl.load_workbook(data['temp_file'])['매출']
+        assert converted['A1'].font.bold
+        assert converted['B2'].value == 1500
+        assert converted['A3'].value == datetime(2024, 1, 31)
+        assert converted['A3'].number_format == 'yyyy-mm-dd'
+        assert [str(r) for r in converted.merged_cells.ranges] == ['A4:B4']
+        assert converted.column_dimensions['A'].width == 20
+
+        # 분리 시 BIFF 를 다시 읽지 않음
+        monkeypatch.setattr(app_module, 'convert_xls', None)
+        response = client.post('/api/split', json={
+            'session_id': data['session_id'],
+            'temp_file': data['temp_file'],
+            'filename': data['filename'],
+            'sheets': ['매출']
+        })
+        assert response.status_code == 200
+        assert response.headers['Content-Disposition'].endswith(".xlsx")
+
+    @pytest.mark.parametrize('upload_name', ['legacy.xlsx', '매출.xlsx'])
+    def test_xls_content_with_xlsx_name(self, client, sample_xls, upload_name):
+        """확장자가 .xlsx 인 BIFF 파일도 서명으로 판별해 변환 (원본을 덮어쓰고 지우지 않음)"""
+        with open(sample_xls, 'rb') as f:
+            response = client.post('/api/upload', data={'file': (f, upload_name)},
+                                   content_type='multipart/form-data')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['source_format'] == 'xls'
+        assert data['sheets'] == ['매출', '메모']
+        assert openpyxl.load_workbook(data['temp_file'])['매출']['B2'].value == 1500
+        assert os.listdir(os.path.dirname(data['temp_file'])) == [os.path.basename(data['temp_file'])]
+
+    def test_xls_without_xlrd_rejected(self, client, sample_xls, monkeypatch):
+        """xlrd 가 없으면 400 (세션 디렉토리 정리)"""
+        monkeypatch.setattr(app_module, 'xlrd', None)
+        with open(sample_xls, 'rb') as f:
+            response = client.post('/api/upload', data={'file': (f, 'legacy.xls')},
+                                   content_type='multipart/form-data')
+        assert response.status_code == 400
+
+
+# ==================== TEST: API - CHUNKED UPLOAD ====================
+
+class TestChunkedUploadAPI:
+    """분할/재개 업로드 API 테스트"""
+
+    def test_chunked_upload_with_resume(self, client, sample_excel_2sheets):
+        """청크 전송 → 중단 후 offset 조회 → 이어서 전송 → 완료"""
+        with open(sample_excel_2sheets, 'rb') as f:
+            content = f.read()
+        half = len(content) // 2
+
+        init = client.post('/api/uploads', json={
+            'filename': 'sample_2sheets.xlsx',
+            'size': len(content),
+            'sha256': hashlib.sha256(content).hexdigest()
+        })
+        assert init.status_code == 201
+        upload_id = json.loads(init.data)['upload_id']
+
+        response = client.put(f'/api/uploads/{upload_id}?offset=0', data=content[:half])
+        assert json.loads(response.data)['offset'] == half
+
+        # 잘못된 offset 은 현재 수신 위치와 함께 거절
+        response = client.put(f'/api/uploads/{upload_id}?offset=0', data=content[:half])
+        assert response.status_code == 409
+        assert json.loads(response.data)['offset'] == half
+
+        # 재개: 수신 위치 조회 후 나머지 전송
+        status = json.loads(client.get(f'/api/uploads/{upload_id}').data)
+        response = client.put(f"/api/uploads/{upload_id}?offset={status['offset']}", data=content[half:])
+        assert json.loads(response.data)['complete'] is True
+
+        response = client.post(f'/api/uploads/{upload_id}/complete')
+        assert response.status_code == 200
+        result = json.loads(response.data)
+        assert result['session_id'] == upload_id
+        assert result['sheets'] == ['Sales', 'Expenses']
+        assert result['sha256'] == hashlib.sha256(content).hexdigest()
+
+    def test_chunked_upload_incomplete(self, client):
+        """전체 수신 전 완료 요청은 거절"""
+        init = client.post('/api/uploads', json={'filename': 'a.xlsx', 'size': 100})
+        upload_id = json.loads(init.data)['upload_id']
+        client.put(f'/api/uploads/{upload_id}?offset=0', data=b'x' * 10)
+
+        response = client.post(f'/api/uploads/{upload_id}/complete')
+        assert response.status_code == 409
+        assert json.loads(response.data)['offset'] == 10
+
+    def test_concurrent_chunks_same_offset(self, client, monkeypatch):
+        """같은 offset 의 동시 청크는 하나만 기록 (나머지는 409)"""
+        init = client.post('/api/uploads', json={'filename': 'a.xlsx', 'size': 100})
+        upload_id = json.loads(init.data)['upload_id']
+
+        # 첫 청크가 쓰는 도중에 두 번째 청크 도착
+        writing = threading.Event()
+        release = threading.Event()
+        original = app_module.write_stream
+
+        def slow_write_stream(*args, **kwargs):
+            writing.set()
+            release.wait(5)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(app_module, 'write_stream', slow_write_stream)
+        statuses = []
+
+        def put_chunk():
+            with app.test_client() as c:
+                statuses.append(c.put(f'/api/uploads/{upload_id}?offset=0', data=b'x' * 10).status_code)
+
+        first = threading.Thread(target=put_chunk)
+        first.start()
+        assert writing.wait(5)
+        second = threading.Thread(target=put_chunk)
+        second.start()
+        second.join(0.2)
+        release.set()
+        first.join(5)
+        second.join(5)
+
+        assert sorted(statuses) == [200, 409]
+        assert json.loads(client.get(f'/api/uploads/{upload_id}').data)['offset'] == 10
+
+    def test_abandoned_upload_state_pruned(self, client):
+        """정리로 디렉토리가 사라진 업로드는 프로세스 내 해시/잠금 항목도 제거"""
+        import shutil
+
+        init = client.post('/api/uploads', json={'filename': 'a.xlsx', 'size': 100})
+        upload_id = json.loads(init.data)['upload_id']
+        client.put(f'/api/uploads/{upload_id}?offset=0', data=b'x' * 10)
+        assert upload_id in app_module._UPLOAD_DIGESTS
+        assert upload_id in app_module._UPLOAD_LOCKS
+
+        app_module.prune_upload_state()
+        assert upload_id in app_module._UPLOAD_DIGESTS
+
+        shutil.rmtree(os.path.join(tempfile.gettempdir(), upload_id))
+        app_module.prune_upload_state()
+        assert upload_id not in app_module._UPLOAD_DIGESTS
+        assert upload_id not in app_module._UPLOAD_LOCKS
+
+    def test_chunked_upload_unknown_id(self, client):
+        """존재하지 않거나 형식이 다른 업로드 ID"""
+        assert client.get('/api/uploads/excel_splitter_missing').status_code == 404
+        assert client.put('/api/uploads/..?offset=0', data=b'x').status_code == 404
+
+
 # ==================== TEST: API - SPLIT ====================
 
 class TestSplitAPI:
@@ -248,6 +489,94 @@ class TestSplitAPI:
         assert response.content_type == 'application/zip'
         assert len(response.data) > 0
     
+    def test_split_with_process_pool(self, client, sample_excel_2sheets, monkeypatch):
+        """프로세스 풀로 시트별 병렬 분리"""
+        monkeypatch.setattr(app_module, 'SPLIT_WORKERS', 2)
+        monkeypatch.setattr(app_module, '_SPLIT_POOL', None)
+
+        with open(sample_excel_2sheets, 'rb') as f:
+            data = {'file': (f, 'sample_2sheets.xlsx')}
+            upload_response = client.post('/api/upload', data=data, content_type='multipart/form-data')
+        upload_data = json.loads(upload_response.data)
+
+        try:
+            response = client.post('/api/split', json={
+                'session_id': upload_data['session_id'],
+                'temp_file': upload_data['temp_file'],
+                'filename': upload_data['filename'],
+                'sheets': ['Sales', 'Expenses']
+            })
+            assert app_module._SPLIT_POOL is not None
+        finally:
+            if app_module._SPLIT_POOL is not None:
+                app_module._SPLIT_POOL.shutdown()
+
+        assert response.status_code == 200
+        with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+            assert sorted(zf.namelist()) == ['sample_2sheets_Expenses.xlsx', 'sample_2sheets_Sales.xlsx']
+
+    def test_worker_cache_released_when_idle(self, tmp_path, monkeypatch):
+        """풀 워커의 원본 워크북 캐시는 작업이 끝나고 유휴 시간이 지나면 해제"""
+        wb = openpyxl.Workbook()
+        wb.active.title = 'Memo'
+        wb.active['A1'] = 'note'
+        wb.active['A1'].comment = openpyxl.comments.Comment('memo', 'tester')
+        path = tmp_path / 'comments.xlsx'
+        wb.save(path)
+        monkeypatch.setattr(app_module, 'WORKER_CACHE_IDLE_SECONDS', 0.1)
+
+        app_module._pool_split_sheet(str(path), 'Memo', str(tmp_path / 'out.xlsx'), {})
+        assert 'workbook' in app_module._WORKER_SOURCE_CACHE
+        app_module._pool_split_sheet(str(path), 'Memo', str(tmp_path / 'out2.xlsx'), {})
+        assert 'workbook' in app_module._WORKER_SOURCE_CACHE
+
+        deadline = time.time() + 5
+        while app_module._WORKER_SOURCE_CACHE and time.time() < deadline:
+            time.sleep(0.05)
+        assert app_module._WORKER_SOURCE_CACHE == {}
+
+    def test_worker_cache_drops_other_source(self, tmp_path, monkeypatch):
+        """다른 원본의 공유 문자열 테이블은 새 원본 작업을 시작할 때 해제 (유휴 해제를 기다리지 않음)"""
+        wb = openpyxl.Workbook()
+        wb.active.title = 'Data'
+        wb.active['A1'] = 'value'
+        path = tmp_path / 'plain.xlsx'
+        wb.save(path)
+        monkeypatch.setattr(app_module, 'WORKER_CACHE_IDLE_SECONDS', 60)
+        monkeypatch.setitem(app_module._WORKER_SOURCE_CACHE, 'shared_strings', object())
+        monkeypatch.setitem(app_module._WORKER_SOURCE_CACHE, 'shared_strings_key', (str(tmp_path / 'other.xlsx'), 0))
+
+        try:
+            app_module._pool_split_sheet(str(path), 'Data', str(tmp_path / 'out.xlsx'), {})
+            assert 'shared_strings' not in app_module._WORKER_SOURCE_CACHE
+            assert 'shared_strings_key' not in app_module._WORKER_SOURCE_CACHE
+        finally:
+            app_module._WORKER_CACHE_STATE['timer'].cancel()
+            app_module._release_idle_worker_cache()
+
+    def test_split_zip_is_streamed(self, client, sample_excel_korean):
+        """여러 시트는 스트리밍 ZIP 으로 반환 (한글 파일명 헤더 포함)"""
+        with open(sample_excel_korean, 'rb') as f:
+            data = {'file': (f, '매출_sample.xlsx')}
+            upload_response = client.post('/api/upload', data=data, content_type='multipart/form-data')
+        upload_data = json.loads(upload_response.data)
+
+        response = client.post('/api/split', json={
+            'session_id': upload_data['session_id'],
+            'temp_file': upload_data['temp_file'],
+            'filename': upload_data['filename'],
+            'sheets': upload_data['sheets']
+        })
+
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert "filename*=UTF-8''" in response.headers['Content-Disposition']
+        with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+            assert len(zf.namelist()) == 2
+            for name in zf.namelist():
+                wb = openpyxl.load_workbook(io.BytesIO(zf.read(name)))
+                assert len(wb.sheetnames) == 1
+
     def test_split_korean_sheets(self, client, sample_excel_korean):
         """한글 시트명 분리"""
         # 1. 업로드
@@ -270,6 +599,1437 @@ class TestSplitAPI:
         assert response.content_type == 'application/zip'
 
 
+# ==================== TEST: FLAT EXPORT ====================
+
+class TestFlatExport:
+    """CSV/TSV/JSONL 출력 테스트"""
+
+    @pytest.fixture
+    def formula_sheet(self, tmp_path):
+        """한글 값 + 수식 셀"""
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = '데이터'
+        ws.append(['이름', '값'])
+        ws.append(['가, "나"', 1])
+        ws.append(['합계', '=SUM(B2:B2)'])
+        path = tmp_path / 'flat.xlsx'
+        wb.save(path)
+        return str(path)
+
+    def _upload(self, client, path):
+        with open(path, 'rb') as f:
+            return json.loads(client.post('/api/upload', data={'file': (f, 'flat.xlsx')},
+                                          content_type='multipart/form-data').data)
+
+    def test_csv_single_sheet(self, client, formula_sheet):
+        """CSV 1개는 직접 다운로드 (UTF-8 BOM, 따옴표 이스케이프, 수식 텍스트 선택)"""
+        upload_data = self._upload(client, formula_sheet)
+        response = client.post('/api/split', json={
+            'session_id': upload_data['session_id'],
+            'temp_file': upload_data['temp_file'],
+            'filename': upload_data['filename'],
+            'sheets': ['데이터'],
+            'output_format': 'csv',
+            'values': 'formulas'
+        })
+        assert response.status_code == 200
+        assert response.mimetype == 'text/csv'
+        assert response.data.startswith(b'\xef\xbb\xbf')
+        assert response.data.decode('utf-8-sig').splitlines() == [
+            '이름,값', '"가, ""나""",1', '합계,=SUM(B2:B2)'
+        ]
+
+    def test_jsonl_cached_values_in_zip(self, client, formula_sheet, sample_excel_2sheets):
+        """여러 시트는 ZIP, JSONL 은 행마다 배열 (계산 결과가 없는 수식 셀은 null)"""
+        upload_data = self._upload(client, formula_sheet)
+        response = client.post('/api/split', json={
+            'session_id': upload_data['session_id'],
+            'temp_file': upload_data['temp_file'],
+            'filename': upload_data['filename'],
+            'sheets': ['데이터'],
+            'output_format': 'jsonl'
+        })
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.data.decode('utf-8').splitlines()]
+        assert lines == [['이름', '값'], ['가, "나"', 1], ['합계', None]]
+
+        upload_data = self._upload(client, sample_excel_2sheets)
+        response = client.post('/api/split', json={
+            'session_id': upload_data['session_id'],
+            'temp_file': upload_data['temp_file'],
+            'filename': upload_data['filename'],
+            'sheets': upload_data['sheets'],
+            'output_format': 'tsv'
+        })
+        with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+            assert all(name.endswith('.tsv') for name in zf.namelist())
+            assert len(zf.namelist()) == 2
+
+    def test_array_formula_text(self, tmp_path):
+        """배열 수식/데이터 표 수식은 객체 repr 이 아니라 수식 텍스트로 출력"""
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws['B1'] = 1
+        ws['B2'] = 2
+        ws['A1'] = ArrayFormula('A1:A2', '=SUM(B1:B2)')
+        ws['C1'] = DataTableFormula('C1:C2', r1='B1')
+        source = tmp_path / 'array.xlsx'
+        wb.save(source)
+
+        output = tmp_path / 'array.csv'
+        export_sheet_flat(str(source), ws.title, str(output), 'csv', formulas=True)
+        assert output.read_text(encoding='utf-8-sig').splitlines() == ['=SUM(B1:B2),1,"=TABLE(B1,)"', ',2']
+
+        output = tmp_path / 'array.jsonl'
+        export_sheet_flat(str(source), ws.title, str(output), 'jsonl', formulas=True)
+        assert json.loads(output.read_text(encoding='utf-8').splitlines()[0]) == ['=SUM(B1:B2)', 1, '=TABLE(B1,)']
+
+    def test_unknown_format_rejected(self, client, formula_sheet):
+        """지원하지 않는 형식은 400"""
+        upload_data = self._upload(client, formula_sheet)
+        response = client.post('/api/split', json={
+            'session_id': upload_data['session_id'],
+            'temp_file': upload_data['temp_file'],
+            'filename': upload_data['filename'],
+            'sheets': ['데이터'],
+            'output_format': 'parquet'
+        })
+        assert response.status_code == 400
+
+
+# ==================== TEST: ROW SPLIT ====================
+
+class TestRowSplit:
+    """행 범위 분리 테스트"""
+
+    @pytest.fixture
+    def long_sheet(self, tmp_path):
+        """머리글 1행 + 데이터 25행"""
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = 'Data'
+        ws.append(['id', 'name'])
+        ws['A1'].font = Font(bold=True)
+        for i in range(1, 26):
+            ws.append([i, f'row{i}'])
+        ws.merge_cells('A13:B14')  # 두 번째 파일 안의 범위
+        ws.merge_cells('A11:B12')  # 첫/두 번째 파일 경계에 걸친 범위
+        ws.column_dimensions['B'].width = 30
+        path = tmp_path / 'long.xlsx'
+        wb.save(path)
+        return str(path)
+
+    def test_split_rows_with_header(self, client, long_sheet):
+        """파일마다 머리글 반복, 데이터 행은 rows_per_file 개씩"""
+        with open(long_sheet, 'rb') as f:
+            upload_data = json.loads(client.post('/api/upload', data={'file': (f, 'long.xlsx')},
+                                                 content_type='multipart/form-data').data)
+
+        response = client.post('/api/split', json={
+            'session_id': upload_data['session_id'],
+            'temp_file': upload_data['temp_file'],
+            'filename': upload_data['filename'],
+            'sheets': ['Data'],
+            'mode': 'rows',
+            'rows_per_file': 10,
+            'header_rows': 1
+        })
+        assert response.status_code == 200
+        assert response.mimetype == 'application/zip'
+
+        with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+            names = zf.namelist()
+            assert names == ['long_Data_2-11.xlsx', 'long_Data_12-21.xlsx', 'long_Data_22-26.xlsx']
+            chunks = [openpyxl.load_workbook(io.BytesIO(zf.read(name))) for name in names]
+
+        assert [chunk['Data'].max_row for chunk in chunks] == [11, 11, 6]
+        for chunk in chunks:
+            assert chunk['Data']['A1'].value == 'id'
+            assert chunk['Data']['A1'].font.bold
+            assert chunk['Data'].column_dimensions['B'].width == 30
+        assert chunks[1]['Data']['A5'].value == 14  # 원본 15행
+        assert [str(r) for r in chunks[1]['Data'].merged_cells.ranges] == ['A3:B4']
+        assert not chunks[0]['Data'].merged_cells.ranges
+
+    def test_split_rows_invalid_options(self, client, long_sheet):
+        """rows_per_file 누락/0 이하는 400"""
+        with open(long_sheet, 'rb') as f:
+            upload_data = json.loads(client.post('/api/upload', data={'file': (f, 'long.xlsx')},
+                                                 content_type='multipart/form-data').data)
+
+        for rows_per_file in (None, 0, 'abc'):
+            response = client.post('/api/split', json={
+                'session_id': upload_data['session_id'],
+                'temp_file': upload_data['temp_file'],
+                'filename': upload_data['filename'],
+                'sheets': ['Data'],
+                'mode': 'rows',
+                'rows_per_file': rows_per_file
+            })
+            assert response.status_code == 400
+
+
+# ==================== TEST: PARTITION SPLIT ====================
+
+class TestPartitionSplit:
+    """키 열 분리 테스트"""
+
+    @pytest.fixture
+    def region_sheet(self, tmp_path):
+        """머리글 1행 + 지역(B열) 키 데이터 14행 (빈 키 포함)"""
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = 'Sales'
+        ws.append(['id', 'region', 'amount'])
+        regions = ['서울', '부산', '대구', '광주', '대전', None, '울산']
+        for i in range(14):
+            ws.append([i + 1, regions[i % len(regions)], i * 10])
+            ws.cell(row=i + 2, column=3).font = Font(bold=True)
+        ws.column_dimensions['B'].width = 25
+        path = tmp_path / 'sales.xlsx'
+        wb.save(path)
+        return str(path)
+
+    def _split(self, client, path, **options):
+        with open(path, 'rb') as f:
+            upload_data = json.loads(client.post('/api/upload', data={'file': (f, 'sales.xlsx')},
+                                                 content_type='multipart/form-data').data)
+        return client.post('/api/split', json={
+            'session_id': upload_data['session_id'],
+            'temp_file': upload_data['temp_file'],
+            'filename': upload_data['filename'],
+            'sheets': ['Sales'],
+            'mode': 'partition',
+            **options
+        })
+
+    def test_partition_by_key_column(self, client, region_sheet):
+        """키 값별 파일 1개, 머리글/열 너비 복사, 행 순서 유지"""
+        response = self._split(client, region_sheet, key_column='B', header_rows=1)
+        assert response.status_code == 200
+
+        with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+            names = sorted(zf.namelist())
+            assert names == sorted(f'sales_Sales_{key}.xlsx'
+                                   for key in ['서울', '부산', '대구', '광주', '대전', 'blank', '울산'])
+            seoul = openpyxl.load_workbook(io.BytesIO(zf.read('sales_Sales_서울.xlsx')))['Sales']
+
+        assert [row[0] for row in seoul.iter_rows(values_only=True)] == ['id', 1, 8]
+        assert seoul.column_dimensions['B'].width == 25
+
+    def test_partition_spills_when_writers_capped(self, monkeypatch, region_sheet, tmp_path):
+        """열린 파일 수 상한 초과 키는 임시 파일을 거쳐도 같은 결과 (스타일 유지)"""
+        monkeypatch.setattr(app_module, 'PARTITION_MAX_OPEN_WRITERS', 2)
+        monkeypatch.setattr(app_module, 'PARTITION_SPILL_BUCKETS', 2)
+
+        results = list(app_module.split_sheet_partitions(region_sheet, 'Sales', str(tmp_path / 'out'), 2, 1))
+        assert sorted(str(r['key']) for r in results) == sorted(['서울', '부산', '대구', '광주', '대전', '', '울산'])
+        assert sum(r['rows'] for r in results) == 14
+        assert not list(tmp_path.glob('*.spill'))
+
+        ulsan = next(r for r in results if r['key'] == '울산')
+        ws = openpyxl.load_workbook(ulsan['path'])['Sales']
+        assert [row[0] for row in ws.iter_rows(values_only=True)] == ['id', 7, 14]
+        assert ws['C2'].font.bold
+
+    def test_partition_too_many_keys(self, client, monkeypatch, region_sheet):
+        """키 수가 PARTITION_MAX_FILES 를 넘으면 400"""
+        monkeypatch.setattr(app_module, 'PARTITION_MAX_FILES', 3)
+        response = self._split(client, region_sheet, key_column=2, header_rows=1)
+        assert response.status_code == 400
+
+
+# ==================== TEST: SHEET PREVIEW ====================
+
+class TestSheetPreview:
+    """시트 미리보기 테스트"""
+
+    @pytest.fixture
+    def preview_upload(self, client, tmp_path):
+        """공유 문자열/날짜/불리언 포함 100행 시트 업로드"""
+        import bench_split
+
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = 'Data'
+        ws.append(['이름', '날짜', '확인'])
+        for i in range(99):
+            ws.append([f'항목{i}', datetime(2024, 1, 1 + i % 28), i % 2 == 0])
+        path = str(tmp_path / 'preview.xlsx')
+        wb.save(path)
+        bench_split.convert_to_shared_strings(path)
+
+        with open(path, 'rb') as f:
+            return json.loads(client.post('/api/upload', data={'file': (f, 'preview.xlsx')},
+                                          content_type='multipart/form-data').data)
+
+    def test_preview_first_rows(self, client, preview_upload):
+        """앞부분 N행 + <dimension> 기준 크기 (공유 문자열/날짜/불리언 변환)"""
+        response = client.get(f"/api/sessions/{preview_upload['session_id']}/sheets/Data/preview?rows=3")
+        assert response.status_code == 200
+        data = json.loads(response.data)
+
+        assert data['dimension'] == 'A1:C100'
+        assert (data['rows'], data['columns']) == (100, 3)
+        assert [row['row'] for row in data['data']] == [1, 2, 3]
+        assert data['data'][0]['values'] == ['이름', '날짜', '확인']
+        assert data['data'][1]['values'] == ['항목0', '2024-01-01T00:00:00', True]
+
+    def test_preview_reads_only_needed_shared_strings(self, tmp_path):
+        """공유 문자열은 필요한 인덱스까지만 읽음"""
+        import bench_split
+
+        path = str(tmp_path / 'sst.xlsx')
+        bench_split.generate_workbook(path, rows=50, cols=2, shared_strings=50)
+        with RawWorkbook(path) as raw:
+            assert len(raw._shared_strings(2)) == 3
+
+    def test_preview_is_memoized(self, client, preview_upload):
+        """같은 미리보기 재요청은 LRU 에서 반환, 없는 시트는 404"""
+        url = f"/api/sessions/{preview_upload['session_id']}/sheets/Data/preview?rows=5"
+        client.get(url)
+        hits = app_module.sheet_preview.cache_info().hits
+        assert client.get(url).status_code == 200
+        assert app_module.sheet_preview.cache_info().hits == hits + 1
+
+        response = client.get(f"/api/sessions/{preview_upload['session_id']}/sheets/Nope/preview")
+        assert response.status_code == 404
+
+
+# ==================== TEST: RAW XML ENGINE ====================
+
+class TestRawSplitEngine:
+    """원시 XML 분리 엔진 테스트"""
+
+    def test_raw_split_single_sheet(self, sample_excel_2sheets):
+        """선택 시트 1개만 담긴 xlsx 생성"""
+        output = io.BytesIO()
+        with RawWorkbook(sample_excel_2sheets) as raw:
+            assert raw.sheetnames == ['Sales', 'Expenses']
+            raw.split_sheet('Expenses', output)
+
+        output.seek(0)
+        wb = openpyxl.load_workbook(output)
+        assert wb.sheetnames == ['Expenses']
+        assert wb['Expenses']['A2'].value == 'Office Rent'
+        assert wb['Expenses']['B2'].value == 5000
+
+    def test_raw_split_keeps_print_titles(self, tmp_path):
+        """시트 로컬 정의 이름(인쇄 제목) 유지"""
+        wb = openpyxl.Workbook()
+        wb.active.title = 'First'
+        ws = wb.create_sheet('Second')
+        ws['A1'] = 'Header'
+        ws.print_title_rows = '1:1'
+        path = tmp_path / 'titles.xlsx'
+        wb.save(path)
+
+        output = io.BytesIO()
+        with RawWorkbook(path) as raw:
+            raw.split_sheet('Second', output)
+
+        output.seek(0)
+        result = openpyxl.load_workbook(output)
+        assert result['Second'].print_title_rows == '$1:$1'
+
+    def test_raw_split_rejects_embedded_parts(self, tmp_path):
+        """댓글 등 내부 파트가 있는 시트는 openpyxl 경로로 넘김"""
+        wb = openpyxl.Workbook()
+        wb.active['A1'] = 'note'
+        wb.active['A1'].comment = openpyxl.comments.Comment('memo', 'tester')
+        path = tmp_path / 'comments.xlsx'
+        wb.save(path)
+
+        with RawWorkbook(path) as raw:
+            with pytest.raises(RawSplitUnsupported):
+                raw.split_sheet('Sheet', io.BytesIO())
+
+    def test_split_falls_back_to_openpyxl(self, client, tmp_path):
+        """원시 엔진 불가 시트도 API 에서 정상 분리"""
+        wb = openpyxl.Workbook()
+        wb.active.title = 'Memo'
+        wb.active['A1'] = 'note'
+        wb.active['A1'].comment = openpyxl.comments.Comment('memo', 'tester')
+        path = tmp_path / 'comments.xlsx'
+        wb.save(path)
+
+        with open(path, 'rb') as f:
+            upload_response = client.post('/api/upload', data={'file': (f, 'comments.xlsx')},
+                                          content_type='multipart/form-data')
+        upload_data = json.loads(upload_response.data)
+
+        response = client.post('/api/split', json={
+            'session_id': upload_data['session_id'],
+            'temp_file': upload_data['temp_file'],
+            'filename': upload_data['filename'],
+            'sheets': ['Memo']
+        })
+        assert response.status_code == 200
+        result = openpyxl.load_workbook(io.BytesIO(response.data))
+        assert result['Memo']['A1'].value == 'note'
+
+    def test_split_streaming_flag(self, client, tmp_path):
+        """streaming 플래그로 대체 경로를 스트리밍 복사로 강제"""
+        wb = openpyxl.Workbook()
+        wb.active.title = 'Memo'
+        wb.active['A1'] = 'note'
+        wb.active['A1'].comment = openpyxl.comments.Comment('memo', 'tester')
+        wb.active['B2'] = 42
+        path = tmp_path / 'comments.xlsx'
+        wb.save(path)
+
+        with open(path, 'rb') as f:
+            upload_response = client.post('/api/upload', data={'file': (f, 'comments.xlsx')},
+                                          content_type='multipart/form-data')
+        upload_data = json.loads(upload_response.data)
+
+        response = client.post('/api/split', json={
+            'session_id': upload_data['session_id'],
+            'temp_file': upload_data['temp_file'],
+            'filename': upload_data['filename'],
+            'sheets': ['Memo'],
+            'streaming': True
+        })
+        assert response.status_code == 200
+        result = openpyxl.load_workbook(io.BytesIO(response.data))
+        assert result['Memo']['B2'].value == 42
+
+    def _shared_strings_workbook(self, path):
+        import bench_split
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = 'Big'
+        for i in range(300):
+            ws.append([f'big {i}', i, 'common'])
+        small = wb.create_sheet('Small')
+        for i in range(20):
+            small.append([f'big {i * 7}', 'common', f'small {i}', '=A1'])
+        wb.save(path)
+        bench_split.convert_to_shared_strings(str(path))
+
+    def test_raw_split_subsets_shared_strings(self, tmp_path, monkeypatch):
+        """시트가 쓰는 공유 문자열만 출력하고 셀 인덱스를 새 번호로 바꿈 (청크 경계 포함)"""
+        path = tmp_path / 'shared.xlsx'
+        self._shared_strings_workbook(path)
+        monkeypatch.setattr(app_module, 'SHARED_STRINGS_SUBSET_BYTES', 0)
+        monkeypatch.setattr(app_module, 'COPY_CHUNK_SIZE', 97)
+
+        output = io.BytesIO()
+        with RawWorkbook(path) as raw:
+            assert raw.split_sheet('Small', output) == 41
+
+        with zipfile.ZipFile(output) as zf:
+            sst = zf.read('xl/sharedStrings.xml')
+        assert b'uniqueCount="41"' in sst and b'count="60"' in sst
+        assert b'big 1<' not in sst
+
+        source = openpyxl.load_workbook(path)['Small']
+        result = openpyxl.load_workbook(output)['Small']
+        assert [[c.value for c in row] for row in result.iter_rows()] == \
+            [[c.value for c in row] for row in source.iter_rows()]
+
+    def test_shared_string_table_threshold_and_reuse(self, tmp_path, monkeypatch):
+        """작은 테이블은 원본 그대로 복사, 큰 테이블은 source_cache 로 재사용"""
+        path = tmp_path / 'shared.xlsx'
+        self._shared_strings_workbook(path)
+        cache = {}
+        result = split_sheet_to_file(str(path), 'Small', str(tmp_path / 'a.xlsx'), source_cache=cache)
+        assert 'shared_strings' not in result['counts']
+        with zipfile.ZipFile(path) as source, zipfile.ZipFile(tmp_path / 'a.xlsx') as output:
+            assert output.read('xl/sharedStrings.xml') == source.read('xl/sharedStrings.xml')
+
+        monkeypatch.setattr(app_module, 'SHARED_STRINGS_SUBSET_BYTES', 0)
+        split_sheet_to_file(str(path), 'Big', str(tmp_path / 'b.xlsx'), source_cache=cache)
+        table = cache['shared_strings']
+        assert len(table) == 321
+        result = split_sheet_to_file(str(path), 'Small', str(tmp_path / 'c.xlsx'), source_cache=cache)
+        assert cache['shared_strings'] is table
+        assert result['counts']['shared_strings'] == 41
+
+
+# ==================== TEST: OPENPYXL COPY ENGINE ====================
+
+class TestOpenpyxlCopy:
+    """openpyxl 복사 경로 테스트"""
+
+    def test_copy_preserves_styles(self):
+        """스타일 캐시를 거쳐도 폰트/채우기/표시형식 유지"""
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = 'Styled'
+        for row in range(1, 21):
+            cell = ws.cell(row=row, column=1, value=row)
+            cell.font = Font(bold=True, color='FF0000')
+            cell.fill = PatternFill(fill_type='solid', fgColor='FFFF00')
+            cell.number_format = '0.00'
+
+        new_wb = copy_sheet_openpyxl(ws)
+        new_cell = new_wb['Styled']['A20']
+        assert new_cell.value == 20
+        assert new_cell.font.bold is True
+        assert new_cell.font.color.rgb == '00FF0000'
+        assert new_cell.fill.fgColor.rgb == '00FFFF00'
+        assert new_cell.number_format == '0.00'
+
+    def test_style_cache_reuses_target_style(self):
+        """같은 원본 스타일은 1회만 생성하고 재사용"""
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        for row in range(1, 11):
+            ws.cell(row=row, column=1, value=row).font = Font(italic=True)
+
+        target = openpyxl.Workbook().active
+        cache = StyleCache()
+        for row in range(1, 11):
+            cache.apply(ws.cell(row=row, column=1), target.cell(row=row, column=1))
+
+        assert cache.misses == 1
+        assert cache.hits == 9
+        assert target['A10'].font.italic is True
+
+    def test_streaming_copy_preserves_layout(self, tmp_path):
+        """스트리밍 복사: 값/스타일/열 너비/병합 범위 유지"""
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = 'Big'
+        ws['A1'] = 'Title'
+        ws['A1'].font = Font(bold=True)
+        ws.merge_cells('A1:C1')
+        ws.column_dimensions['B'].width = 30
+        for row in range(2, 50):
+            ws.cell(row=row, column=2, value=row).number_format = '0.00'
+        ws['D60'] = '=SUM(B2:B49)'
+        source = tmp_path / 'big.xlsx'
+        wb.save(source)
+
+        output = tmp_path / 'out.xlsx'
+        copy_sheet_streaming(str(source), 'Big', str(output))
+
+        result = openpyxl.load_workbook(output)['Big']
+        assert result['A1'].value == 'Title'
+        assert result['A1'].font.bold is True
+        assert 'A1:C1' in [str(r) for r in result.merged_cells.ranges]
+        assert result.column_dimensions['B'].width == 30
+        assert result['B49'].value == 49
+        assert result['B49'].number_format == '0.00'
+        assert result['D60'].value == '=SUM(B2:B49)'
+
+    def test_sparse_copy_skips_phantom_cells(self):
+        """값/서식 없는 셀은 건너뛰고 열 너비는 사용 영역 안의 범위 단위로 복사"""
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = 'Sparse'
+        for row in range(1, 11):
+            ws.cell(row=row, column=1, value=row)
+            ws.cell(row=row, column=2).fill = PatternFill(fill_type='solid', fgColor='FFFF00')
+        ws.cell(row=50000, column=16000)
+        ws.cell(row=40000, column=200)
+        ws.row_dimensions[45000].height = 30
+        ws.column_dimensions.group('B', 'Z', hidden=False)
+        ws.column_dimensions['B'].width = 25
+        assert ws.dimensions == 'A1:WQJ50000'
+
+        timer = app_module.StageTimer()
+        new_ws = copy_sheet_openpyxl(ws, timer).active
+        assert new_ws.dimensions == 'A1:B10'
+        assert timer.counts['cells'] == 20
+        assert timer.counts['phantom_cells'] == 2
+        assert new_ws['B10'].fill.fgColor.rgb == '00FFFF00'
+        assert 45000 not in new_ws.row_dimensions
+        dimension = new_ws.column_dimensions['B']
+        assert (dimension.min, dimension.max, dimension.width) == (2, 2, 25)
+
+    def test_streaming_copy_trims_trailing_rows(self, tmp_path):
+        """스트리밍 복사: 시트 끝의 빈 행과 행 끝의 빈 셀은 쓰지 않음"""
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = 'Big'
+        ws['A1'] = 'a'
+        ws['A3'] = 'c'
+        ws.cell(row=3, column=500)
+        ws.cell(row=2000, column=3)
+        source = tmp_path / 'big.xlsx'
+        wb.save(source)
+
+        output = tmp_path / 'out.xlsx'
+        copy_sheet_streaming(str(source), 'Big', str(output))
+
+        result = openpyxl.load_workbook(output)['Big']
+        assert result.dimensions == 'A1:A3'
+        assert result['A3'].value == 'c'
+
+
+# ==================== TEST: SESSION STORE ====================
+
+class TestSessionStore:
+    """세션 저장소 테스트"""
+
+    @pytest.fixture(params=['memory', 'sqlite'])
+    def store(self, request, tmp_path):
+        if request.param == 'memory':
+            return MemorySessionStore()
+        return SQLiteSessionStore(str(tmp_path / 'store.db'))
+
+    def test_put_get_delete(self, store):
+        """저장/조회/삭제"""
+        store.put('s1', {'temp_dir': '/tmp/a', 'sheets': ['시트']}, 60)
+        assert store.get('s1') == {'temp_dir': '/tmp/a', 'sheets': ['시트']}
+        store.delete('s1')
+        assert store.get('s1') is None
+
+    def test_pop_expired_only_returns_expired(self, store):
+        """만료 시각이 지난 세션만 꺼냄 (덮어쓴 세션은 새 만료 시각 기준)"""
+        now = time.time()
+        store.put('old', {'n': 1}, 10)
+        store.put('new', {'n': 2}, 1000)
+        store.put('renewed', {'n': 3}, 10)
+        store.put('renewed', {'n': 4}, 1000)
+
+        expired = store.pop_expired(now=now + 100)
+        assert [sid for sid, _ in expired] == ['old']
+        assert store.get('old') is None
+        assert store.get('renewed') == {'n': 4}
+        assert store.pop_expired(now=now + 100) == []
+
+    def test_sqlite_store_shared_between_instances(self, tmp_path):
+        """같은 DB 파일을 쓰는 다른 인스턴스(워커)에서 조회 가능"""
+        path = str(tmp_path / 'shared.db')
+        SQLiteSessionStore(path).put('s1', {'temp_file': '/tmp/x.xlsx'}, 60)
+        assert SQLiteSessionStore(path).get('s1') == {'temp_file': '/tmp/x.xlsx'}
+
+    def test_interface_is_abstract(self):
+        """구현하지 않은 저장소는 생성 불가"""
+        with pytest.raises(TypeError):
+            SessionStore()
+
+    def test_store_created_lazily(self, tmp_path, monkeypatch):
+        """SQLite 파일은 import 시점이 아니라 첫 사용 시 생성"""
+        path = tmp_path / 'lazy.db'
+        monkeypatch.setattr(app_module, 'SESSION_STORE', None)
+        monkeypatch.setattr(app_module, 'SESSION_BACKEND', 'sqlite')
+        monkeypatch.setattr(app_module, 'SESSION_DB_PATH', str(path))
+        assert not path.exists()
+
+        store = app_module.get_session_store()
+        assert isinstance(store, SQLiteSessionStore)
+        assert path.exists()
+        assert app_module.get_session_store() is store
+
+
+# ==================== TEST: JANITOR ====================
+
+class TestJanitor:
+    """백그라운드 임시 파일 정리 테스트"""
+
+    def _make_dir(self, root, name, size=0, age=0):
+        path = root / name
+        path.mkdir()
+        (path / 'data.bin').write_bytes(b'x' * size)
+        old = time.time() - age
+        for target in (path / 'data.bin', path):
+            os.utime(target, (old, old))
+        return path
+
+    def test_orphan_dirs_removed(self, tmp_path, monkeypatch, isolated_session_store):
+        """저장소에 없고 오래된 excel_splitter_* 디렉토리만 삭제"""
+        monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+        orphan = self._make_dir(tmp_path, 'excel_splitter_orphan', age=7200)
+        recent = self._make_dir(tmp_path, 'excel_splitter_recent', age=10)
+        known = self._make_dir(tmp_path, 'excel_splitter_known', age=7200)
+        other = self._make_dir(tmp_path, 'unrelated', age=7200)
+        isolated_session_store.put('excel_splitter_known', {'temp_dir': str(known)}, 3600)
+
+        app_module.cleanup_orphan_dirs()
+
+        assert not orphan.exists()
+        assert recent.exists()
+        assert known.exists()
+        assert other.exists()
+
+    def test_stale_cancel_markers_removed(self, tmp_path, monkeypatch):
+        """죽은 워커가 남긴 오래된 취소 표시 파일만 삭제 (다른 파일은 유지)"""
+        monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+        old = time.time() - 7200
+        stale = tmp_path / f'{app_module.CANCEL_MARKER_PREFIX}stale'
+        recent = tmp_path / f'{app_module.CANCEL_MARKER_PREFIX}recent'
+        other = tmp_path / 'excel_splitter.sessions.db'
+        for path in (stale, recent, other):
+            path.write_text('cancelled')
+        for path in (stale, other):
+            os.utime(path, (old, old))
+
+        app_module.cleanup_orphan_dirs()
+
+        assert not stale.exists()
+        assert recent.exists()
+        assert other.exists()
+
+    def test_disk_budget_evicts_oldest(self, tmp_path, monkeypatch, isolated_session_store):
+        """예산 초과 시 오래된 세션부터 삭제"""
+        monkeypatch.setattr(app_module, 'TEMP_DISK_BUDGET_BYTES', 150)
+        first = self._make_dir(tmp_path, 'excel_splitter_first', size=100)
+        second = self._make_dir(tmp_path, 'excel_splitter_second', size=100)
+        isolated_session_store.put('first', {'temp_dir': str(first)}, 100)
+        isolated_session_store.put('second', {'temp_dir': str(second)}, 200)
+
+        app_module.enforce_disk_budget()
+
+        assert not first.exists()
+        assert isolated_session_store.get('first') is None
+        assert second.exists()
+
+
+# ==================== TEST: RESULT CACHE ====================
+
+class TestResultCache:
+    """분리 결과 캐시 테스트"""
+
+    def _split(self, client, upload_data, sheets):
+        return client.post('/api/split', json={
+            'session_id': upload_data['session_id'],
+            'temp_file': upload_data['temp_file'],
+            'filename': upload_data['filename'],
+            'sheets': sheets
+        })
+
+    def test_repeat_split_served_from_cache(self, client, sample_excel_2sheets, isolated_result_cache, monkeypatch):
+        """같은 파일/시트 재요청은 워크북을 열지 않고 캐시에서 반환"""
+        with open(sample_excel_2sheets, 'rb') as f:
+            upload_response = client.post('/api/upload', data={'file': (f, 'sample_2sheets.xlsx')},
+                                          content_type='multipart/form-data')
+        upload_data = json.loads(upload_response.data)
+
+        first = self._split(client, upload_data, ['Sales', 'Expenses'])
+        assert first.status_code == 200
+        assert len(first.data) > 0
+        assert isolated_result_cache.misses == 2
+
+        def fail(*args, **kwargs):
+            raise AssertionError('workbook should not be opened')
+        monkeypatch.setattr(app_module, 'split_sheet_to_file', fail)
+
+        second = self._split(client, upload_data, ['Expenses'])
+        assert second.status_code == 200
+        assert isolated_result_cache.hits == 1
+        wb = openpyxl.load_workbook(io.BytesIO(second.data))
+        assert wb.sheetnames == ['Expenses']
+
+    def test_lru_eviction(self, tmp_path):
+        """용량 초과 시 가장 오래 사용하지 않은 항목 삭제"""
+        cache = ResultCache(str(tmp_path / 'cache'), 250)
+        for name in ('a', 'b', 'c'):
+            src = tmp_path / f'{name}.xlsx'
+            src.write_bytes(b'x' * 100)
+            cache.put(name, str(src))
+
+        assert cache.get('a', str(tmp_path / 'a_out.xlsx')) is False
+        assert cache.get('c', str(tmp_path / 'c_out.xlsx')) is True
+        assert cache.stats()['bytes'] == 200
+
+    def test_budget_shared_across_processes(self, tmp_path):
+        """같은 디렉토리를 쓰는 여러 프로세스(인스턴스)의 합계도 max_bytes 이하로 유지"""
+        directory = str(tmp_path / 'cache')
+        workers = [ResultCache(directory, 250), ResultCache(directory, 250)]
+        for index, name in enumerate(('a', 'b', 'c', 'd')):
+            src = tmp_path / f'{name}.xlsx'
+            src.write_bytes(b'x' * 100)
+            os.utime(src, (index, index))
+            workers[index % 2].put(name, str(src))
+
+        on_disk = sorted(os.listdir(directory))
+        assert on_disk == ['c.xlsx', 'd.xlsx']
+        # 다른 인스턴스가 저장한 항목도 적중
+        assert workers[0].get('d', str(tmp_path / 'd_out.xlsx')) is True
+
+
+# ==================== TEST: API - JOBS ====================
+
+class TestJobsAPI:
+    """비동기 분리 작업 API 테스트"""
+
+    def _upload(self, client, path, name):
+        with open(path, 'rb') as f:
+            response = client.post('/api/upload', data={'file': (f, name)}, content_type='multipart/form-data')
+        return json.loads(response.data)
+
+    def _wait(self, client, job_id, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            status = json.loads(client.get(f'/api/jobs/{job_id}').data)
+            if status['status'] not in ('queued', 'running'):
+                return status
+            time.sleep(0.05)
+        raise AssertionError('job did not finish')
+
+    def test_async_split_job(self, client, sample_excel_2sheets):
+        """작업 ID 반환 → 진행 상태 조회 → 결과 다운로드"""
+        upload_data = self._upload(client, sample_excel_2sheets, 'sample_2sheets.xlsx')
+
+        response = client.post('/api/split', json={
+            'session_id': upload_data['session_id'],
+            'temp_file': upload_data['temp_file'],
+            'filename': upload_data['filename'],
+            'sheets': ['Sales', 'Expenses'],
+            'async': True
+        })
+        assert response.status_code == 202
+        job_id = json.loads(response.data)['job_id']
+
+        status = self._wait(client, job_id)
+        assert status['status'] == 'completed'
+        assert status['progress'] == {'done': 2, 'failed': 0, 'total': 2}
+
+        result = client.get(f'/api/jobs/{job_id}/result')
+        assert result.status_code == 200
+        with zipfile.ZipFile(io.BytesIO(result.data)) as zf:
+            assert len(zf.namelist()) == 2
+
+    def test_job_visible_from_other_worker(self, client, sample_excel_2sheets, monkeypatch):
+        """다른 워커 프로세스(JOBS 에 없는 작업)에서도 세션 저장소 기록으로 상태 조회/결과 다운로드"""
+        upload_data = self._upload(client, sample_excel_2sheets, 'sample_2sheets.xlsx')
+        response = client.post('/api/split', json={
+            'session_id': upload_data['session_id'],
+            'temp_file': upload_data['temp_file'],
+            'filename': upload_data['filename'],
+            'sheets': ['Sales'],
+            'async': True
+        })
+        job_id = json.loads(response.data)['job_id']
+        assert self._wait(client, job_id)['status'] == 'completed'
+
+        monkeypatch.setattr(app_module, 'JOBS', {})
+        status = self._wait(client, job_id)
+        assert status['status'] == 'completed'
+        assert 'result_path' not in status
+
+        result = client.get(f'/api/jobs/{job_id}/result')
+        assert result.status_code == 200
+        assert openpyxl.load_workbook(io.BytesIO(result.data)).sheetnames == ['Sales']
+
+    def test_cancel_job_on_other_worker(self, client, isolated_session_store):
+        """다른 워커 프로세스의 작업 취소 요청은 저장소를 거쳐 실행 중인 토큰에 전달"""
+        isolated_session_store.put('job:remote', {'job_id': 'remote', 'status': 'running'}, 60)
+        assert app_module._job_cancel_requested('remote') is None
+
+        response = client.post('/api/jobs/remote/cancel')
+        assert response.status_code == 200
+        assert app_module._job_cancel_requested('remote') == 'cancelled'
+
+        token = CancelToken(probe=functools.partial(app_module._job_cancel_requested, 'remote'))
+        token._probed_at -= app_module.CANCEL_POLL_INTERVAL
+        with pytest.raises(SplitCancelled):
+            token.check()
+        assert token.reason == 'cancelled'
+
+    def test_unknown_job(self, client):
+        """없는 작업 ID"""
+        assert client.get('/api/jobs/missing').status_code == 404
+        assert client.post('/api/jobs/missing/cancel').status_code == 404
+
+    def test_cancelled_token_stops_tasks(self, sample_excel_2sheets, tmp_path):
+        """취소된 토큰은 남은 시트를 실행하지 않음"""
+        token = CancelToken()
+        token.cancel()
+        tasks = [('Sales', str(tmp_path / '0.xlsx')), ('Expenses', str(tmp_path / '1.xlsx'))]
+
+        with pytest.raises(SplitCancelled):
+            list(run_split_tasks(sample_excel_2sheets, tasks, cancel_token=token))
+        assert not (tmp_path / '0.xlsx').exists()
+
+    def test_token_deadline(self):
+        """deadline 경과 시 timeout 으로 취소"""
+        token = CancelToken(timeout=0.01)
+        time.sleep(0.02)
+        with pytest.raises(SplitCancelled):
+            token.check()
+        assert token.reason == 'timeout'
+
+    def test_marker_token_and_probe(self, tmp_path, monkeypatch):
+        """마커 파일로 풀 워커에 취소 전파, 연결 끊김 probe 로 취소"""
+        token = CancelToken()
+        with token.shared_marker() as marker:
+            worker_token = CancelToken(marker_path=marker)
+            worker_token.check()
+            token.cancel('disconnected')
+            with pytest.raises(SplitCancelled):
+                worker_token.check()
+        release_cancel_marker(marker, [])
+        assert not os.path.exists(marker)
+
+        monkeypatch.setattr(app_module, 'CANCEL_POLL_INTERVAL', 0)
+        probed = CancelToken(probe=lambda: True)
+        with pytest.raises(SplitCancelled):
+            probed.check()
+        assert probed.reason == 'disconnected'
+
+    def test_copy_loop_discards_partial_output(self, tmp_path):
+        """행 복사 루프 중 취소 시 부분 출력 파일 삭제"""
+        source = tmp_path / 'big.xlsx'
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = 'Big'
+        for i in range(CANCEL_CHECK_ROWS * 2):
+            ws.append([i, f'row {i}'])
+        wb.save(source)
+
+        token = CancelToken()
+        token.cancel()
+        output = tmp_path / 'out.xlsx'
+        with pytest.raises(SplitCancelled):
+            split_sheet_to_file(str(source), 'Big', str(output), {'streaming': True},
+                                cancel_token=token)
+        discard_cancelled_split(str(output))
+        assert not output.exists()
+
+    def test_split_deadline_returns_504(self, client, sample_excel_2sheets, monkeypatch):
+        """요청 deadline 초과 시 504 반환"""
+        with open(sample_excel_2sheets, 'rb') as f:
+            upload = client.post('/api/upload', data={'file': (f, 'sample.xlsx')},
+                                 content_type='multipart/form-data')
+        upload_data = upload.get_json()
+
+        monkeypatch.setattr(app_module, 'REQUEST_TIMEOUT', 1e-9)
+        response = client.post('/api/split', json={
+            'session_id': upload_data['session_id'],
+            'temp_file': upload_data['temp_file'],
+            'filename': upload_data['filename'],
+            'sheets': ['Sales', 'Expenses'],
+        })
+        assert response.status_code == 504
+
+    def test_deadline_not_applied_while_streaming(self, client, sample_excel_2sheets, monkeypatch):
+        """응답(ZIP 스트리밍)을 시작한 뒤에는 deadline 을 적용하지 않음"""
+        tokens = []
+
+        class RecordingToken(CancelToken):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                tokens.append(self)
+        monkeypatch.setattr(app_module, 'CancelToken', RecordingToken)
+
+        stream_zip = app_module.stream_zip
+        deadlines = []
+
+        def recording_stream_zip(entries, timer=None):
+            deadlines.append(tokens[-1].deadline)
+            yield from stream_zip(entries, timer)
+        monkeypatch.setattr(app_module, 'stream_zip', recording_stream_zip)
+
+        with open(sample_excel_2sheets, 'rb') as f:
+            upload_data = client.post('/api/upload', data={'file': (f, 'sample.xlsx')},
+                                      content_type='multipart/form-data').get_json()
+        response = client.post('/api/split', json={
+            'session_id': upload_data['session_id'],
+            'temp_file': upload_data['temp_file'],
+            'filename': upload_data['filename'],
+            'sheets': ['Sales', 'Expenses'],
+        })
+        assert response.status_code == 200
+        assert deadlines == [None]
+
+    def test_error_while_streaming_aborts_response(self, client, sample_excel_2sheets, monkeypatch):
+        """ZIP 스트리밍 중 오류는 정상 종료(잘린 ZIP)가 아니라 예외로 연결을 끊음"""
+        def failing_stream_zip(entries, timer=None):
+            yield b'PK\x03\x04'
+            raise SplitCancelled('disconnected')
+        monkeypatch.setattr(app_module, 'stream_zip', failing_stream_zip)
+
+        with open(sample_excel_2sheets, 'rb') as f:
+            upload_data = client.post('/api/upload', data={'file': (f, 'sample.xlsx')},
+                                      content_type='multipart/form-data').get_json()
+        response = client.post('/api/split', json={
+            'session_id': upload_data['session_id'],
+            'temp_file': upload_data['temp_file'],
+            'filename': upload_data['filename'],
+            'sheets': ['Sales', 'Expenses'],
+        })
+        with pytest.raises(SplitCancelled):
+            b''.join(response.response)
+
+
+# ==================== TEST: API - BATCH SPLIT ====================
+
+class TestBatchSplit:
+    """일괄 분리 (/api/batch) 테스트"""
+
+    def _post(self, client, files, **fields):
+        data = {'files': [(io.BytesIO(content), name) for name, content in files], **fields}
+        return client.post('/api/batch', data=data, content_type='multipart/form-data')
+
+    def test_batch_folders_and_selection(self, client, sample_excel_2sheets, tmp_path):
+        """워크북별 폴더, 워크북별 시트 선택, 처리 결과 파일"""
+        content = Path(sample_excel_2sheets).read_bytes()
+        response = self._post(client, [('a.xlsx', content), ('b.xlsx', content), ('a.xlsx', content)],
+                              selection=json.dumps({'a.xlsx': ['Sales'], 'b.xlsx': '*'}))
+        assert response.status_code == 200
+        assert response.mimetype == 'application/zip'
+
+        with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+            names = set(zf.namelist())
+            report = json.loads(zf.read('batch_report.json'))
+            zf.extract('b/b_Expenses.xlsx', tmp_path)
+
+        assert names == {'a/a_Sales.xlsx', 'b/b_Sales.xlsx', 'b/b_Expenses.xlsx', 'a(1)/a(1)_Sales.xlsx',
+                         'batch_report.json'}
+        assert [item['folder'] for item in report['workbooks']] == ['a', 'b', 'a(1)']
+        assert all(item['status'] == 'completed' for item in report['workbooks'])
+        wb = openpyxl.load_workbook(tmp_path / 'b' / 'b_Expenses.xlsx')
+        assert wb.sheetnames == ['Expenses']
+        assert wb['Expenses']['A2'].value == 'Office Rent'
+
+    def test_batch_zip_input_with_failed_workbook(self, client, sample_excel_2sheets):
+        """ZIP 안의 워크북만 분리, 손상 파일은 처리 결과에 실패로 기록"""
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.write(sample_excel_2sheets, 'monthly/report.xlsx')
+            zf.writestr('monthly/broken.xlsx', b'not a workbook')
+            zf.writestr('monthly/readme.txt', b'ignored')
+        response = self._post(client, [('close.zip', archive.getvalue())],
+                              selection=json.dumps({'report.xlsx': ['Expenses']}), output_format='csv')
+        assert response.status_code == 200
+
+        with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+            assert set(zf.namelist()) == {'report/report_Expenses.csv', 'batch_report.json'}
+            assert zf.read('report/report_Expenses.csv').decode('utf-8-sig').splitlines()[1] == 'Office Rent,5000'
+            report = {item['filename']: item for item in json.loads(zf.read('batch_report.json'))['workbooks']}
+        assert report['report.xlsx']['status'] == 'completed'
+        assert report['broken.xlsx']['status'] == 'failed'
+
+    def test_batch_unexpected_error_recorded(self, client, sample_excel_2sheets, monkeypatch):
+        """워크북 처리 중 예기치 못한 오류는 ZIP 을 끊지 않고 처리 결과에 실패로 기록"""
+        split_batch_workbook = app_module.split_batch_workbook
+
+        def flaky(workbook, *args):
+            if workbook['filename'] == 'bad.xlsx':
+                raise RuntimeError('worker crashed')
+            return split_batch_workbook(workbook, *args)
+        monkeypatch.setattr(app_module, 'split_batch_workbook', flaky)
+
+        content = Path(sample_excel_2sheets).read_bytes()
+        response = self._post(client, [('good.xlsx', content), ('bad.xlsx', content)])
+        assert response.status_code == 200
+        with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+            assert zf.testzip() is None
+            assert 'good/good_Sales.xlsx' in zf.namelist()
+            report = {item['filename']: item for item in json.loads(zf.read('batch_report.json'))['workbooks']}
+        assert report['good.xlsx']['status'] == 'completed'
+        assert report['bad.xlsx'] == {'filename': 'bad.xlsx', 'folder': 'bad', 'sheets': [], 'failed_sheets': [],
+                                      'status': 'failed', 'error': '처리 중 오류가 발생했습니다.'}
+
+    def test_batch_pool_shared_and_bounded(self, client, sample_excel_2sheets):
+        """요청마다 풀을 만들지 않고 BATCH_WORKERS 크기의 공유 풀 사용"""
+        content = Path(sample_excel_2sheets).read_bytes()
+        assert self._post(client, [('a.xlsx', content)]).status_code == 200
+        pool = app_module.get_batch_pool()
+        assert self._post(client, [('b.xlsx', content)]).status_code == 200
+        assert app_module.get_batch_pool() is pool
+        assert pool._max_workers == max(app_module.BATCH_WORKERS, 1)
+
+    def test_batch_invalid_requests(self, client, sample_excel_2sheets, monkeypatch):
+        """파일 없음, 잘못된 selection/형식, 지원하지 않는 파일은 400, BATCH_MAX_SIZE 초과는 413"""
+        content = Path(sample_excel_2sheets).read_bytes()
+        assert self._post(client, []).status_code == 400
+        assert self._post(client, [('a.xlsx', content)], selection='[').status_code == 400
+        assert self._post(client, [('a.xlsx', content)], selection='{"a.xlsx": []}').status_code == 400
+        assert self._post(client, [('a.xlsx', content)], output_format='pdf').status_code == 400
+        assert self._post(client, [('a.txt', b'text')]).status_code == 400
+        assert self._post(client, [('a.zip', b'not a zip')]).status_code == 400
+
+        monkeypatch.setattr(app_module, 'BATCH_MAX_SIZE', 1024)
+        assert self._post(client, [('a.xlsx', content)]).status_code == 413
+
+    def test_batch_deadline_before_response_returns_504(self, client, sample_excel_2sheets, monkeypatch):
+        """첫 결과 전에 deadline 을 넘기면 잘린 ZIP 대신 504"""
+        monkeypatch.setattr(app_module, 'REQUEST_TIMEOUT', 1e-9)
+        content = Path(sample_excel_2sheets).read_bytes()
+        response = self._post(client, [('a.xlsx', content)])
+        assert response.status_code == 504
+
+
+# ==================== TEST: CLI ====================
+
+class TestCli:
+    """헤드리스 일괄 분리 CLI (cli.py) 테스트"""
+
+    def _tree(self, root, sample):
+        content = Path(sample).read_bytes()
+        (root / 'in' / 'sub').mkdir(parents=True)
+        (root / 'in' / 'a.xlsx').write_bytes(content)
+        (root / 'in' / 'sub' / 'b.xlsx').write_bytes(content)
+        (root / 'in' / 'sub' / '~$b.xlsx').write_bytes(content)
+        (root / 'in' / 'broken.xlsx').write_bytes(b'not a workbook')
+        return str(root / 'in'), str(root / 'out')
+
+    def test_split_tree_with_patterns(self, sample_excel_2sheets, tmp_path):
+        """디렉토리 구조 유지, 시트 이름 패턴 선택, 손상 파일은 실패로 기록"""
+        input_dir, output_dir = self._tree(tmp_path, sample_excel_2sheets)
+        reports = cli.run(input_dir, output_dir, exclude=['Exp*'], jobs=1, echo=lambda line: None)
+
+        assert [report['file'] for report in reports] == ['a.xlsx', 'broken.xlsx', os.path.join('sub', 'b.xlsx')]
+        assert [report['status'] for report in reports] == ['completed', 'failed', 'completed']
+        assert sorted(str(p.relative_to(output_dir)) for p in Path(output_dir).rglob('*.xlsx')) == \
+            ['a/a_Sales.xlsx', 'sub/b/b_Sales.xlsx']
+        assert cli.main([input_dir, output_dir, '--include', 'Sales', '--jobs', '1']) == 1
+
+    def test_resume_skips_up_to_date_outputs(self, sample_excel_2sheets, tmp_path):
+        """출력이 원본보다 새로우면 건너뛰고, 원본이 바뀌면 다시 분리"""
+        input_dir, output_dir = self._tree(tmp_path, sample_excel_2sheets)
+        os.remove(os.path.join(input_dir, 'broken.xlsx'))
+        cli.run(input_dir, output_dir, include=['Sales'], jobs=1, echo=lambda line: None)
+
+        reports = cli.run(input_dir, output_dir, jobs=1, echo=lambda line: None)
+        assert reports[0]['status'] == 'completed'
+        assert reports[0]['skipped_sheets'] == ['Sales']
+        assert reports[0]['sheets'] == ['Expenses']
+
+        future = time.time() + 10
+        os.utime(os.path.join(input_dir, 'a.xlsx'), (future, future))
+        reports = cli.run(input_dir, output_dir, jobs=1, echo=lambda line: None)
+        assert [report['status'] for report in reports] == ['completed', 'skipped']
+        assert reports[0]['sheets'] == ['Sales', 'Expenses']
+        assert not any(name.startswith('.splitting_') for name in os.listdir(os.path.join(output_dir, 'a')))
+
+    def test_output_folders_deduplicated_per_directory(self):
+        """같은 디렉토리의 같은 이름 워크북만 구분 (디렉토리 이름의 '.' 은 건드리지 않음)"""
+        workbooks = [os.path.join('v1.2', 'a.xlsx'), os.path.join('v1.2', 'a.xls'), os.path.join('v2', 'a.xlsx'),
+                     'a.xlsx']
+        assert cli.plan_output_folders(workbooks) == [
+            os.path.join('v1.2', 'a'), os.path.join('v1.2', 'a(1)'), os.path.join('v2', 'a'), 'a'
+        ]
+
+
+# ==================== TEST: COMPRESSION ====================
+
+class TestCompression:
+    """출력 압축 정책 테스트"""
+
+    def test_compression_settings(self, tmp_path):
+        """store/fast/max 고정, auto 는 압축 효과가 없는 파일만 저장"""
+        text = tmp_path / 'a.csv'
+        text.write_text('a,b,c\n' * 10000)
+        noise = tmp_path / 'b.bin'
+        noise.write_bytes(os.urandom(100000))
+
+        assert app_module.compression_settings('store') == (zipfile.ZIP_STORED, None)
+        assert app_module.compression_settings('fast', str(noise)) == (zipfile.ZIP_DEFLATED, 1)
+        assert app_module.compression_settings('max') == (zipfile.ZIP_DEFLATED, 9)
+        assert app_module.compression_settings('auto', str(text)) == (zipfile.ZIP_DEFLATED, 6)
+        assert app_module.compression_settings('auto', str(noise)) == (zipfile.ZIP_STORED, None)
+
+    def test_raw_split_reuses_compressed_parts(self, sample_excel_2sheets, tmp_path, monkeypatch):
+        """auto: 원시 엔진은 시트 파트를 재압축 없이 복사, store: 압축 없이 저장"""
+        output_path = str(tmp_path / 'auto.xlsx')
+        with RawWorkbook(sample_excel_2sheets) as raw_workbook:
+            part = next(sheet['part'] for sheet in raw_workbook.sheets if sheet['name'] == 'Sales')
+            raw_workbook.split_sheet('Sales', output_path)
+        with zipfile.ZipFile(sample_excel_2sheets) as source, zipfile.ZipFile(output_path) as output:
+            source_info = source.getinfo(part)
+            output_info = output.getinfo('xl/worksheets/sheet1.xml')
+            assert (output_info.CRC, output_info.compress_size) == (source_info.CRC, source_info.compress_size)
+            assert output.testzip() is None
+
+        monkeypatch.setattr(app_module, 'XLSX_COMPRESSION', 'store')
+        stored_path = str(tmp_path / 'store.xlsx')
+        with RawWorkbook(sample_excel_2sheets) as raw_workbook:
+            raw_workbook.split_sheet('Sales', stored_path)
+        with zipfile.ZipFile(stored_path) as output:
+            assert {info.compress_type for info in output.infolist()} == {zipfile.ZIP_STORED}
+        assert openpyxl.load_workbook(stored_path)['Sales']['A2'].value == 'Laptop'
+
+    def test_stream_zip_parallel_deflate(self, tmp_path, monkeypatch):
+        """병렬 압축: 입력 순서 유지, 압축 불가 멤버는 저장, 압축 전/후 크기와 시간 기록"""
+        monkeypatch.setattr(app_module, 'COMPRESS_WORKERS', 3)
+        monkeypatch.setattr(app_module, '_COMPRESS_POOL', None)
+        work_dir = tmp_path / 'members'
+        work_dir.mkdir()
+        entries = []
+        for i in range(5):
+            path = work_dir / f'{i}.csv'
+            path.write_text(f'{i},value\n' * 20000)
+            entries.append((f'{i}.csv', str(path)))
+        noise = work_dir / 'noise.bin'
+        noise.write_bytes(os.urandom(200000))
+        entries.insert(2, ('noise.bin', str(noise)))
+
+        timer = app_module.StageTimer()
+        data = b''.join(app_module.stream_zip(entries, timer))
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            assert zf.testzip() is None
+            assert zf.namelist() == [name for name, _ in entries]
+            assert zf.getinfo('noise.bin').compress_type == zipfile.ZIP_STORED
+            assert zf.getinfo('3.csv').compress_type == zipfile.ZIP_DEFLATED
+            assert zf.read('4.csv') == b'4,value\n' * 20000
+
+        assert timer.stages['compress'] > 0
+        assert timer.counts['zip_uncompressed_bytes'] == 5 * len(b'0,value\n') * 20000 + 200000
+        assert timer.counts['zip_compressed_bytes'] < timer.counts['zip_uncompressed_bytes']
+        assert os.listdir(work_dir) == []
+
+    @pytest.mark.parametrize('seekable', [True, False])
+    def test_raw_member_error_leaves_valid_archive(self, seekable):
+        """raw 멤버 기록 중 예외: 기록하던 멤버만 빠지고 ZipFile 상태 복구 (파일/스트림 출력 모두)"""
+        payload = zlib.compress(b'raw member ' * 1000)[2:-4]  # raw deflate
+        output = io.BytesIO() if seekable else app_module.ZipStreamBuffer()
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('first.txt', 'first')
+            zinfo = zipfile.ZipInfo('broken.txt')
+            zinfo.compress_type = zipfile.ZIP_DEFLATED
+            zinfo.file_size, zinfo.compress_size = 11000, len(payload)
+            zinfo.CRC = zlib.crc32(b'raw member ' * 1000)
+            with pytest.raises(RuntimeError):
+                with app_module.raw_zip_member(zf, zinfo) as dst:
+                    dst.write(payload[:10])
+                    raise RuntimeError('source read failed')
+            assert not zf._writing
+            zf.writestr('last.txt', 'last')
+
+        data = output.getvalue() if seekable else output.drain()
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            assert zf.testzip() is None
+            assert zf.namelist() == ['first.txt', 'last.txt']
+            assert zf.read('last.txt') == b'last'
+
+    def test_raw_member_unsupported_falls_back(self, sample_excel_2sheets, tmp_path, monkeypatch):
+        """zipfile 내부 속성이 없는 환경이면 재압축 경로로 대체"""
+        monkeypatch.setattr(app_module, 'raw_zip_supported', lambda zf: False)
+        output_path = str(tmp_path / 'fallback.xlsx')
+        with RawWorkbook(sample_excel_2sheets) as raw_workbook:
+            raw_workbook.split_sheet('Sales', output_path)
+        assert openpyxl.load_workbook(output_path)['Sales']['A2'].value == 'Laptop'
+
+
+# ==================== TEST: ADMISSION ====================
+
+class TestAdmission:
+    """메모리 예산 입장 제어 테스트"""
+
+    @pytest.fixture
+    def comment_workbook(self, tmp_path):
+        """원시 엔진으로 분리할 수 없는 시트(메모) + 원시 분리 가능한 시트"""
+        wb = openpyxl.Workbook()
+        wb.active.title = 'Memo'
+        wb.active['A1'] = 'note'
+        wb.active['A1'].comment = openpyxl.comments.Comment('memo', 'tester')
+        wb.active['B2'] = 42
+        wb.create_sheet('Plain')['A1'] = 'plain'
+        path = tmp_path / 'comments.xlsx'
+        wb.save(path)
+        return str(path)
+
+    def test_default_budget_split_across_server_workers(self, monkeypatch):
+        """기본 예산은 서버 워커 프로세스 수로 나눔 (워커 합계가 메모리의 절반을 넘지 않음)"""
+        monkeypatch.setattr(app_module, '_total_memory', lambda: 8 * 1024 ** 3)
+        monkeypatch.setattr(app_module, 'WEB_CONCURRENCY', 1)
+        assert app_module.default_memory_budget() == 4 * 1024 ** 3
+        monkeypatch.setattr(app_module, 'WEB_CONCURRENCY', 4)
+        assert app_module.default_memory_budget() == 1024 ** 3
+        monkeypatch.setattr(app_module, '_total_memory', lambda: 0)
+        assert app_module.default_memory_budget() == 0
+
+    def test_admit_low_memory_queue_and_reject(self):
+        """자리가 없으면 저메모리 전환, 전환 불가면 대기 후 거부, 단독 초과는 413"""
+        admission = app_module.MemoryAdmission(100, queue_size=1, wait_seconds=0.05)
+        first = admission.admit(60)
+        assert not first.low_memory and admission.in_use == 60
+
+        second = admission.admit(60, 30)
+        assert second.low_memory and second.cost == 30
+
+        with pytest.raises(app_module.AdmissionRejected) as excinfo:
+            admission.admit(50)
+        assert excinfo.value.status == 503
+
+        with pytest.raises(app_module.AdmissionRejected) as excinfo:
+            admission.admit(500, 200)
+        assert excinfo.value.status == 413
+
+        first.release()
+        first.release()
+        second.release()
+        assert admission.in_use == 0
+
+    def test_queued_request_admitted_on_release(self):
+        """대기 중인 요청은 예산이 반환되면 입장"""
+        admission = app_module.MemoryAdmission(100, queue_size=1, wait_seconds=5)
+        held = admission.admit(80)
+        timer = app_module.StageTimer()
+        threading.Timer(0.1, held.release).start()
+
+        with admission.admit(50, timer=timer) as ticket:
+            assert admission.in_use == 50 and not ticket.low_memory
+        assert timer.stages['admission'] > 0
+        assert admission.in_use == 0
+
+    def test_estimate_split_memory(self, sample_excel_2sheets, comment_workbook):
+        """원시 엔진 시트는 0, openpyxl 대체 경로는 전체 시트 XML + sharedStrings 기준"""
+        assert app_module.estimate_split_memory(sample_excel_2sheets, ['Sales', 'Expenses']) == (0, None)
+
+        full, low_memory = app_module.estimate_split_memory(comment_workbook, ['Memo'])
+        with zipfile.ZipFile(comment_workbook) as zf:
+            xml_size = sum(info.file_size for info in zf.infolist() if info.filename.startswith('xl/worksheets/sheet'))
+        base = app_module.LOAD_BASE_MEMORY
+        assert full == int(xml_size * app_module.ADMISSION_MEMORY_FACTOR + base)
+        assert low_memory == base  # 공유 문자열 없음
+        assert app_module.estimate_split_memory(comment_workbook, ['Memo'], {'output_format': 'csv'}) == \
+            (low_memory, None)
+
+    def test_split_routed_to_low_memory(self, client, comment_workbook, monkeypatch, tmp_path):
+        """예산보다 큰 요청은 스트리밍 복사로 처리, 저메모리로도 넘으면 413"""
+        with open(comment_workbook, 'rb') as f:
+            upload = json.loads(client.post('/api/upload', data={'file': (f, 'comments.xlsx')},
+                                            content_type='multipart/form-data').data)
+        request_data = {key: upload[key] for key in ('session_id', 'temp_file', 'filename')}
+        full, low_memory = app_module.estimate_split_memory(comment_workbook, ['Memo'])
+
+        monkeypatch.setattr(app_module, 'MEMORY_ADMISSION', app_module.MemoryAdmission(low_memory + 1))
+        split_calls = []
+        original = app_module.split_sheet_to_file
+        monkeypatch.setattr(app_module, 'split_sheet_to_file',
+                            lambda *args, **kwargs: split_calls.append(args[3]) or original(*args, **kwargs))
+        response = client.post('/api/split', json={**request_data, 'sheets': ['Memo']})
+        assert response.status_code == 200
+        assert split_calls[0]['streaming'] is True
+        assert openpyxl.load_workbook(io.BytesIO(response.data))['Memo']['B2'].value == 42
+        assert app_module.MEMORY_ADMISSION.in_use == 0
+
+        # 캐시된 결과는 입장 제어를 거치지 않으므로 빈 캐시로 확인
+        monkeypatch.setattr(app_module, '_RESULT_CACHE', ResultCache(str(tmp_path / 'empty_cache'), 64 * 1024 * 1024))
+        monkeypatch.setattr(app_module, 'MEMORY_ADMISSION', app_module.MemoryAdmission(low_memory - 1))
+        response = client.post('/api/split', json={**request_data, 'sheets': ['Memo']})
+        assert response.status_code == 413
+        assert 'excel_splitter_admission_total{decision="rejected"}' in client.get('/api/metrics').data.decode()
+
+    def test_cached_sheets_skip_admission(self, client, comment_workbook, monkeypatch, isolated_result_cache):
+        """결과 캐시에 있는 시트는 입장 제어 없이 반환, 저메모리(streaming) 결과도 같은 캐시 키"""
+        with open(comment_workbook, 'rb') as f:
+            upload = json.loads(client.post('/api/upload', data={'file': (f, 'comments.xlsx')},
+                                            content_type='multipart/form-data').data)
+        request_data = {'sheets': ['Memo'], **{key: upload[key] for key in ('session_id', 'temp_file', 'filename')}}
+        full, low_memory = app_module.estimate_split_memory(comment_workbook, ['Memo'])
+
+        # 저메모리 모드로 분리한 결과를 일반 모드 요청이 재사용
+        monkeypatch.setattr(app_module, 'MEMORY_ADMISSION', app_module.MemoryAdmission(low_memory + 1))
+        assert client.post('/api/split', json=request_data).status_code == 200
+        monkeypatch.setattr(app_module, 'MEMORY_ADMISSION', app_module.MemoryAdmission(full * 10))
+        assert client.post('/api/split', json=request_data).status_code == 200
+        assert isolated_result_cache.hits == 1
+        assert len(os.listdir(isolated_result_cache.directory)) == 1
+
+        # 예산이 모두 사용 중이어도 (대기열 없음) 캐시된 시트는 바로 반환
+        admission = app_module.MemoryAdmission(full * 10, queue_size=0)
+        held = admission.admit(full * 10)
+        monkeypatch.setattr(app_module, 'MEMORY_ADMISSION', admission)
+        response = client.post('/api/split', json=request_data)
+        assert response.status_code == 200
+        assert openpyxl.load_workbook(io.BytesIO(response.data))['Memo']['B2'].value == 42
+        assert isolated_result_cache.hits == 2
+        held.release()
+        assert admission.in_use == 0
+
+
+# ==================== TEST: METRICS ====================
+
+class TestMetrics:
+    """메트릭 테스트"""
+
+    def test_histogram_renders_cumulative_buckets(self):
+        """버킷은 누적 개수, +Inf 는 전체 개수"""
+        histogram = app_module.Histogram('test_seconds', 'test', (0.1, 1), ('stage',))
+        histogram.observe(0.05, stage='copy')
+        histogram.observe(0.5, stage='copy')
+        histogram.observe(5, stage='copy')
+
+        lines = histogram.render()
+        assert 'test_seconds_bucket{stage="copy",le="0.1"} 1' in lines
+        assert 'test_seconds_bucket{stage="copy",le="1"} 2' in lines
+        assert 'test_seconds_bucket{stage="copy",le="+Inf"} 3' in lines
+        assert 'test_seconds_count{stage="copy"} 3' in lines
+
+    def test_split_records_stages_and_cells(self, client, tmp_path):
+        """openpyxl 대체 경로 분리 후 단계별 시간과 복사 셀 수가 /api/metrics 에 반영"""
+        wb = openpyxl.Workbook()
+        wb.active.title = 'Memo'
+        wb.active['A1'] = 'note'
+        wb.active['B1'] = 1
+        wb.active['A1'].comment = openpyxl.comments.Comment('memo', 'tester')
+        path = tmp_path / 'comments.xlsx'
+        wb.save(path)
+
+        cells_before = app_module.CELLS_COPIED.value()
+        with open(path, 'rb') as f:
+            upload_data = json.loads(client.post('/api/upload', data={'file': (f, 'comments.xlsx')},
+                                                 content_type='multipart/form-data').data)
+        response = client.post('/api/split', json={
+            'session_id': upload_data['session_id'],
+            'temp_file': upload_data['temp_file'],
+            'filename': upload_data['filename'],
+            'sheets': ['Memo']
+        })
+        assert response.status_code == 200
+        assert app_module.CELLS_COPIED.value() - cells_before == 2
+
+        metrics = client.get('/api/metrics')
+        assert metrics.status_code == 200
+        assert metrics.mimetype == 'text/plain'
+        body = metrics.data.decode('utf-8')
+        for stage in ('receive', 'probe', 'load_workbook', 'copy_cells', 'save'):
+            assert f'excel_splitter_stage_seconds_count{{stage="{stage}"}}' in body
+        assert 'excel_splitter_request_seconds_count{endpoint="split"}' in body
+        assert 'excel_splitter_sheets_split_total{engine="openpyxl"}' in body
+
+
+# ==================== TEST: BENCHMARK ====================
+
+class TestBenchmark:
+    """벤치마크 도구 테스트"""
+
+    def test_generated_workbook_uses_shared_strings(self, tmp_path):
+        """생성 워크북은 sharedStrings 파트를 쓰고 openpyxl 로 읽을 수 있음"""
+        import bench_split
+
+        path = str(tmp_path / 'bench.xlsx')
+        bench_split.generate_workbook(path, sheets=2, rows=20, cols=4, style_density=0.5,
+                                      merged=2, formulas=0.1, shared_strings=10)
+
+        with zipfile.ZipFile(path) as zf:
+            assert 'xl/sharedStrings.xml' in zf.namelist()
+            assert b'inlineStr' not in zf.read('xl/worksheets/sheet1.xml')
+
+        wb = openpyxl.load_workbook(path)
+        assert wb.sheetnames == ['Sheet1', 'Sheet2']
+        assert wb['Sheet1']['B3'].value.startswith('문자열_')
+        wb.close()
+
+    def test_compare_detects_regression(self):
+        """threshold 를 넘는 지표만 회귀로 보고"""
+        import bench_split
+
+        baseline = {'scenarios': {'s': {'wall_s': 1.0, 'peak_rss_bytes': 100, 'output_bytes': 10}}}
+        current = {'scenarios': {'s': {'wall_s': 1.5, 'peak_rss_bytes': 110, 'output_bytes': 10}}}
+
+        regressions = bench_split.compare_results(baseline, current, threshold=0.2)
+        assert [(name, metric) for name, metric, *_ in regressions] == [('s', 'wall_s')]
+
+    def test_compare_rejects_different_settings(self, tmp_path, capsys):
+        """mode/quick/workers 가 다른 기준값과는 비교하지 않음 (실행 전 거부)"""
+        import bench_split
+
+        meta = {'mode': 'core', 'quick': False, 'workers': 1}
+        baseline = {'meta': meta, 'scenarios': {'s': {'wall_s': 1.0}}}
+        current = {'meta': {**meta, 'mode': 'client'}, 'scenarios': {'s': {'wall_s': 5.0}}}
+        with pytest.raises(ValueError, match='mode'):
+            bench_split.compare_results(baseline, current)
+        assert bench_split.compare_results(baseline, {**current, 'meta': meta}) != []
+
+        baseline_path = tmp_path / 'baseline.json'
+        baseline_path.write_text(json.dumps(baseline))
+        with pytest.raises(SystemExit) as excinfo:
+            bench_split.main(['--compare', str(baseline_path), '--quick'])
+        assert excinfo.value.code == 2
+        assert '--quick' in capsys.readouterr().err
+
+
 # ==================== TEST: API - HEALTH ====================
 
 class TestHealthAPI: